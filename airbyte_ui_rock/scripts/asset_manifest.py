@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Generate the nginx manifest of the immutable assets of the webapp build.
+
+Vite names the assets it emits after a hash of their content, so that a new build
+references new names: they can be cached forever, and only the other files, such
+as `index.html`, need revalidation. Two snippets are written, included by the
+nginx configuration rendered by the charm:
+
+- `immutable-assets.conf`: entries of a map from the paths of the content-hashed
+  assets to their `Cache-Control` header.
+- `static-build.conf`: entry of a map to a digest of the whole build, which the
+  cache namespace of the proxied API responses is derived from.
+"""
+
+import hashlib
+import json
+import re
+import sys
+from pathlib import Path
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+# Vite emits its assets as `<name>-<8 character hash>.<extension>` under assets/.
+HASHED_ASSET = re.compile(r"assets/(?:.*/)?[^/]+-[A-Za-z0-9_-]{8}\.[A-Za-z0-9]+")
+
+MANIFEST_PATHS = (".vite/manifest.json", "manifest.json")
+
+
+def build_digest(html_dir):
+    """Compute a digest of a webapp build, changing with any of its files.
+
+    Args:
+        html_dir: directory of the webapp build.
+
+    Returns:
+        The hex digest.
+    """
+    digest = hashlib.sha256()
+    for path in sorted(path for path in html_dir.rglob("*") if path.is_file()):
+        digest.update(path.relative_to(html_dir).as_posix().encode() + b"\0")
+        digest.update(hashlib.sha256(path.read_bytes()).digest())
+    return digest.hexdigest()
+
+
+def immutable_assets(html_dir):
+    """List the content-hashed assets of a webapp build.
+
+    Args:
+        html_dir: directory of the webapp build.
+
+    Returns:
+        Sorted list of the asset paths, as requested.
+    """
+    files = {path.relative_to(html_dir).as_posix() for path in html_dir.rglob("*") if path.is_file()}
+    assets = {file for file in files if HASHED_ASSET.fullmatch(file)}
+
+    for manifest_path in MANIFEST_PATHS:
+        manifest = html_dir / manifest_path
+        if manifest.exists():
+            for chunk in json.loads(manifest.read_text()).values():
+                emitted = [chunk["file"], *chunk.get("css", []), *chunk.get("assets", [])]
+                assets.update(file for file in emitted if file in files and file != "index.html")
+            break
+    return sorted(f"/{asset}" for asset in assets)
+
+
+def nginx_snippets(html_dir):
+    """Render the nginx snippets of the immutable asset manifest and build digest.
+
+    Args:
+        html_dir: directory of the webapp build.
+
+    Returns:
+        Dict of snippet file names to their contents.
+    """
+    header = "# Generated at image build time from the webapp build.\n"
+    return {
+        "immutable-assets.conf": header + "".join(f'{path} "{IMMUTABLE}";\n' for path in immutable_assets(html_dir)),
+        "static-build.conf": header + f'"" {build_digest(html_dir)};\n',
+    }
+
+
+if __name__ == "__main__":
+    for name, snippet in nginx_snippets(Path(sys.argv[1])).items():
+        (Path(sys.argv[2]) / name).write_text(snippet)
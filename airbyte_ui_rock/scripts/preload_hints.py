@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Generate the nginx preload hints for the critical assets of the webapp build.
+
+The critical assets are the entry scripts and stylesheets referenced by
+`index.html`, completed with the static imports of the entry chunks from the
+Vite manifest when the build includes one. The hints are written as an nginx
+snippet adding a `Link` header, which proxies and CDNs can also turn into
+103 Early Hints.
+"""
+
+import json
+import sys
+from html.parser import HTMLParser
+from pathlib import Path
+
+# Keep the Link header well below common header size limits.
+MAX_HINTS = 16
+
+MANIFEST_PATHS = (".vite/manifest.json", "manifest.json")
+
+
+class _AssetParser(HTMLParser):
+    """Collect the scripts and stylesheets referenced by an HTML document.
+
+    Attrs:
+        assets: list of (path, link relation) in document order.
+    """
+
+    def __init__(self):
+        """Construct."""
+        super().__init__()
+        self.assets = []
+
+    def handle_starttag(self, tag, attrs):
+        """Record asset references.
+
+        Args:
+            tag: tag name.
+            attrs: list of (name, value) attributes.
+        """
+        attributes = dict(attrs)
+        if tag == "script" and attributes.get("src"):
+            rel = "modulepreload" if attributes.get("type") == "module" else "preload; as=script"
+            self.assets.append((attributes["src"], rel))
+        elif tag == "link" and attributes.get("href"):
+            rel = attributes.get("rel", "")
+            if rel == "stylesheet":
+                self.assets.append((attributes["href"], "preload; as=style"))
+            elif rel == "modulepreload":
+                self.assets.append((attributes["href"], "modulepreload"))
+
+
+def manifest_assets(manifest):
+    """List the entry chunks of a Vite manifest with their static imports.
+
+    Args:
+        manifest: the parsed Vite manifest.
+
+    Returns:
+        List of (path, link relation).
+    """
+    assets = []
+    seen = set()
+
+    def visit(key):
+        if key in seen or key not in manifest:
+            return
+        seen.add(key)
+        chunk = manifest[key]
+        assets.append((f"/{chunk['file']}", "modulepreload"))
+        assets.extend((f"/{css}", "preload; as=style") for css in chunk.get("css", []))
+        for imported in chunk.get("imports", []):
+            visit(imported)
+
+    for key, chunk in manifest.items():
+        if chunk.get("isEntry"):
+            visit(key)
+    return assets
+
+
+def critical_assets(html_dir):
+    """Find the critical assets of a webapp build.
+
+    Args:
+        html_dir: directory of the webapp build.
+
+    Returns:
+        List of (path, link relation), without duplicates.
+    """
+    parser = _AssetParser()
+    parser.feed((html_dir / "index.html").read_text())
+    assets = parser.assets
+
+    for manifest_path in MANIFEST_PATHS:
+        manifest = html_dir / manifest_path
+        if manifest.exists():
+            assets += manifest_assets(json.loads(manifest.read_text()))
+            break
+
+    unique = {}
+    for path, rel in assets:
+        # Only same-origin assets can be preloaded from the build.
+        if path.startswith("/") and not path.startswith("//"):
+            unique.setdefault(path, rel)
+    return list(unique.items())[:MAX_HINTS]
+
+
+def nginx_snippet(assets):
+    """Render the nginx snippet adding the preload hints.
+
+    Args:
+        assets: list of (path, link relation).
+
+    Returns:
+        The nginx snippet.
+    """
+    snippet = "# Generated at image build time from index.html and the Vite manifest.\n"
+    if assets:
+        links = ", ".join(f"<{path}>; rel={rel}" for path, rel in assets)
+        snippet += f'add_header Link "{links}" always;\n'
+    return snippet
+
+
+if __name__ == "__main__":
+    sys.stdout.write(nginx_snippet(critical_assets(Path(sys.argv[1]))))
@@ -0,0 +1,280 @@
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Streaming analysis of the nginx access logs.
+
+Logs are read line by line through generators, and summarized with bounded
+structures, so that the memory used does not grow with the size of the logs.
+"""
+
+import gzip
+import hashlib
+import heapq
+import io
+import math
+import mmap
+import os
+import re
+from datetime import datetime
+
+# Lines of the `main` log format of nginx.conf.j2.
+LINE_PATTERN = re.compile(
+    rb'(?P<address>\S+) - \S+ \[(?P<time>[^\]]+)\] "(?P<request>[^"]*)" (?P<status>\d{3}) (?P<bytes>\d+) '
+    rb'"[^"]*" "[^"]*" "(?P<forwarded>[^"]*)" rt=(?P<request_time>[\d.]+)'
+)
+# Path segments replaced by a placeholder, so that paths are grouped by endpoint.
+ID_PATTERN = re.compile(rb"/(?:[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}|\d+)(?=/|$)")
+
+CHUNK_SIZE = 1024 * 1024
+# Paths tracked per metric by the Space-Saving summaries, for each path reported.
+TRACKED_PER_REPORTED = 10
+# 2^12 HyperLogLog registers, estimating the unique clients within about 1.6%.
+HLL_PRECISION = 12
+
+
+def read_lines(stream, compressed=False):
+    """Read the lines of a log.
+
+    Log files are memory-mapped when possible, and otherwise read in chunks.
+
+    Args:
+        stream: binary file-like object.
+        compressed: whether the stream is decompressed on the fly, and cannot be mapped.
+
+    Yields:
+        The lines, as bytes.
+    """
+    size = None
+    if not compressed:
+        try:
+            size = os.fstat(stream.fileno()).st_size
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            pass
+    if size:
+        with mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield from iter(mapped.readline, b"")
+        return
+
+    pending = b""
+    for chunk in iter(lambda: stream.read(CHUNK_SIZE), b""):
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        yield from lines
+    if pending:
+        yield pending
+
+
+def read_records(stream, compressed=False):
+    """Read the records of an access log.
+
+    Args:
+        stream: binary file-like object.
+        compressed: whether the log is gzip-compressed, as rotated logs may be.
+
+    Yields:
+        The parsed records, see `parse`.
+    """
+    if compressed:
+        with gzip.GzipFile(fileobj=stream) as decompressed:
+            yield from parse(read_lines(decompressed, compressed=True))
+    else:
+        yield from parse(read_lines(stream))
+
+
+def parse(lines):
+    """Parse access log lines, skipping those in other formats.
+
+    Args:
+        lines: iterable of lines, as bytes.
+
+    Yields:
+        Tuples of (minute, client, path, status, bytes sent, request time in seconds).
+    """
+    minutes = _MinuteParser()
+    for line in lines:
+        match = LINE_PATTERN.match(line)
+        if not match:
+            continue
+
+        request = match.group("request").split(b" ")
+        path = request[1].split(b"?", 1)[0] if len(request) > 1 else b"-"
+        forwarded = match.group("forwarded")
+        # Behind the ingress, the client is the first forwarded address.
+        client = forwarded.split(b",", 1)[0].strip() if forwarded not in (b"", b"-") else match.group("address")
+        yield (
+            minutes.parse(match.group("time")),
+            client,
+            ID_PATTERN.sub(b"/{id}", path),
+            int(match.group("status")),
+            int(match.group("bytes")),
+            float(match.group("request_time")),
+        )
+
+
+class _MinuteParser:
+    """Parser of nginx local times to the minute, caching the last minute parsed."""
+
+    def __init__(self):
+        self._key = None
+        self._minute = None
+
+    def parse(self, time_local):
+        """Parse a local time such as `19/Oct/2024:13:07:59 +0000` to the minute.
+
+        Args:
+            time_local: the time, as bytes.
+
+        Returns:
+            The timezone-aware minute.
+        """
+        key = time_local[:17] + time_local[20:]
+        if key != self._key:
+            self._key = key
+            self._minute = datetime.strptime(key.decode(), "%d/%b/%Y:%H:%M %z")
+        return self._minute
+
+
+class SpaceSaving:
+    """Space-Saving summary of the heaviest keys of a stream, in bounded memory.
+
+    Keys whose weight is over `total / capacity` are always tracked, with their weight
+    overestimated by at most that amount.
+    """
+
+    def __init__(self, capacity):
+        """Construct.
+
+        Args:
+            capacity: maximum number of keys tracked.
+        """
+        self.capacity = capacity
+        self.weights = {}
+        # One (weight, key) entry per tracked key: weights only grow, so entries are
+        # refreshed lazily when they reach the top of the heap.
+        self._lightest = []
+
+    def add(self, key, weight=1):
+        """Add the weight of a key.
+
+        Args:
+            key: the key.
+            weight: the weight.
+        """
+        if key in self.weights:
+            self.weights[key] += weight
+            return
+        if len(self.weights) < self.capacity:
+            self.weights[key] = weight
+            heapq.heappush(self._lightest, (weight, key))
+            return
+
+        while self._lightest[0][0] != self.weights[self._lightest[0][1]]:
+            lightest = self._lightest[0][1]
+            heapq.heapreplace(self._lightest, (self.weights[lightest], lightest))
+        # The lightest key is replaced, and its weight inherited as the error bound.
+        _, lightest = self._lightest[0]
+        self.weights[key] = self.weights.pop(lightest) + weight
+        heapq.heapreplace(self._lightest, (self.weights[key], key))
+
+    def top(self, count):
+        """Get the heaviest keys.
+
+        Args:
+            count: number of keys.
+
+        Returns:
+            List of (key, weight) tuples, heaviest first.
+        """
+        return heapq.nlargest(count, self.weights.items(), key=lambda item: item[1])
+
+
+class HyperLogLog:
+    """HyperLogLog estimate of the number of distinct keys of a stream, in bounded memory."""
+
+    def __init__(self, precision=HLL_PRECISION):
+        """Construct.
+
+        Args:
+            precision: number of bits of the hash selecting the register.
+        """
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, key):
+        """Add a key.
+
+        Args:
+            key: the key, as bytes.
+        """
+        digest = int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "big")
+        register = digest >> (64 - self.precision)
+        rest = digest & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        self.registers[register] = max(self.registers[register], rank)
+
+    def count(self):
+        """Estimate the number of distinct keys added.
+
+        Returns:
+            The estimate.
+        """
+        size = len(self.registers)
+        estimate = 0.7213 / (1 + 1.079 / size) * size * size / sum(2.0**-rank for rank in self.registers)
+        empty = self.registers.count(0)
+        if estimate <= 2.5 * size and empty:
+            # Linear counting is more accurate for small cardinalities.
+            estimate = size * math.log(size / empty)
+        return round(estimate)
+
+
+def analyze(records, since, top):
+    """Summarize the load served over a time window.
+
+    Args:
+        records: iterable of parsed access log records.
+        since: timezone-aware start of the time window.
+        top: number of paths reported per metric.
+
+    Returns:
+        Dict with the request count, the top paths by request count, bytes sent and
+        total request time, the status class histogram, the busiest minute and the
+        estimated unique client count.
+    """
+    capacity = top * TRACKED_PER_REPORTED
+    paths = {metric: SpaceSaving(capacity) for metric in ("requests", "bytes", "seconds")}
+    statuses = {}
+    minutes = {}
+    clients = HyperLogLog()
+    requests = 0
+    for minute, client, path, status, sent, request_time in records:
+        if minute < since:
+            continue
+
+        requests += 1
+        paths["requests"].add(path)
+        paths["bytes"].add(path, sent)
+        paths["seconds"].add(path, request_time)
+        status_class = f"{status // 100}xx"
+        statuses[status_class] = statuses.get(status_class, 0) + 1
+        minutes[minute] = minutes.get(minute, 0) + 1
+        clients.add(client)
+
+    peak = max(minutes.items(), key=lambda item: item[1], default=None)
+    return {
+        "requests": requests,
+        "top_paths": {
+            metric: [
+                {"path": path.decode(errors="replace"), metric: round(weight, 3)} for path, weight in summary.top(top)
+            ]
+            for metric, summary in paths.items()
+        },
+        "status_classes": dict(sorted(statuses.items())),
+        "peak_minute": {
+            "minute": peak[0].isoformat(),
+            "requests": peak[1],
+            "requests_per_second": round(peak[1] / 60, 2),
+        }
+        if peak
+        else None,
+        "unique_clients": clients.count(),
+    }
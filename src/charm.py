@@ -4,36 +4,104 @@
 
 """Charm definition and helpers."""
 
+import json
 import logging
+import re
+import time
+from datetime import datetime, timedelta, timezone
 
 from charms.nginx_ingress_integrator.v0.nginx_route import require_nginx_route
 from ops import main, pebble
 from ops.charm import CharmBase
-from ops.model import ActiveStatus, BlockedStatus, MaintenanceStatus, WaitingStatus
+from ops.framework import StoredState
+from ops.model import (
+    ActiveStatus,
+    BlockedStatus,
+    MaintenanceStatus,
+    ModelError,
+    SecretNotFoundError,
+    WaitingStatus,
+)
 from ops.pebble import CheckStatus
 
+from latency import (
+    bucket_name,
+    history,
+    merge,
+    parse_thresholds,
+    report,
+    slow_routes,
+    summarize_log,
+)
 from literals import (
+    AIRBYTE_SERVER_CANARY_RELATION,
     AIRBYTE_SERVER_RELATION,
     AIRBYTE_VERSION,
-    CONNECTOR_BUILDER_API_PORT,
+    CONFIG_CHOICES,
+    CONFIG_RANGES,
+    DRAIN_POLL_INTERVAL,
+    FULL_STATUS_CHECK_INTERVAL,
     INTERNAL_API_PORT,
+    LATENCY_LOG_DIR,
+    NGINX_ACCESS_LOG,
+    NGINX_CONF_PATH,
+    NGINX_DEFAULT_CONF_PATH,
+    NGINX_DRAIN_MARKER_PATH,
+    NGINX_LOG_DIR,
+    NGINX_TLS_CERT_PATH,
+    NGINX_TLS_KEY_PATH,
+    PEER_WORKLOAD_KEYS,
+    READINESS_PROBE_ROUTE,
+    STOP_DRAIN_TIMEOUT,
     WEB_UI_PORT,
+    WEB_UI_TLS_PORT,
 )
 from log import log_event_handler
+from nginx import (
+    build_context,
+    client_key,
+    config_hash,
+    parse_keycloak_host,
+    parse_rate_limits,
+    parse_trusted_proxies,
+    render,
+)
+from profiling import PROFILES_DIR, ProfileStore, run
 from relations.airbyte_server import AirbyteServer
+from resources import compute_resources, kubernetes_client, patch_resources, requested
 from state import State
 
 logger = logging.getLogger(__name__)
 
 
+def wait_for(condition, polls):
+    """Poll a condition until it holds.
+
+    Args:
+        condition: callable returning whether the condition holds.
+        polls: maximum number of polls, `DRAIN_POLL_INTERVAL` seconds apart.
+
+    Returns:
+        The number of polls made.
+    """
+    for poll in range(1, polls + 1):
+        if condition():
+            return poll
+        time.sleep(DRAIN_POLL_INTERVAL)
+    return polls
+
+
 class AirbyteUIK8sOperatorCharm(CharmBase):
     """Airbyte UI charm.
 
     Attrs:
         _state: used to store data that is persisted across invocations.
+        _stored: used to store unit-local data that is persisted across invocations.
         external_hostname: DNS listing used for external connections.
     """
 
+    _stored = StoredState()
+
     @property
     def external_hostname(self):
         """Return the DNS listing used for external connections."""
@@ -47,31 +115,68 @@ class AirbyteUIK8sOperatorCharm(CharmBase):
         """
         super().__init__(*args)
         self._state = State(self.app, lambda: self.model.get_relation("peer"))
+        self._profiles = ProfileStore(self.charm_dir / PROFILES_DIR)
+        self._stored.set_default(
+            applied_layer=None,
+            verified_layer=None,
+            draining=False,
+            resources_patched=False,
+            fast_status_ticks=0,
+            latency_buckets={},
+            latency_digested=None,
+            reconcile_pending=False,
+            reconciled_peer_data=None,
+            workload_tls=False,
+        )
 
         self.name = "airbyte-webapp"
         self.framework.observe(self.on[self.name].pebble_ready, self._on_pebble_ready)
         self.framework.observe(self.on.update_status, self._on_update_status)
         self.framework.observe(self.on.restart_action, self._on_restart)
+        self.framework.observe(self.on.get_profiles_action, self._on_get_profiles)
+        self.framework.observe(self.on.latency_report_action, self._on_latency_report)
+        self.framework.observe(self.on.analyze_logs_action, self._on_analyze_logs)
+        self.framework.observe(self.on.peer_relation_created, self._on_peer_relation_changed)
         self.framework.observe(self.on.peer_relation_changed, self._on_peer_relation_changed)
         self.framework.observe(self.on.config_changed, self._on_config_changed)
+        self.framework.observe(self.on.secret_changed, self._on_secret_changed)
+        self.framework.observe(self.on.stop, self._on_stop)
+        self.framework.observe(self.on.remove, self._on_stop)
 
         # Handle Airbyte server relation
         self.airbyte_server = AirbyteServer(self)
+        self.airbyte_server_canary = AirbyteServer(self, AIRBYTE_SERVER_CANARY_RELATION, "airbyte_server_canary")
 
         # Handle Ingress.
         self._require_nginx_route()
 
     def _require_nginx_route(self):
-        """Require nginx-route relation based on current configuration."""
+        """Require nginx-route relation based on current configuration.
+
+        The ingress reaches the pod over HTTPS only once nginx was given the certificate
+        of the workload TLS secret, rather than as soon as the secret is configured.
+        """
+        workload_tls = self._stored.workload_tls
         require_nginx_route(
             charm=self,
             service_hostname=self.external_hostname,
             service_name=self.app.name,
-            service_port=WEB_UI_PORT,
+            service_port=WEB_UI_TLS_PORT if workload_tls else WEB_UI_PORT,
             tls_secret_name=self.config["tls-secret-name"],
-            backend_protocol="HTTP",
+            backend_protocol="HTTPS" if workload_tls else "HTTP",
         )
 
+    def _update_nginx_route(self, workload_tls):
+        """Switch the ingress to the protocol nginx serves the pod with.
+
+        Args:
+            workload_tls: whether nginx terminates TLS.
+        """
+        if self._stored.workload_tls == workload_tls:
+            return
+        self._stored.workload_tls = workload_tls
+        self._require_nginx_route()
+
     @log_event_handler(logger)
     def _on_pebble_ready(self, event):
         """Handle pebble ready event.
@@ -79,17 +184,36 @@ class AirbyteUIK8sOperatorCharm(CharmBase):
         Args:
             event: The event triggered when the relation changed.
         """
+        # nginx has not completed any bucket yet when its container starts, so the status
+        # checks only list the buckets once the next one starts.
+        self._stored.latency_digested = bucket_name(datetime.now(timezone.utc))
         self._update(event)
 
     @log_event_handler(logger)
     def _on_peer_relation_changed(self, event):
-        """Handle peer relation changed event.
+        """Handle peer relation created and changed events.
+
+        Changes to keys the workload does not depend on are ignored, so that a
+        write to the peer relation does not reconcile every unit.
 
         Args:
             event: The event triggered when the relation changed.
         """
+        peer_data = json.dumps(self._peer_workload_data(), sort_keys=True)
+        if not self._stored.reconcile_pending and peer_data == self._stored.reconciled_peer_data:
+            logger.debug("peer relation changed without workload changes")
+            return
+
         self._update(event)
 
+    def _peer_workload_data(self):
+        """Get the peer relation data the workload configuration depends on.
+
+        Returns:
+            Dict of the workload keys to their values.
+        """
+        return {key: getattr(self._state, key) for key in PEER_WORKLOAD_KEYS}
+
     @log_event_handler(logger)
     def _on_config_changed(self, event):
         """Handle changed configuration.
@@ -97,9 +221,36 @@ class AirbyteUIK8sOperatorCharm(CharmBase):
         Args:
             event: The event triggered when the relation changed.
         """
+        low, high = CONFIG_RANGES["profile-retention"]
+        # An invalid retention blocks the unit in `_update`, and must not prune the profiles.
+        if low <= self.config["profile-retention"] <= high:
+            self._profiles.configure(self.config["profile-hooks"], self.config["profile-retention"])
         self.unit.status = WaitingStatus("configuring application")
         self._update(event)
 
+    @log_event_handler(logger)
+    def _on_secret_changed(self, event):
+        """Handle secret changed event.
+
+        Args:
+            event: The event triggered when a secret used by the charm changed.
+        """
+        self._update(event)
+
+    @log_event_handler(logger)
+    def _on_stop(self, event):
+        """Handle stop and remove events.
+
+        Args:
+            event: The event triggered when the unit stops or is removed.
+        """
+        container = self.unit.get_container(self.name)
+        if not container.can_connect():
+            return
+
+        self.unit.status = MaintenanceStatus("draining connections")
+        self._drain(container, min(self.config["drain-timeout"], STOP_DRAIN_TIMEOUT))
+
     @log_event_handler(logger)
     def _on_update_status(self, event):
         """Handle `update-status` events.
@@ -107,6 +258,13 @@ class AirbyteUIK8sOperatorCharm(CharmBase):
         Args:
             event: The `update-status` event triggered at intervals.
         """
+        if self._stored.reconcile_pending:
+            self._update(event)
+            return
+
+        if self._update_status_fast():
+            return
+
         try:
             self._validate()
         except ValueError:
@@ -118,13 +276,93 @@ class AirbyteUIK8sOperatorCharm(CharmBase):
             self._update(event)
             return
 
-        check = container.get_check("up")
-        if check.status != CheckStatus.UP:
+        checks = container.get_checks("up", "api")
+        if "up" not in checks or checks["up"].status != CheckStatus.UP:
             self.unit.status = MaintenanceStatus("Status check: DOWN")
             return
 
         self.unit.set_workload_version(f"v{AIRBYTE_VERSION}")
-        self.unit.status = ActiveStatus()
+        self.unit.status = self._active_status(container, checks)
+        self._stored.verified_layer = self._stored.applied_layer
+        self._stored.fast_status_ticks = 0
+
+    def _update_status_fast(self):
+        """Update the unit status with a single Pebble query.
+
+        The fast path applies when the layer last applied by `_update` was already
+        verified by a full status check, which is still repeated every
+        `FULL_STATUS_CHECK_INTERVAL` intervals to catch changes made outside the charm.
+
+        Returns:
+            True if the status was updated, False if a full status check is needed.
+        """
+        if self._stored.applied_layer is None or self._stored.applied_layer != self._stored.verified_layer:
+            return False
+
+        if self._stored.fast_status_ticks >= FULL_STATUS_CHECK_INTERVAL:
+            return False
+
+        container = self.unit.get_container(self.name)
+        try:
+            checks = container.get_checks("up", "api")
+        except (ModelError, pebble.ConnectionError):
+            return False
+
+        if "up" not in checks or checks["up"].status != CheckStatus.UP:
+            return False
+
+        self._stored.fast_status_ticks += 1
+        # The latency logs are digested by the full status checks only.
+        self.unit.status = self._active_status(container, checks, digest=False)
+        return True
+
+    def _active_status(self, container, checks, digest=True):
+        """Get the active status of the unit from its Pebble checks and latency digest.
+
+        Args:
+            container: application container
+            checks: mapping of check names to check infos.
+            digest: whether to digest the latency log buckets completed since the last digest.
+
+        Returns:
+            ActiveStatus, reporting degraded mode while the Airbyte server check fails
+            and the routes whose p95 latency reaches their slow request threshold.
+        """
+        messages = []
+        if "api" in checks and checks["api"].status != CheckStatus.UP:
+            messages.append("degraded: Airbyte server unavailable")
+        messages.append(slow_routes(self._latency_report(container, digest=digest)))
+        return ActiveStatus("; ".join(filter(None, messages)))
+
+    def _latency_report(self, container, current=False, digest=True):
+        """Digest the latency log buckets written by nginx and report the latency per route.
+
+        Completed buckets are summarized once, kept in the unit stored state for the
+        latency window, and removed from the workload.
+
+        Args:
+            container: application container
+            current: whether to also report the bucket nginx is writing to.
+            digest: whether to digest the buckets completed since the last digest, rather
+                than only reporting those already digested.
+
+        Returns:
+            Per-route latency report over the latency window.
+        """
+        thresholds = parse_thresholds(self.config["slow-request-thresholds"])
+        now = datetime.now(timezone.utc)
+        cutoff = bucket_name(now - timedelta(minutes=self.config["latency-window"]))
+        buckets = {name: summary for name, summary in self._stored.latency_buckets.items() if name >= cutoff}
+
+        latest = {}
+        # A bucket is only completed when the next one starts, so the workload is
+        # listed once per bucket.
+        if current or (digest and self._stored.latency_digested != bucket_name(now)):
+            self._stored.latency_digested = bucket_name(now)
+            latest = self._digest_latency_logs(container, buckets, cutoff, thresholds, current)
+
+        self._stored.latency_buckets = buckets
+        return report(merge([*(json.loads(summary) for summary in buckets.values()), latest]), thresholds)
 
     def _validate_pebble_plan(self, container):
         """Validate pebble plan.
@@ -149,14 +387,198 @@ class AirbyteUIK8sOperatorCharm(CharmBase):
         """
         container = self.unit.get_container(self.name)
         if not container.can_connect():
-            event.defer()
+            event.fail("Unable to connect to the workload container, retry once it is ready.")
             return
 
         self.unit.status = MaintenanceStatus("restarting application")
-        container.restart(self.name)
+        self._drain(container, self.config["drain-timeout"])
+        self._undrain(container)
+        container.start(self.name)
 
         event.set_results({"result": "UI successfully restarted"})
 
+    def _drain(self, container, timeout):
+        """Drain the connections to nginx and stop it.
+
+        The readiness check is failed first so that the ingress stops routing requests
+        to the unit. nginx is then asked to quit, which lets in-flight requests complete
+        and closes idle keepalive connections, within the drain timeout shared by both
+        steps. Pebble stops the service if it is still running afterwards.
+
+        Args:
+            container: application container
+            timeout: drain timeout, in seconds
+        """
+        try:
+            if not container.get_service(self.name).is_running():
+                return
+
+            polls = max(int(timeout / DRAIN_POLL_INTERVAL), 1)
+            container.push(NGINX_DRAIN_MARKER_PATH, "", make_dirs=True)
+            self._stored.draining = True
+            # Waiting for the readiness check takes at most half of the drain timeout.
+            polls -= wait_for(lambda: container.get_check("ready").status != CheckStatus.UP, (polls + 1) // 2)
+            container.exec(["nginx", "-s", "quit"]).wait()
+            wait_for(lambda: not container.get_service(self.name).is_running(), polls)
+
+            if container.get_service(self.name).is_running():
+                logger.warning("nginx did not quit within the drain timeout")
+                container.stop(self.name)
+        except (ModelError, pebble.Error) as err:
+            logger.warning(f"unable to drain connections: {err}")
+
+    def _undrain(self, container):
+        """Remove the drain marker, so that nginx reports itself as ready again.
+
+        Args:
+            container: application container
+        """
+        container.remove_path(NGINX_DRAIN_MARKER_PATH, recursive=True)
+        self._stored.draining = False
+
+    def _on_get_profiles(self, event):
+        """Get hook profiles action handler.
+
+        Args:
+            event: The event triggered by the get-profiles action
+        """
+        profiles = self._profiles.load(event.params["count"], event.params["top"], raw=event.params["format"] == "raw")
+        event.set_results({"count": len(profiles), "profiles": json.dumps(profiles)})
+
+    def _digest_latency_logs(self, container, buckets, cutoff, thresholds, current):
+        """Summarize the completed latency log buckets and remove them from the workload.
+
+        Args:
+            container: application container
+            buckets: dict of bucket names to summaries, updated with the completed buckets.
+            cutoff: name of the oldest bucket in the latency window.
+            thresholds: slow request thresholds in milliseconds, by route.
+            current: whether to summarize the bucket nginx is writing to.
+
+        Returns:
+            Summary of the bucket nginx is writing to, empty unless requested.
+        """
+        names = self._latency_logs(container)
+        latest = {}
+        for name in names:
+            path = f"{LATENCY_LOG_DIR}/{name}.log"
+            try:
+                if name == names[-1] and name >= cutoff:
+                    # nginx is still writing to the latest bucket.
+                    if current:
+                        latest = summarize_log(container.pull(path).read(), thresholds)
+                    continue
+                if name >= cutoff:
+                    buckets[name] = json.dumps(summarize_log(container.pull(path).read(), thresholds))
+                container.remove_path(path)
+            except (pebble.PathError, pebble.APIError, pebble.ConnectionError) as err:
+                logger.warning(f"unable to digest latency log {name}: {err}")
+        return latest
+
+    def _latency_logs(self, container):
+        """List the latency log buckets written by nginx.
+
+        Args:
+            container: application container
+
+        Returns:
+            Sorted list of bucket names.
+        """
+        try:
+            files = container.list_files(LATENCY_LOG_DIR, pattern="*.log")
+        except (pebble.APIError, pebble.ConnectionError):
+            return []
+
+        names = []
+        for file in files:
+            name = file.name[: -len(".log")]
+            if re.fullmatch(r"\d{4}-\d\d-\d\dT\d{4}", name):
+                names.append(name)
+            else:
+                # Requests logged without a timestamp bucket.
+                container.remove_path(file.path)
+        return sorted(names)
+
+    def _on_latency_report(self, event):
+        """Latency report action handler.
+
+        Args:
+            event: The event triggered by the latency-report action
+        """
+        container = self.unit.get_container(self.name)
+        if not container.can_connect():
+            event.fail("unable to connect to the workload container")
+            return
+
+        try:
+            latency_report = self._latency_report(container, current=True)
+        except ValueError as err:
+            event.fail(str(err))
+            return
+        buckets = {name: json.loads(summary) for name, summary in self._stored.latency_buckets.items()}
+        event.set_results(
+            {
+                "window-minutes": self.config["latency-window"],
+                "routes": json.dumps(latency_report),
+                "readiness-probe-history": json.dumps(history(buckets, READINESS_PROBE_ROUTE)),
+            }
+        )
+
+    def _on_analyze_logs(self, event):
+        """Analyze logs action handler.
+
+        Args:
+            event: The event triggered by the analyze-logs action
+        """
+        # Only this action reads the access logs: their parser is imported on demand.
+        from access_log import analyze  # pylint: disable=import-outside-toplevel
+
+        container = self.unit.get_container(self.name)
+        if not container.can_connect():
+            event.fail("unable to connect to the workload container")
+            return
+
+        since = datetime.now(timezone.utc) - timedelta(minutes=event.params["window"])
+        try:
+            files = container.list_files(NGINX_LOG_DIR, pattern=f"{NGINX_ACCESS_LOG}*")
+            # Logs last written before the window only hold older requests.
+            modified = {file.path: file.last_modified.timestamp() for file in files}
+            paths = sorted((path for path in modified if modified[path] >= since.timestamp()), key=modified.get)
+            analysis = analyze(self._access_log_records(container, paths), since, event.params["top"])
+        except (pebble.PathError, pebble.APIError, pebble.ConnectionError) as err:
+            event.fail(f"unable to read the access logs: {err}")
+            return
+
+        event.set_results(
+            {
+                "window-minutes": event.params["window"],
+                "requests": analysis["requests"],
+                "top-paths": json.dumps(analysis["top_paths"]),
+                "status-classes": json.dumps(analysis["status_classes"]),
+                "peak-minute": json.dumps(analysis["peak_minute"]),
+                "unique-clients": analysis["unique_clients"],
+            }
+        )
+
+    def _access_log_records(self, container, paths):
+        """Stream the records of access logs, one log at a time.
+
+        Pebble spools each log to a local temporary file, which is memory-mapped
+        unless compressed.
+
+        Args:
+            container: application container
+            paths: paths of the access logs.
+
+        Yields:
+            The parsed records.
+        """
+        from access_log import read_records  # pylint: disable=import-outside-toplevel
+
+        for path in paths:
+            with container.pull(path, encoding=None) as stream:
+                yield from read_records(stream, compressed=path.endswith(".gz"))
+
     def _validate(self):
         """Validate that configuration and relations are valid and ready.
 
@@ -166,44 +588,156 @@ class AirbyteUIK8sOperatorCharm(CharmBase):
         if not self._state.is_ready():
             raise ValueError("peer relation not ready")
 
-        if not self._state.airbyte_server:
+        airbyte_server = self._state.airbyte_server
+        if not airbyte_server:
             raise ValueError(f"{AIRBYTE_SERVER_RELATION} relation: not available")
 
-        if not self._state.airbyte_server["status"] == "ready":
+        if not airbyte_server["status"] == "ready":
             raise ValueError(f"{AIRBYTE_SERVER_RELATION} relation: server is not ready")
 
+        for option, choices in CONFIG_CHOICES.items():
+            if self.config[option] not in choices:
+                raise ValueError(f"config: invalid {option} {self.config[option]!r}")
+
+        for option, (low, high) in CONFIG_RANGES.items():
+            if not low <= self.config[option] <= high:
+                raise ValueError(f"config: {option} must be between {low} and {high}")
+
+        compute_resources(self.config)
+        parse_thresholds(self.config["slow-request-thresholds"])
+        parse_rate_limits(self.config["rate-limits"])
+        parse_trusted_proxies(self.config["trusted-proxies"])
+        parse_keycloak_host(self.config["keycloak-internal-host"])
+        for option in ("rate-limit-key", "connector-builder-affinity-key", "canary-key"):
+            client_key(option, self.config[option])
+
+    def _workload_tls(self):
+        """Get the certificate and private key used to terminate TLS in the pod.
+
+        Returns:
+            Tuple of (certificate, private key), or None if TLS is not enabled.
+
+        Raises:
+            ValueError: in case the secret is not accessible or incomplete.
+        """
+        secret_id = self.config.get("workload-tls-secret")
+        if not secret_id:
+            return None
+
+        try:
+            content = self.model.get_secret(id=secret_id).get_content(refresh=True)
+        except (SecretNotFoundError, ModelError) as err:
+            raise ValueError("config: workload-tls-secret is not accessible") from err
+
+        if not content.get("certificate") or not content.get("private-key"):
+            raise ValueError("config: workload-tls-secret must contain certificate and private-key")
+
+        return content["certificate"], content["private-key"]
+
+    def _patch_resources(self):
+        """Apply the compute resources set by the operator to the pod spec.
+
+        The pod spec, which requires the application to be trusted, is left as is until
+        resources are set, and patched once more to remove them after they are unset.
+        Kubernetes rolls the pods out again, this one included, when the resources change.
+
+        Raises:
+            ValueError: if the charm is not allowed to patch the pod spec.
+            ConnectionError: if the Kubernetes API is unreachable or fails the requests.
+        """
+        resources = compute_resources(self.config)
+        if not requested(resources) and not self._stored.resources_patched:
+            return
+
+        patch_resources(kubernetes_client(self.app.name), self.model.name, self.app.name, self.name, resources)
+        self._stored.resources_patched = requested(resources)
+
+    def _nginx_context(self, peer_data, workload_tls):
+        """Build the context used to render the nginx configuration.
+
+        Args:
+            peer_data: Airbyte server and canary relation state shared by the leader.
+            workload_tls: certificate and private key nginx terminates TLS with, if any.
+
+        Returns:
+            Dict of values made available to the nginx templates.
+        """
+        nginx_context = build_context(
+            self.config,
+            peer_data["airbyte_server"],
+            tls=bool(workload_tls),
+            canary=peer_data["airbyte_server_canary"],
+        )
+        if nginx_context["api_canary_host"] and not nginx_context["trusted_proxies"]:
+            logger.warning("canary: trusted-proxies is not set, clients split by address all go to the same server")
+        return nginx_context
+
     @log_event_handler(logger)
     def _update(self, event):
         """Update the Airbyte UI configuration and replan its execution.
 
+        The reconcile is idempotent: events seen while it cannot complete are not
+        deferred, but leave a single pending marker, so that the next pebble-ready,
+        relation, config or update-status event reconciles once for all of them.
+
         Args:
             event: The event triggered when the relation changed.
         """
+        # Any reconciliation requires the next status update to be a full check.
+        self._stored.verified_layer = None
+        if self._stored.reconcile_pending and self.unit.is_leader() and self._state.is_ready():
+            self.airbyte_server.refresh()
+            self.airbyte_server_canary.refresh()
+
         try:
             self._validate()
+            workload_tls = self._workload_tls()
+            if self.unit.is_leader():
+                self._patch_resources()
         except ValueError as err:
             self.unit.status = BlockedStatus(str(err))
             return
+        except ConnectionError as err:
+            self.unit.status = WaitingStatus(str(err))
+            self._stored.reconcile_pending = True
+            return
 
-        server_svc = self._state.airbyte_server["name"]
+        peer_data = self._peer_workload_data()
+        airbyte_server = peer_data["airbyte_server"]
+        server_svc = airbyte_server["name"]
+        nginx_context = self._nginx_context(peer_data, workload_tls)
+        nginx_conf = render("nginx.conf.j2", nginx_context)
+        default_conf = render("default.conf.j2", nginx_context)
         context = {
             "AIRBYTE_VERSION": AIRBYTE_VERSION,
             "API_URL": "/api/v1/",
             "AIRBYTE_EDITION": "community",
             "AIRBYTE_SERVER_HOST": f"{server_svc}:{INTERNAL_API_PORT}",
             "INTERNAL_API_HOST": f"{server_svc}:{INTERNAL_API_PORT}",
-            "CONNECTOR_BUILDER_API_HOST": f"{server_svc}:{CONNECTOR_BUILDER_API_PORT}",
+            "CONNECTOR_BUILDER_API_HOST": nginx_context["connector_builder_endpoints"][0],
             "CONNECTOR_BUILDER_API_URL": "/connector-builder-api",
-            "KEYCLOAK_INTERNAL_HOST": "localhost",
             "PORT": WEB_UI_PORT,
+            "NGINX_CONFIG_HASH": config_hash(nginx_conf, default_conf, *(workload_tls or ())),
         }
+        if nginx_context["keycloak_host"]:
+            context["KEYCLOAK_INTERNAL_HOST"] = nginx_context["keycloak_host"]
 
-        self.model.unit.set_ports(WEB_UI_PORT)
+        self.model.unit.set_ports(*((WEB_UI_PORT, WEB_UI_TLS_PORT) if workload_tls else (WEB_UI_PORT,)))
         container = self.unit.get_container(self.name)
         if not container.can_connect():
-            event.defer()
+            self._stored.reconcile_pending = True
             return
 
+        if workload_tls:
+            certificate, private_key = workload_tls
+            container.push(NGINX_TLS_CERT_PATH, certificate, make_dirs=True)
+            container.push(NGINX_TLS_KEY_PATH, private_key, make_dirs=True, permissions=0o600)
+        container.push(NGINX_CONF_PATH, nginx_conf, make_dirs=True)
+        container.push(NGINX_DEFAULT_CONF_PATH, default_conf, make_dirs=True)
+        if self._stored.draining:
+            # A unit drained by a stop that did not terminate it serves again once replanned.
+            self._undrain(container)
+
         pebble_layer = {
             "summary": "airbyte layer",
             "services": {
@@ -216,21 +750,43 @@ class AirbyteUIK8sOperatorCharm(CharmBase):
                     # config forces replanning to restart the service.
                     "environment": context,
                     "on-check-failure": {"up": "ignore"},
+                    # nginx exits successfully only when asked to quit while draining.
+                    "on-success": "ignore",
                 },
             },
             "checks": {
+                # Both answered by nginx from memory, failed while draining.
                 "up": {
                     "override": "replace",
                     "period": "10s",
-                    "http": {"url": f"http://localhost:{WEB_UI_PORT}"},
-                }
+                    "http": {"url": f"http://localhost:{WEB_UI_PORT}/healthz"},
+                },
+                "ready": {
+                    "override": "replace",
+                    "level": "ready",
+                    "period": "5s",
+                    "threshold": 1,
+                    "http": {"url": f"http://localhost:{WEB_UI_PORT}/healthz"},
+                },
+                # The Airbyte server, through the probe cached by nginx. It does not make the
+                # unit unready, as nginx still serves the UI and answers API clients to back off.
+                # The check reaches the server once per interval: its result is cached as long.
+                "api": {
+                    "override": "replace",
+                    "period": f"{self.config['health-probe-interval']}s",
+                    "http": {"url": f"http://localhost:{WEB_UI_PORT}/readyz"},
+                },
             },
         }
         container.add_layer(self.name, pebble_layer, combine=True)
         container.replan()
+        self._update_nginx_route(bool(workload_tls))
+        self._stored.applied_layer = config_hash(json.dumps(pebble_layer, sort_keys=True))
+        self._stored.reconcile_pending = False
+        self._stored.reconciled_peer_data = json.dumps(peer_data, sort_keys=True)
 
         self.unit.status = MaintenanceStatus("replanning application")
 
 
 if __name__ == "__main__":  # pragma: nocover
-    main.main(AirbyteUIK8sOperatorCharm)  # type: ignore
+    run(main.main, AirbyteUIK8sOperatorCharm)  # type: ignore
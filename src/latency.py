@@ -0,0 +1,269 @@
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Per-route latency digest of the requests served by nginx."""
+
+import math
+from datetime import timedelta
+
+from literals import LATENCY_BUCKET_MINUTES, ROUTES
+
+# Latencies are counted in logarithmic bins, each about 10% wider than the previous.
+BIN_BASE = 1.1
+# nginx cache statuses of the requests served from the cache.
+CACHE_HITS = ("HIT", "STALE", "UPDATING", "REVALIDATED")
+# Suffix of the routes served by the canary server, reported separately.
+CANARY_SUFFIX = "-canary"
+
+
+def parse_thresholds(value):
+    """Parse the slow request thresholds config option.
+
+    Args:
+        value: comma-separated list of `route=milliseconds`.
+
+    Returns:
+        Dict of route names to thresholds in milliseconds.
+
+    Raises:
+        ValueError: in case of an invalid route or threshold.
+    """
+    thresholds = {}
+    for item in filter(None, (item.strip() for item in value.split(","))):
+        route, _, milliseconds = item.partition("=")
+        if route not in ROUTES or not milliseconds.isdigit() or int(milliseconds) < 1:
+            raise ValueError(f"config: invalid slow-request-thresholds {item!r}")
+        thresholds[route] = int(milliseconds)
+    return thresholds
+
+
+def _digits_at_least(digits, strict=False):
+    """Build the alternatives of a regex matching digit strings of the same width.
+
+    Args:
+        digits: the digit string to compare to.
+        strict: whether to match only greater strings.
+
+    Returns:
+        List of regex alternatives matching strings greater than or equal to digits.
+    """
+    alternatives = [] if strict else [digits]
+    for index, digit in enumerate(digits):
+        if digit == "9":
+            continue
+        rest = len(digits) - index - 1
+        alternatives.append(f"{digits[:index]}[{int(digit) + 1}-9]" + (f"\\d{{{rest}}}" if rest else ""))
+    return alternatives
+
+
+def at_least_regex(threshold_ms):
+    """Build a regex matching nginx request times at least as long as a threshold.
+
+    nginx formats request times as seconds with a millisecond resolution, such as
+    `0.250` or `12.034`, and cannot compare them to a number.
+
+    Args:
+        threshold_ms: the threshold in milliseconds.
+
+    Returns:
+        The regex, without anchors.
+    """
+    seconds, milliseconds = divmod(threshold_ms, 1000)
+    whole = str(seconds)
+    longer = [f"[1-9]\\d{{{len(whole)},}}"] + _digits_at_least(whole, strict=True)
+    fraction = _digits_at_least(f"{milliseconds:03d}")
+    return f"(?:{'|'.join(longer)})\\.\\d{{3}}|{whole}\\.(?:{'|'.join(fraction)})"
+
+
+def bucket_name(moment):
+    """Get the name of the latency log bucket a moment falls in.
+
+    Args:
+        moment: a datetime in the timezone of the workload.
+
+    Returns:
+        The bucket name, as written by nginx.
+    """
+    moment -= timedelta(minutes=moment.minute % LATENCY_BUCKET_MINUTES)
+    return moment.strftime("%Y-%m-%dT%H%M")
+
+
+def summarize_log(log, thresholds):
+    """Summarize a latency log bucket.
+
+    Args:
+        log: latency log contents, with one `route request_time status limit_req_status
+            upstream_cache_status` line per request.
+        thresholds: slow request thresholds in milliseconds, by route.
+
+    Returns:
+        Dict of routes to a dict with a histogram of the latencies, the slow request
+        count, the server error count, the rate limited request count, and the count
+        of requests looked up in a cache and served from it.
+    """
+    summary = {}
+    for line in log.splitlines():
+        try:
+            route, request_time, status, *statuses = line.split(" ")
+            milliseconds = float(request_time) * 1000
+            status = int(status)
+        except ValueError:
+            continue
+
+        route_summary = summary.setdefault(route, _empty_summary())
+        latency_bin = str(math.ceil(math.log(milliseconds, BIN_BASE)) if milliseconds > 1 else 0)
+        route_summary["bins"][latency_bin] = route_summary["bins"].get(latency_bin, 0) + 1
+        threshold = _threshold(thresholds, route)
+        if threshold and milliseconds >= threshold:
+            route_summary["slow"] += 1
+        if status >= 500:
+            route_summary["errors"] += 1
+        if statuses[:1] == ["REJECTED"]:
+            route_summary["rejected"] += 1
+        cache_status = statuses[1] if len(statuses) > 1 else "-"
+        # Requests bypassing the cache, such as API writes, are not looked up in it.
+        if cache_status not in ("-", "BYPASS"):
+            route_summary["cache_lookups"] += 1
+            route_summary["cache_hits"] += cache_status in CACHE_HITS
+    return summary
+
+
+def _empty_summary():
+    """Build the summary of a route without requests.
+
+    Returns:
+        The summary.
+    """
+    return {"bins": {}, "slow": 0, "errors": 0, "rejected": 0, "cache_lookups": 0, "cache_hits": 0}
+
+
+def merge(summaries):
+    """Merge bucket summaries.
+
+    Args:
+        summaries: iterable of bucket summaries.
+
+    Returns:
+        The merged summary.
+    """
+    merged = {}
+    for summary in summaries:
+        for route, route_summary in summary.items():
+            target = merged.setdefault(route, _empty_summary())
+            for latency_bin, count in route_summary["bins"].items():
+                target["bins"][latency_bin] = target["bins"].get(latency_bin, 0) + count
+            target["slow"] += route_summary["slow"]
+            target["errors"] += route_summary.get("errors", 0)
+            target["rejected"] += route_summary.get("rejected", 0)
+            target["cache_lookups"] += route_summary.get("cache_lookups", 0)
+            target["cache_hits"] += route_summary.get("cache_hits", 0)
+    return merged
+
+
+def percentile(bins, fraction):
+    """Estimate a latency percentile from a histogram.
+
+    Args:
+        bins: dict of latency bins to request counts.
+        fraction: the percentile, e.g. 0.99.
+
+    Returns:
+        The upper bound of the bin holding the percentile, in milliseconds.
+    """
+    total = sum(bins.values())
+    rank = max(math.ceil(total * fraction), 1)
+    seen = 0
+    for latency_bin in sorted(bins, key=int):
+        seen += bins[latency_bin]
+        if seen >= rank:
+            return round(BIN_BASE ** int(latency_bin), 1)
+    return 0.0
+
+
+def report(summary, thresholds):
+    """Build the per-route latency report of a summary.
+
+    Args:
+        summary: merged bucket summary.
+        thresholds: slow request thresholds in milliseconds, by route.
+
+    Returns:
+        Dict of routes to their request count, latency percentiles, slow requests,
+        server error rate, requests rejected by the rate limits and cache hit ratio,
+        None for routes without cache lookups.
+    """
+    latency_report = {}
+    for route, route_summary in sorted(summary.items()):
+        requests = sum(route_summary["bins"].values())
+        cache_lookups = route_summary.get("cache_lookups", 0)
+        latency_report[route] = {
+            "requests": requests,
+            "p50_ms": percentile(route_summary["bins"], 0.50),
+            "p95_ms": percentile(route_summary["bins"], 0.95),
+            "p99_ms": percentile(route_summary["bins"], 0.99),
+            "slow": route_summary["slow"],
+            "slow_threshold_ms": _threshold(thresholds, route),
+            "error_rate": round(route_summary.get("errors", 0) / requests, 4) if requests else 0.0,
+            "rate_limited": route_summary.get("rejected", 0),
+            "cache_hit_ratio": round(route_summary.get("cache_hits", 0) / cache_lookups, 4) if cache_lookups else None,
+        }
+    return latency_report
+
+
+def history(buckets, route):
+    """Build the latency history of a route, one report per bucket.
+
+    Args:
+        buckets: dict of bucket names to summaries.
+        route: the route.
+
+    Returns:
+        List of the reports of the route, with their bucket name, oldest first.
+    """
+    return [
+        {"bucket": name, **report(summary, {})[route]} for name, summary in sorted(buckets.items()) if route in summary
+    ]
+
+
+def slow_routes(latency_report):
+    """Summarize the routes whose p95 latency is over their slow request threshold.
+
+    Args:
+        latency_report: per-route latency report.
+
+    Returns:
+        Status message listing the slow routes, empty if there are none.
+    """
+    slow = [
+        f"{route} p95 {_duration(route_report['p95_ms'])}"
+        for route, route_report in latency_report.items()
+        if route_report["slow_threshold_ms"] and route_report["p95_ms"] >= route_report["slow_threshold_ms"]
+    ]
+    return f"slow: {', '.join(slow)}" if slow else ""
+
+
+def _threshold(thresholds, route):
+    """Get the slow request threshold of a route, the canary sharing the one of its route.
+
+    Args:
+        thresholds: slow request thresholds in milliseconds, by route.
+        route: the route.
+
+    Returns:
+        The threshold in milliseconds, None if the route has none.
+    """
+    if route.endswith(CANARY_SUFFIX):
+        route = route[: -len(CANARY_SUFFIX)]
+    return thresholds.get(route)
+
+
+def _duration(milliseconds):
+    """Format a duration for a status message.
+
+    Args:
+        milliseconds: the duration in milliseconds.
+
+    Returns:
+        The formatted duration.
+    """
+    return f"{milliseconds / 1000:.1f}s" if milliseconds >= 1000 else f"{milliseconds:.0f}ms"
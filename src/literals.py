@@ -4,7 +4,66 @@
 """Charm literals."""
 
 WEB_UI_PORT = 80
+WEB_UI_TLS_PORT = 443
 INTERNAL_API_PORT = 8001
 CONNECTOR_BUILDER_API_PORT = 80
+# Local port answering API requests while the Airbyte server is unavailable.
+API_UNAVAILABLE_PORT = 8081
 AIRBYTE_VERSION = "1.5.0"
 AIRBYTE_SERVER_RELATION = "airbyte-server"
+# Server receiving a share of the API requests, to compare versions before upgrading.
+AIRBYTE_SERVER_CANARY_RELATION = "airbyte-server-canary"
+# Keys of the peer app databag the workload configuration depends on. Unit-local
+# data, such as the applied layer or the health history, is kept in StoredState.
+PEER_WORKLOAD_KEYS = ("airbyte_server", "airbyte_server_canary")
+
+# Number of update-status intervals served from the cached status before the
+# Pebble plan and relations are fully checked again.
+FULL_STATUS_CHECK_INTERVAL = 12
+
+NGINX_CONF_PATH = "/etc/nginx/nginx.conf"
+NGINX_DEFAULT_CONF_PATH = "/etc/nginx/conf.d/default.conf"
+NGINX_TLS_CERT_PATH = "/etc/nginx/tls/tls.crt"
+NGINX_TLS_KEY_PATH = "/etc/nginx/tls/tls.key"
+# nginx fails the readiness endpoint while this file exists.
+NGINX_DRAIN_MARKER_PATH = "/var/run/nginx-draining"
+# Seconds between two checks of the workload while draining connections.
+DRAIN_POLL_INTERVAL = 0.5
+# Most seconds spent draining when the unit stops: Kubernetes kills pods 30 seconds
+# after asking them to terminate, by default, whether the stop hook completed or not.
+STOP_DRAIN_TIMEOUT = 25
+
+# Routes requests are rate limited and their latency broken down by.
+ROUTES = ("static", "api", "connector-builder", "auth")
+# nginx writes the latency log in buckets of this many minutes, digested and
+# removed by the charm. The bucket regexes in default.conf.j2 depend on it.
+LATENCY_BUCKET_MINUTES = 5
+LATENCY_LOG_DIR = "/var/log/nginx/latency"
+# Route the Airbyte server probes of the readiness checks are logged under.
+READINESS_PROBE_ROUTE = "readiness-probe"
+# The access log, and its rotations such as access.log.1 and access.log.2.gz.
+NGINX_LOG_DIR = "/var/log/nginx"
+NGINX_ACCESS_LOG = "access.log"
+
+# Acceptable values of the enumerated config options.
+CONFIG_CHOICES = {
+    "connector-builder-load-balancing": ("round-robin", "least-conn", "consistent-hash"),
+    "api-compression": ("off", "gzip", "brotli"),
+}
+
+# Inclusive bounds of the numeric config options.
+CONFIG_RANGES = {
+    "connector-builder-connect-timeout": (1, 75),
+    "connector-builder-read-timeout": (1, 86400),
+    "api-compression-level": (1, 9),
+    "api-compression-min-length": (0, 1048576),
+    "drain-timeout": (1, 300),
+    "api-retry-after": (1, 300),
+    "api-stale-cache-max-age": (0, 86400),
+    "latency-window": (LATENCY_BUCKET_MINUTES, 1440),
+    "canary-weight": (0, 100),
+    "health-probe-interval": (1, 300),
+    "profile-retention": (1, 1000),
+}
+
+NGINX_BROTLI_MODULE = "/usr/lib/nginx/modules/ngx_http_brotli_filter_module.so"
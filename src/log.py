@@ -5,6 +5,8 @@
 
 import functools
 
+from profiling import handler_span
+
 
 def log_event_handler(logger):
     """Log with the provided logger when a event handler method is executed.
@@ -36,11 +38,13 @@ def log_event_handler(logger):
             Returns:
                 Decorated method.
             """
-            logger.info(f"* running {self.__class__.__name__}.{method.__name__}")
+            name = f"{self.__class__.__name__}.{method.__name__}"
+            logger.info(f"* running {name}")
             try:
-                return method(self, event)
+                with handler_span(name):
+                    return method(self, event)
             finally:
-                logger.info(f"* completed {self.__class__.__name__}.{method.__name__}")
+                logger.info(f"* completed {name}")
 
         return decorated
 
@@ -0,0 +1,239 @@
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Render the nginx configuration served by the workload."""
+
+import hashlib
+import ipaddress
+import math
+import re
+from pathlib import Path
+
+from latency import at_least_regex, parse_thresholds
+from literals import (
+    AIRBYTE_VERSION,
+    API_UNAVAILABLE_PORT,
+    CONNECTOR_BUILDER_API_PORT,
+    INTERNAL_API_PORT,
+    LATENCY_LOG_DIR,
+    NGINX_BROTLI_MODULE,
+    NGINX_DRAIN_MARKER_PATH,
+    NGINX_TLS_CERT_PATH,
+    NGINX_TLS_KEY_PATH,
+    ROUTES,
+    WEB_UI_PORT,
+    WEB_UI_TLS_PORT,
+)
+from resources import compute_resources, worker_processes
+
+TEMPLATES_DIR = Path(__file__).resolve().parent.parent / "templates"
+
+# nginx request rate, per second or per minute.
+RATE_PATTERN = re.compile(r"(\d+)r/([sm])")
+# Host name, IPv4 or bracketed IPv6 address, with an optional port.
+HOST_PATTERN = re.compile(r"([A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*|\[[0-9A-Fa-f:.]+\])(?::(\d{1,5}))?")
+
+
+def build_context(config, airbyte_server, tls=False, canary=None):
+    """Build the context used to render the nginx configuration.
+
+    Args:
+        config: charm configuration.
+        airbyte_server: Airbyte server relation state.
+        tls: whether nginx terminates TLS.
+        canary: Airbyte canary server relation state.
+
+    Returns:
+        Dict of values made available to the nginx templates.
+    """
+    server_svc = airbyte_server["name"]
+    # The canary only receives requests once ready, and with a weight.
+    canary_ready = bool(canary and canary["name"] and canary["status"] == "ready" and config["canary-weight"])
+    connector_builder_endpoints = airbyte_server.get("connector_builder_endpoints") or [
+        f"{server_svc}:{CONNECTOR_BUILDER_API_PORT}"
+    ]
+    return {
+        "airbyte_version": AIRBYTE_VERSION,
+        "port": WEB_UI_PORT,
+        "tls": tls,
+        "tls_port": WEB_UI_TLS_PORT,
+        "tls_certificate": NGINX_TLS_CERT_PATH,
+        "tls_certificate_key": NGINX_TLS_KEY_PATH,
+        "api_server_host": f"{server_svc}:{INTERNAL_API_PORT}",
+        "api_canary_host": f"{canary['name']}:{INTERNAL_API_PORT}" if canary_ready else None,
+        "canary_weight": config["canary-weight"],
+        "canary_key": client_key("canary-key", config["canary-key"]),
+        "connector_builder_endpoints": connector_builder_endpoints,
+        "connector_builder_load_balancing": config["connector-builder-load-balancing"],
+        "connector_builder_affinity_key": client_key(
+            "connector-builder-affinity-key", config["connector-builder-affinity-key"]
+        ),
+        "connector_builder_connect_timeout": config["connector-builder-connect-timeout"],
+        "connector_builder_read_timeout": config["connector-builder-read-timeout"],
+        "keycloak_host": parse_keycloak_host(config["keycloak-internal-host"]),
+        "api_compression": config["api-compression"],
+        "api_compression_level": config["api-compression-level"],
+        "api_compression_min_length": config["api-compression-min-length"],
+        "api_upstream_compression": config["api-upstream-compression"],
+        "api_unavailable_port": API_UNAVAILABLE_PORT,
+        "api_retry_after": config["api-retry-after"],
+        "api_stale_cache_max_age": config["api-stale-cache-max-age"],
+        "brotli_module": NGINX_BROTLI_MODULE,
+        "drain_marker": NGINX_DRAIN_MARKER_PATH,
+        "drain_timeout": config["drain-timeout"],
+        "health_probe_interval": config["health-probe-interval"],
+        "worker_processes": worker_processes(compute_resources(config)),
+        "latency_log_dir": LATENCY_LOG_DIR,
+        "rate_limits": parse_rate_limits(config["rate-limits"]),
+        "rate_limit_key": client_key("rate-limit-key", config["rate-limit-key"]),
+        "trusted_proxies": parse_trusted_proxies(config["trusted-proxies"]),
+        "slow_request_patterns": {
+            route: at_least_regex(threshold)
+            for route, threshold in parse_thresholds(config["slow-request-thresholds"]).items()
+        },
+    }
+
+
+def parse_rate_limits(value):
+    """Parse the rate limits config option.
+
+    Args:
+        value: comma-separated list of `route=rate[:burst][:nodelay]`.
+
+    Returns:
+        Dict of route names to dicts with the rate, burst, nodelay and the seconds after
+        which a rejected client can retry.
+
+    Raises:
+        ValueError: in case of an invalid route or rate limit.
+    """
+    limits = {}
+    for item in filter(None, (item.strip() for item in value.split(","))):
+        route, _, spec = item.partition("=")
+        rate, *options = spec.split(":")
+        nodelay = options[-1:] == ["nodelay"]
+        burst = options[:-1] if nodelay else options
+        match = RATE_PATTERN.fullmatch(rate)
+        valid_burst = len(burst) <= 1 and all(size.isdigit() for size in burst)
+        if route not in ROUTES or not match or int(match.group(1)) < 1 or not valid_burst:
+            raise ValueError(f"config: invalid rate-limits {item!r}")
+
+        per_second = int(match.group(1)) / (1 if match.group(2) == "s" else 60)
+        limits[route] = {
+            "rate": rate,
+            "burst": int(burst[0]) if burst else 0,
+            "nodelay": nodelay,
+            "retry_after": math.ceil(1 / per_second),
+        }
+    return limits
+
+
+def parse_trusted_proxies(value):
+    """Parse the trusted proxies config option.
+
+    Args:
+        value: comma-separated list of addresses or CIDR ranges.
+
+    Returns:
+        List of the networks, as strings.
+
+    Raises:
+        ValueError: in case of an invalid address or range.
+    """
+    networks = []
+    for item in filter(None, (item.strip() for item in value.split(","))):
+        try:
+            networks.append(str(ipaddress.ip_network(item, strict=False)))
+        except ValueError:
+            raise ValueError(f"config: invalid trusted-proxies {item!r}") from None
+    return networks
+
+
+def parse_keycloak_host(value):
+    """Parse the Keycloak internal host config option.
+
+    Args:
+        value: `host` or `host:port`, where the host is a name, an IPv4 address or a
+            bracketed IPv6 address.
+
+    Returns:
+        The address, or an empty string if unset.
+
+    Raises:
+        ValueError: in case of an invalid address.
+    """
+    value = value.strip()
+    if not value:
+        return ""
+    address = HOST_PATTERN.fullmatch(value)
+    if not address or (address.group(2) and not 0 < int(address.group(2)) < 65536):
+        raise ValueError(f"config: invalid keycloak-internal-host {value!r}")
+    if address.group(1).startswith("["):
+        try:
+            ipaddress.IPv6Address(address.group(1)[1:-1])
+        except ValueError:
+            raise ValueError(f"config: invalid keycloak-internal-host {value!r}") from None
+    return value
+
+
+def client_key(option, value):
+    """Get the nginx variable identifying clients.
+
+    Args:
+        option: name of the config option.
+        value: "ip", "authorization", "cookie=<name>" or "header=<name>".
+
+    Returns:
+        The nginx variable.
+
+    Raises:
+        ValueError: in case of an invalid key.
+    """
+    if value == "ip":
+        return "$binary_remote_addr"
+    if value == "authorization":
+        return "$http_authorization"
+    key = re.fullmatch(r"(cookie|header)=([\w-]+)", value)
+    if not key or (key.group(1) == "cookie" and "-" in key.group(2)):
+        raise ValueError(f"config: invalid {option} {value!r}")
+    if key.group(1) == "cookie":
+        return f"$cookie_{key.group(2)}"
+    return f"$http_{key.group(2).lower().replace('-', '_')}"
+
+
+def render(template, context):
+    """Render an nginx configuration template.
+
+    Args:
+        template: name of the template file in the templates directory.
+        context: values made available to the template.
+
+    Returns:
+        The rendered configuration.
+    """
+    # Only hooks that reconcile the workload render templates, so jinja2 is
+    # imported lazily to keep it off the import path of every other hook.
+    import jinja2  # pylint: disable=import-outside-toplevel
+
+    env = jinja2.Environment(
+        loader=jinja2.FileSystemLoader(TEMPLATES_DIR),
+        autoescape=False,  # nosec B701 - renders nginx configuration, not HTML.
+        keep_trailing_newline=True,
+        undefined=jinja2.StrictUndefined,
+    )
+    return env.get_template(template).render(**context)
+
+
+def config_hash(*configs):
+    """Compute a digest of rendered configuration files.
+
+    Args:
+        configs: rendered configuration contents.
+
+    Returns:
+        A hex digest that changes whenever any of the configurations change.
+    """
+    digest = hashlib.sha256()
+    for config in configs:
+        digest.update(config.encode())
+    return digest.hexdigest()
@@ -0,0 +1,221 @@
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Hook-level profiling helpers."""
+
+# Profiling is rarely enabled, so the cProfile, pstats and encoding modules are
+# imported lazily where they are used to keep them off the import path of hooks.
+# pylint: disable=import-outside-toplevel
+
+import contextlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+PROFILES_DIR = ".hook-profiles"
+
+# Profiling session of the running hook, if any.
+_session = None
+
+
+class ProfileStore:
+    """Bounded on-disk store of hook profiles.
+
+    Profiling is enabled by a marker file in the store directory, so that it can be
+    checked before the charm and its model are instantiated.
+    """
+
+    def __init__(self, directory):
+        """Construct.
+
+        Args:
+            directory: directory holding the profiles.
+        """
+        self.directory = Path(directory)
+        self._marker = self.directory / "enabled"
+
+    def configure(self, enabled, retention):
+        """Enable or disable profiling of the next hooks.
+
+        Args:
+            enabled: whether hooks should be profiled.
+            retention: number of profiles to keep.
+        """
+        if not enabled:
+            self._marker.unlink(missing_ok=True)
+            return
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._marker.write_text(json.dumps({"retention": retention}))
+        self.prune(retention)
+
+    def retention(self):
+        """Get the number of profiles to keep.
+
+        Returns:
+            The retention, or None when profiling is disabled.
+        """
+        try:
+            return json.loads(self._marker.read_text())["retention"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def save(self, profile, label, duration, handlers):
+        """Save a profile and drop the oldest ones beyond the retention.
+
+        Args:
+            profile: the cProfile.Profile of the hook.
+            label: name of the profiled hook or action.
+            duration: wall time of the hook in seconds.
+            handlers: list of (handler name, wall time in seconds) run by the hook.
+        """
+        name = f"{time.time_ns()}-{label}"
+        profile.dump_stats(str(self.directory / f"{name}.prof"))
+        metadata = {
+            "name": name,
+            "hook": label,
+            "duration": round(duration, 6),
+            "handlers": [{"handler": handler, "duration": round(elapsed, 6)} for handler, elapsed in handlers],
+        }
+        (self.directory / f"{name}.json").write_text(json.dumps(metadata))
+        self.prune(self.retention() or 0)
+
+    def prune(self, retention):
+        """Delete the oldest profiles beyond the retention.
+
+        Args:
+            retention: number of profiles to keep.
+        """
+        profiles = sorted(self.directory.glob("*.prof"))
+        for path in profiles[: max(len(profiles) - retention, 0)]:
+            path.unlink(missing_ok=True)
+            path.with_suffix(".json").unlink(missing_ok=True)
+
+    def load(self, count, top, raw=False):
+        """Load the most recent profiles, newest first.
+
+        Args:
+            count: maximum number of profiles to load.
+            top: number of functions to report, by cumulative time.
+            raw: whether to include the base64-packed profile instead of a summary.
+
+        Returns:
+            List of profile dicts.
+        """
+        import base64
+        import zlib
+
+        profiles = []
+        for path in sorted(self.directory.glob("*.prof"), reverse=True)[:count]:
+            try:
+                profile = json.loads(path.with_suffix(".json").read_text())
+            except (OSError, ValueError):
+                profile = {"name": path.stem}
+
+            if raw:
+                profile["data"] = base64.b64encode(zlib.compress(path.read_bytes())).decode()
+            else:
+                profile["functions"] = summarize(path, top)
+            profiles.append(profile)
+        return profiles
+
+
+def summarize(path, top):
+    """Summarize a profile by the functions with the highest cumulative time.
+
+    Args:
+        path: path of the profile file.
+        top: number of functions to report.
+
+    Returns:
+        List of function dicts sorted by cumulative time.
+    """
+    import io
+    import pstats
+
+    try:
+        stats = pstats.Stats(str(path), stream=io.StringIO())
+    except TypeError:
+        # The profile holds no function calls.
+        return []
+
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:top]  # type: ignore
+    return [
+        {
+            "function": f"{filename}:{line}({function})",
+            "ncalls": ncalls,
+            "tottime": round(tottime, 6),
+            "cumtime": round(cumtime, 6),
+        }
+        for (filename, line, function), (_, ncalls, tottime, cumtime, _) in rows
+    ]
+
+
+def hook_label():
+    """Get the name of the hook or action being dispatched.
+
+    Returns:
+        The hook or action name.
+    """
+    action = os.environ.get("JUJU_ACTION_NAME")
+    if action:
+        return f"{action}-action"
+    return os.path.basename(os.environ.get("JUJU_DISPATCH_PATH", "") or os.environ.get("JUJU_HOOK_NAME", "unknown"))
+
+
+def run(func, *args):
+    """Run the charm entrypoint, profiling it when enabled.
+
+    Args:
+        func: the charm entrypoint, usually `ops.main.main`.
+        args: arguments of the entrypoint.
+
+    Returns:
+        The result of the entrypoint.
+    """
+    global _session  # pylint: disable=global-statement
+
+    store = ProfileStore(Path(os.environ.get("JUJU_CHARM_DIR", ".")) / PROFILES_DIR)
+    if store.retention() is None:
+        return func(*args)
+
+    import cProfile
+
+    _session = []
+    profile = cProfile.Profile()
+    start = time.perf_counter()
+    profile.enable()
+    try:
+        return func(*args)
+    finally:
+        profile.disable()
+        try:
+            store.save(profile, hook_label(), time.perf_counter() - start, _session)
+        except OSError as err:
+            logger.warning(f"unable to save hook profile: {err}")
+        _session = None
+
+
+@contextlib.contextmanager
+def handler_span(name):
+    """Record the wall time of an event handler in the running profile.
+
+    Args:
+        name: name of the event handler.
+
+    Yields:
+        None.
+    """
+    if _session is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _session.append((name, time.perf_counter() - start))
@@ -7,26 +7,35 @@ import logging
 
 from ops import framework
 
-from literals import AIRBYTE_SERVER_RELATION
+from literals import AIRBYTE_SERVER_RELATION, CONNECTOR_BUILDER_API_PORT
 from log import log_event_handler
 
 logger = logging.getLogger(__name__)
 
 
 class AirbyteServer(framework.Object):
-    """Client for server:ui relation."""
+    """Client for server:ui relation.
 
-    def __init__(self, charm):
+    Attrs:
+        relation_name: name of the relation to the server.
+        state_key: name of the charm state the server is stored in.
+    """
+
+    def __init__(self, charm, relation_name=AIRBYTE_SERVER_RELATION, state_key="airbyte_server"):
         """Construct.
 
         Args:
             charm: The charm to attach the hooks to.
+            relation_name: name of the relation to the server.
+            state_key: name of the charm state the server is stored in.
         """
-        super().__init__(charm, AIRBYTE_SERVER_RELATION)
+        super().__init__(charm, relation_name)
         self.charm = charm
-        charm.framework.observe(charm.on.airbyte_server_relation_joined, self._on_airbyte_server_relation_changed)
-        charm.framework.observe(charm.on.airbyte_server_relation_changed, self._on_airbyte_server_relation_changed)
-        charm.framework.observe(charm.on.airbyte_server_relation_broken, self._on_airbyte_server_relation_broken)
+        self.relation_name = relation_name
+        self.state_key = state_key
+        charm.framework.observe(charm.on[relation_name].relation_joined, self._on_airbyte_server_relation_changed)
+        charm.framework.observe(charm.on[relation_name].relation_changed, self._on_airbyte_server_relation_changed)
+        charm.framework.observe(charm.on[relation_name].relation_broken, self._on_airbyte_server_relation_broken)
 
     @log_event_handler(logger)
     def _on_airbyte_server_relation_changed(self, event):
@@ -39,13 +48,11 @@ class AirbyteServer(framework.Object):
             return
 
         if not self.charm._state.is_ready():
-            event.defer()
+            # The relation data is read again by the reconcile once the peer relation is up.
+            self.charm._stored.reconcile_pending = True
             return
 
-        self.charm._state.airbyte_server = {
-            "name": event.relation.data[event.app].get("server_name"),
-            "status": event.relation.data[event.app].get("server_status"),
-        }
+        setattr(self.charm._state, self.state_key, server_state(event.relation.data[event.app]))
         self.charm._update(event)
 
     @log_event_handler(logger)
@@ -59,8 +66,63 @@ class AirbyteServer(framework.Object):
             return
 
         if not self.charm._state.is_ready():
-            event.defer()
+            self.charm._stored.reconcile_pending = True
             return
 
-        self.charm._state.airbyte_server = None
+        setattr(self.charm._state, self.state_key, None)
         self.charm._update(event)
+
+    def refresh(self):
+        """Copy the current server relation data into the charm state.
+
+        Used by the reconcile in place of the relation events seen before the peer
+        relation was ready.
+        """
+        relation = self.model.get_relation(self.relation_name)
+        if relation is None or relation.app is None:
+            setattr(self.charm._state, self.state_key, None)
+            return
+
+        setattr(self.charm._state, self.state_key, server_state(relation.data[relation.app]))
+
+
+def server_state(data):
+    """Build the charm state of the Airbyte server.
+
+    Args:
+        data: server application relation data.
+
+    Returns:
+        Dict with the server name, status and connector builder endpoints.
+    """
+    return {
+        "name": data.get("server_name"),
+        "status": data.get("server_status"),
+        "connector_builder_endpoints": connector_builder_endpoints(data),
+    }
+
+
+def connector_builder_endpoints(data):
+    """Get the connector builder endpoints advertised by the server.
+
+    The server may advertise the connector builder replicas explicitly through
+    `connector_builder_replicas` (a comma-separated list of `host:port`), or a
+    dedicated service through `connector_builder_host` and `connector_builder_port`.
+    Otherwise the connector builder is assumed to be served by the API server.
+
+    Args:
+        data: server application relation data.
+
+    Returns:
+        List of `host:port` connector builder endpoints.
+    """
+    replicas = data.get("connector_builder_replicas")
+    if replicas:
+        return [replica.strip() for replica in replicas.split(",") if replica.strip()]
+
+    host = data.get("connector_builder_host") or data.get("server_name")
+    if not host:
+        return []
+
+    port = data.get("connector_builder_port") or CONNECTOR_BUILDER_API_PORT
+    return [f"{host}:{port}"]
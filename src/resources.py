@@ -0,0 +1,232 @@
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Kubernetes compute resources of the workload container."""
+
+import logging
+import math
+import re
+
+logger = logging.getLogger(__name__)
+
+CPU_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(m?)")
+MEMORY_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(Ki|Mi|Gi|Ti|k|M|G|T)?")
+MEMORY_UNITS = {
+    None: 1,
+    "k": 10**3,
+    "M": 10**6,
+    "G": 10**9,
+    "T": 10**12,
+    "Ki": 2**10,
+    "Mi": 2**20,
+    "Gi": 2**30,
+    "Ti": 2**40,
+}
+
+
+def cpu_cores(value):
+    """Parse a Kubernetes CPU quantity.
+
+    Args:
+        value: the quantity, in cores or millicores such as `500m`.
+
+    Returns:
+        The number of cores.
+
+    Raises:
+        ValueError: in case of an invalid quantity.
+    """
+    match = CPU_PATTERN.fullmatch(value)
+    if not match:
+        raise ValueError(f"invalid CPU quantity {value!r}")
+    return float(match.group(1)) / (1000 if match.group(2) else 1)
+
+
+def memory_bytes(value):
+    """Parse a Kubernetes memory quantity.
+
+    Args:
+        value: the quantity, in bytes or with a unit suffix such as `512Mi`.
+
+    Returns:
+        The number of bytes.
+
+    Raises:
+        ValueError: in case of an invalid quantity.
+    """
+    match = MEMORY_PATTERN.fullmatch(value)
+    if not match:
+        raise ValueError(f"invalid memory quantity {value!r}")
+    return int(float(match.group(1)) * MEMORY_UNITS[match.group(2)])
+
+
+PARSERS = {"cpu": cpu_cores, "memory": memory_bytes}
+
+
+def requested(resources):
+    """Check whether any compute resource requirement is set.
+
+    Args:
+        resources: compute resource requirements, as built by `compute_resources`.
+
+    Returns:
+        True if a request or limit is set.
+    """
+    return any(value for quantities in resources.values() for value in quantities.values())
+
+
+def compute_resources(config):
+    """Build the compute resource requirements of the workload container.
+
+    Args:
+        config: charm configuration.
+
+    Returns:
+        Dict of `requests` and `limits` to dicts of resource names to quantities,
+        None where the option is unset.
+
+    Raises:
+        ValueError: in case of an invalid quantity, or of a request over its limit.
+    """
+    resources = {"requests": {}, "limits": {}}
+    for resource, parse in PARSERS.items():
+        for kind in resources:
+            option = f"{resource}-{kind[:-1]}"
+            value = config[option] or None
+            if value:
+                try:
+                    parse(value)
+                except ValueError as err:
+                    raise ValueError(f"config: {option}: {err}") from err
+            resources[kind][resource] = value
+
+        request, limit = resources["requests"][resource], resources["limits"][resource]
+        if request and limit and parse(request) > parse(limit):
+            raise ValueError(f"config: {resource}-request must not be over {resource}-limit")
+    return resources
+
+
+def worker_processes(resources):
+    """Size the nginx worker processes to the CPU limit of the container.
+
+    Without a limit, nginx starts one worker per CPU of the node.
+
+    Args:
+        resources: compute resource requirements of the workload container.
+
+    Returns:
+        The number of worker processes, or `auto`.
+    """
+    limit = resources["limits"]["cpu"]
+    return max(math.ceil(cpu_cores(limit)), 1) if limit else "auto"
+
+
+def kubernetes_client(field_manager):
+    """Create a client of the Kubernetes API the charm runs in.
+
+    Args:
+        field_manager: name of the manager of the fields patched by the client.
+
+    Returns:
+        The lightkube client.
+    """
+    # Only the leader patches resources, when reconciling: lightkube is imported
+    # lazily to keep it off the import path of every other hook.
+    import lightkube  # pylint: disable=import-outside-toplevel
+
+    return lightkube.Client(field_manager=field_manager)
+
+
+def patch_resources(client, namespace, statefulset, container, resources):
+    """Apply compute resource requirements to a container of a StatefulSet.
+
+    Patching the pod template rolls the pods out again with the new resources, so
+    the StatefulSet is only patched when its requirements differ.
+
+    Args:
+        client: the lightkube client.
+        namespace: namespace of the StatefulSet.
+        statefulset: name of the StatefulSet.
+        container: name of the container.
+        resources: compute resource requirements, as built by `compute_resources`.
+
+    Returns:
+        True if the StatefulSet was patched.
+
+    Raises:
+        ValueError: if the charm is not allowed to patch the StatefulSet.
+        ConnectionError: if the Kubernetes API is unreachable or fails the requests.
+    """
+    # pylint: disable=import-outside-toplevel
+    from lightkube import ApiError
+    from lightkube.resources.apps_v1 import StatefulSet
+
+    try:
+        # The HTTP client of lightkube, renamed in its recent releases.
+        import httpx2 as httpx
+    except ImportError:
+        import httpx
+
+    try:
+        current = client.get(StatefulSet, name=statefulset, namespace=namespace)
+        if _quantities(_requirements(current, container)) == _quantities(resources):
+            return False
+
+        patch = {"spec": {"template": {"spec": {"containers": [{"name": container, "resources": resources}]}}}}
+        client.patch(StatefulSet, statefulset, patch, namespace=namespace)
+    except ApiError as err:
+        if err.status.code == 403:
+            raise ValueError(f"kubernetes: not allowed to patch resources, run `juju trust {statefulset}`") from err
+        raise ConnectionError(f"kubernetes: unable to patch resources: {err.status.message}") from err
+    except httpx.HTTPError as err:
+        raise ConnectionError(f"kubernetes: unable to patch resources: {err}") from err
+
+    logger.info(f"patched the {container} resources of {statefulset}: {resources}")
+    return True
+
+
+def _requirements(statefulset, container):
+    """Get the compute resource requirements of a container of a StatefulSet.
+
+    Args:
+        statefulset: the StatefulSet.
+        container: name of the container.
+
+    Returns:
+        The requirements, in the format of `compute_resources`.
+
+    Raises:
+        ValueError: if the container is missing.
+    """
+    for spec in statefulset.spec.template.spec.containers:
+        if spec.name == container:
+            break
+    else:
+        raise ValueError(f"kubernetes: no {container} container in {statefulset.metadata.name}")
+
+    current = {"requests": {}, "limits": {}}
+    for kind in current:
+        quantities = getattr(spec.resources, kind, None) or {}
+        for resource in PARSERS:
+            current[kind][resource] = quantities.get(resource)
+    return current
+
+
+def _quantities(resources):
+    """Parse compute resource requirements, as Kubernetes may normalize the quantities.
+
+    Args:
+        resources: compute resource requirements.
+
+    Returns:
+        The requirements with the quantities parsed, None for unparsable ones.
+    """
+    parsed = {}
+    for kind, quantities in resources.items():
+        parsed[kind] = {}
+        for resource, value in quantities.items():
+            try:
+                parsed[kind][resource] = PARSERS[resource](value) if value else None
+            except ValueError:
+                parsed[kind][resource] = None
+    return parsed
@@ -11,6 +11,8 @@ class State:
 
     The get_relation callable is used to retrieve the relation.
     As relation data values must be strings, all values are JSON encoded.
+    Values are shared by all units: writing one fires relation-changed on each
+    of them, so writes that would not change the stored value are skipped.
     """
 
     def __init__(self, app, get_relation):
@@ -32,7 +34,9 @@ class State:
             value: value to set in store.
         """
         v = json.dumps(value)
-        self._get_relation().data[self._app].update({name: v})
+        data = self._get_relation().data[self._app]
+        if data.get(name) != v:
+            data.update({name: v})
 
     def __getattr__(self, name):
         """Get from the store the value with the given name, or None.
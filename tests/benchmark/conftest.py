@@ -0,0 +1,150 @@
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Fixtures for the nginx benchmarks."""
+
+import json
+import shutil
+from pathlib import Path
+
+import pytest
+
+from tests.benchmark.helpers import NginxProcess, StubAirbyteServer, nginx_binary
+
+BENCHMARK_DIR = Path(__file__).parent
+
+
+@pytest.fixture(scope="session", name="nginx_bin")
+def nginx_bin_fixture(request):
+    """Locate the nginx binary, skipping the benchmarks if it is missing.
+
+    Args:
+        request: pytest request.
+
+    Returns:
+        Path to the nginx binary.
+    """
+    binary = nginx_binary(request.config.getoption("--nginx-binary"))
+    if not binary:
+        pytest.skip("nginx is not installed")
+    return binary
+
+
+@pytest.fixture(scope="session", name="rock_image")
+def rock_image_fixture(request):
+    """Get the rock image, skipping the image benchmarks if it is not given.
+
+    Args:
+        request: pytest request.
+
+    Returns:
+        The rock image name:tag.
+    """
+    image = request.config.getoption("--airbyte-ui-image")
+    if not image:
+        pytest.skip("--airbyte-ui-image is not set")
+    if not shutil.which("docker"):
+        pytest.skip("docker is not installed")
+    return image
+
+
+@pytest.fixture(scope="session", name="stub_server")
+def stub_server_fixture():
+    """Run the stub Airbyte server.
+
+    Yields:
+        The running stub server.
+    """
+    server = StubAirbyteServer()
+    server.start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture(name="start_nginx")
+def start_nginx_fixture(nginx_bin, stub_server, tmp_path):
+    """Start nginx in front of the stub server with a given charm configuration.
+
+    Args:
+        nginx_bin: path to the nginx binary.
+        stub_server: the running stub server.
+        tmp_path: per-test temporary directory.
+
+    Yields:
+        Function starting nginx with charm config overrides.
+    """
+    processes = []
+
+    def start(**config):
+        process = NginxProcess(nginx_bin, tmp_path / f"nginx-{len(processes)}", stub_server.port, **config)
+        process.start()
+        processes.append(process)
+        return process
+
+    yield start
+    for process in processes:
+        process.stop(graceful=False)
+
+
+def load_baseline(request, default_path):
+    """Load a benchmark baseline, and write the new results to it if requested.
+
+    Results are also recorded for the workloads the baseline has no entry for yet,
+    null entries included, and are not compared to the baseline being updated.
+
+    Args:
+        request: pytest request.
+        default_path: baseline path used unless --benchmark-baseline is set.
+
+    Yields:
+        Tuple of (baseline results, dict collecting the new results).
+    """
+    path = Path(request.config.getoption("--benchmark-baseline") or default_path)
+    baseline = json.loads(path.read_text()) if path.exists() else {}
+    update = request.config.getoption("--benchmark-update-baseline")
+    results = {}
+    # Results are not compared to the baseline they replace.
+    yield {} if update else baseline, results
+
+    recorded = results if update else {name: result for name, result in results.items() if not baseline.get(name)}
+    if recorded:
+        path.write_text(json.dumps({**baseline, **recorded}, indent=2, sort_keys=True) + "\n")
+
+
+@pytest.fixture(scope="session", name="nginx_baseline")
+def nginx_baseline_fixture(request):
+    """Load the nginx benchmark baseline.
+
+    Args:
+        request: pytest request.
+
+    Yields:
+        Tuple of (baseline results, dict collecting the new results).
+    """
+    yield from load_baseline(request, BENCHMARK_DIR / "nginx_baseline.json")
+
+
+@pytest.fixture(scope="session", name="reconcile_baseline")
+def reconcile_baseline_fixture(request):
+    """Load the hook reconcile benchmark baseline.
+
+    Args:
+        request: pytest request.
+
+    Yields:
+        Tuple of (baseline results, dict collecting the new results).
+    """
+    yield from load_baseline(request, BENCHMARK_DIR / "reconcile_baseline.json")
+
+
+@pytest.fixture(scope="session", name="image_baseline")
+def image_baseline_fixture(request):
+    """Load the rock image benchmark baseline.
+
+    Args:
+        request: pytest request.
+
+    Yields:
+        Tuple of (baseline results, dict collecting the new results).
+    """
+    yield from load_baseline(request, BENCHMARK_DIR / "image_baseline.json")
@@ -0,0 +1,768 @@
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Offline nginx benchmark helpers."""
+
+import asyncio
+import importlib.util
+import json
+import logging
+import math
+import multiprocessing
+import os
+import re
+import shutil
+import signal
+import socket
+import subprocess  # nosec B404
+import time
+from pathlib import Path
+
+import yaml
+
+from literals import API_UNAVAILABLE_PORT, NGINX_DRAIN_MARKER_PATH, WEB_UI_TLS_PORT
+from nginx import build_context, render
+
+logger = logging.getLogger(__name__)
+
+ROOT = Path(__file__).resolve().parents[2]
+ROCK_FILES = ROOT / "airbyte_ui_rock" / "files"
+
+# Server name rendered in the upstreams and rewritten to the stub server address.
+STUB_SERVER_NAME = "airbyte-stub"
+STUB_CANARY_NAME = "airbyte-stub-canary"
+
+
+class CallCounter:
+    """Proxy recording the method calls made to an object.
+
+    Attrs:
+        calls: names of the methods called.
+    """
+
+    def __init__(self, target):
+        """Construct.
+
+        Args:
+            target: the object to wrap.
+        """
+        self._target = target
+        self.calls = []
+
+    def __getattr__(self, name):
+        """Get a target attribute, recording calls to its methods.
+
+        Args:
+            name: attribute name.
+
+        Returns:
+            The target attribute.
+        """
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+
+        def wrapped(*args, **kwargs):
+            self.calls.append(name)
+            return attr(*args, **kwargs)
+
+        return wrapped
+
+
+def charm_config(**overrides):
+    """Build a charm configuration from the charmcraft.yaml defaults.
+
+    Args:
+        overrides: config values to override, with underscores in place of dashes.
+
+    Returns:
+        Dict of config option names to values.
+    """
+    options = yaml.safe_load((ROOT / "charmcraft.yaml").read_text())["config"]["options"]
+    config = {name: option.get("default") for name, option in options.items()}
+    config.update({name.replace("_", "-"): value for name, value in overrides.items()})
+    return config
+
+
+def free_port():
+    """Find a free local TCP port.
+
+    Returns:
+        The port number.
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values, fraction):
+    """Compute a percentile with the nearest-rank method.
+
+    Args:
+        values: sorted list of values.
+        fraction: percentile as a fraction in [0, 1].
+
+    Returns:
+        The percentile value, or 0 for an empty list.
+    """
+    if not values:
+        return 0
+    rank = max(math.ceil(fraction * len(values)), 1)
+    return values[min(rank, len(values)) - 1]
+
+
+async def read_message(reader):
+    """Read an HTTP/1.1 message head and body.
+
+    Args:
+        reader: asyncio stream reader.
+
+    Returns:
+        Tuple of (start line, headers dict with lowercase names, body bytes), or None on EOF.
+    """
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError:
+        return None
+
+    lines = head.decode("latin-1").split("\r\n")
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        body = bytearray()
+        while True:
+            size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+            if size == 0:
+                await reader.readuntil(b"\r\n")
+                break
+            body += await reader.readexactly(size)
+            await reader.readexactly(2)
+        return lines[0], headers, bytes(body)
+
+    length = int(headers.get("content-length", 0))
+    return lines[0], headers, await reader.readexactly(length) if length else b""
+
+
+def _stub_payload(method, path, body):
+    """Build the stub response for a request.
+
+    Args:
+        method: request method.
+        path: request path.
+        body: request body.
+
+    Returns:
+        Tuple of (status, JSON-serializable payload).
+    """
+    if path.endswith("/health"):
+        return 200, {"available": True}
+    if path.endswith("/list"):
+        # Large, compressible listing similar to connection and job lists.
+        return 200, {
+            "connections": [
+                {
+                    "connectionId": f"00000000-0000-0000-0000-{i:012d}",
+                    "name": f"Postgres to BigQuery {i}",
+                    "status": "active",
+                    "scheduleType": "basic",
+                    "syncCatalog": {"streams": [{"name": f"table_{j}", "syncMode": "incremental"} for j in range(5)]},
+                }
+                for i in range(300)
+            ]
+        }
+    if path.endswith("/get"):
+        # Reads of a single resource, echoing the requested id.
+        return 200, {"request": json.loads(body or b"{}"), "name": "Default Workspace", "slug": "default"}
+    if method == "POST" and len(body) > 1024 * 1024:
+        return 200, {"received": len(body)}
+    return 200, {"method": method, "path": path}
+
+
+async def _serve_stub(port_queue):
+    """Serve the stub Airbyte API until terminated.
+
+    Args:
+        port_queue: queue used to publish the listening port.
+    """
+
+    async def handle(reader, writer):
+        try:
+            while True:
+                message = await read_message(reader)
+                if message is None:
+                    break
+                start_line, headers, body = message
+                method, path, version = start_line.split(" ")
+                status, payload = _stub_payload(method, path, body)
+                content = json.dumps(payload).encode()
+                close = version == "HTTP/1.0" or headers.get("connection", "").lower() == "close"
+                writer.write(
+                    f"HTTP/1.1 {status} OK\r\nContent-Type: application/json\r\n"
+                    # Tells which replica served the request.
+                    f"X-Stub-Port: {writer.get_extra_info('sockname')[1]}\r\n"
+                    f"Content-Length: {len(content)}\r\nConnection: {'close' if close else 'keep-alive'}\r\n\r\n".encode()
+                    + content
+                )
+                await writer.drain()
+                if close:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    port_queue.put(server.sockets[0].getsockname()[1])
+    async with server:
+        await server.serve_forever()
+
+
+def _run_stub(port_queue):
+    """Run the stub Airbyte API server process.
+
+    Args:
+        port_queue: queue used to publish the listening port.
+    """
+    asyncio.run(_serve_stub(port_queue))
+
+
+class StubAirbyteServer:
+    """Stand-in for the Airbyte API server, run in a separate process.
+
+    Attrs:
+        port: port the stub server listens on.
+    """
+
+    def __init__(self):
+        """Construct."""
+        self._process = None
+        self.port = None
+
+    def start(self):
+        """Start the stub server and wait until it listens."""
+        port_queue = multiprocessing.Queue()
+        self._process = multiprocessing.Process(target=_run_stub, args=(port_queue,), daemon=True)
+        self._process.start()
+        self.port = port_queue.get(timeout=10)
+
+    def stop(self):
+        """Stop the stub server."""
+        if self._process:
+            self._process.terminate()
+            self._process.join(timeout=10)
+
+
+def localize(config, workdir, ports):
+    """Rewrite container paths and ports of a rendered nginx configuration.
+
+    Args:
+        config: rendered nginx configuration.
+        workdir: local directory standing in for the container filesystem.
+        ports: dict of container ports to local ports.
+
+    Returns:
+        The configuration runnable by a local, unprivileged nginx.
+    """
+    replacements = {
+        "/etc/nginx/mime.types": str(ROCK_FILES / "mime.types"),
+        "/etc/nginx/conf.d": str(workdir / "conf.d"),
+        "/etc/nginx": str(workdir / "etc"),
+        "/usr/share/nginx/html": str(workdir / "html"),
+        "/var/log/nginx": str(workdir / "log"),
+        "/var/cache/nginx": str(workdir / "cache"),
+        "/var/run": str(workdir / "run"),
+    }
+    for path, local in replacements.items():
+        config = config.replace(path, local)
+
+    config = re.sub(r"^\s*listen\s+\[::\].*\n", "", config, flags=re.MULTILINE)
+    config = re.sub(
+        r"127\.0\.0\.1:(\d+)",
+        lambda match: f"127.0.0.1:{ports.get(int(match.group(1)), match.group(1))}",
+        config,
+    )
+    return re.sub(
+        r"listen\s+(\d+)(?![\d.])",
+        lambda match: f"listen 127.0.0.1:{ports.get(int(match.group(1)), match.group(1))}",
+        config,
+    )
+
+
+def load_rock_script(name):
+    """Import a build script of the rock.
+
+    Args:
+        name: name of the script module in airbyte_ui_rock/scripts.
+
+    Returns:
+        The imported module.
+    """
+    spec = importlib.util.spec_from_file_location(name, ROOT / "airbyte_ui_rock" / "scripts" / f"{name}.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def make_static_site(html_dir):
+    """Create a static build resembling the Airbyte webapp.
+
+    Args:
+        html_dir: directory to create the site in.
+    """
+    assets = html_dir / "assets"
+    assets.mkdir(parents=True, exist_ok=True)
+    # Pseudo-source text so that compression ratios resemble real bundles.
+    chunk = "".join(f"export const component{i} = () => render('component-{i}', props);\n" for i in range(200))
+    (assets / "index-3f2a9c1d.js").write_text(chunk * (1_500_000 // len(chunk)))
+    (assets / "index-8b7e6f5a.css").write_text(".button { color: #615eff; }\n" * 2000)
+    (html_dir / "index.html").write_text(
+        '<!doctype html><html><head><script type="module" src="/assets/index-3f2a9c1d.js"></script>'
+        '<link rel="stylesheet" href="/assets/index-8b7e6f5a.css"></head><body><div id="root"></div></body></html>'
+    )
+    (html_dir / "50x.html").write_text("<html><body>Airbyte is temporarily unavailable.</body></html>")
+
+
+def self_signed_certificate(tls_dir):
+    """Create the self-signed certificate and key nginx terminates TLS with.
+
+    Args:
+        tls_dir: directory to create tls.crt and tls.key in.
+    """
+    tls_dir.mkdir(parents=True, exist_ok=True)
+    subprocess.run(  # nosec B603 B607
+        [
+            "openssl",
+            "req",
+            "-x509",
+            "-newkey",
+            "rsa:2048",
+            "-nodes",
+            "-days",
+            "1",
+            "-subj",
+            "/CN=localhost",
+            "-keyout",
+            str(tls_dir / "tls.key"),
+            "-out",
+            str(tls_dir / "tls.crt"),
+        ],
+        capture_output=True,
+        check=True,
+    )
+
+
+class NginxProcess:
+    """Local nginx running the charm-rendered configuration.
+
+    Attrs:
+        port: local port nginx serves the UI on.
+        tls_port: local port nginx serves the UI on over TLS, when enabled.
+        workdir: local directory standing in for the container filesystem.
+    """
+
+    def __init__(self, binary, workdir, stub_port, canary_port=None, connector_builder_ports=None, tls=False, **config):
+        """Construct.
+
+        Args:
+            binary: path to the nginx binary.
+            workdir: local directory standing in for the container filesystem.
+            stub_port: port of the stub Airbyte server.
+            canary_port: port of the stub Airbyte canary server, if any.
+            connector_builder_ports: ports of the stub connector builder replicas,
+                defaults to the stub Airbyte server.
+            tls: whether nginx terminates TLS, with a self-signed certificate.
+            config: charm config overrides.
+        """
+        self._binary = binary
+        self.workdir = Path(workdir)
+        self._stub_port = stub_port
+        self._canary_port = canary_port
+        self._connector_builder_ports = connector_builder_ports or [stub_port]
+        self._tls = tls
+        self._config = config
+        self._process = None
+        self.port = free_port()
+        self.tls_port = free_port()
+
+    def render(self):
+        """Render and localize the nginx configuration.
+
+        Returns:
+            Tuple of (nginx.conf, default.conf) contents.
+        """
+        context = build_context(
+            charm_config(**self._config),
+            {
+                "name": STUB_SERVER_NAME,
+                "connector_builder_endpoints": [f"127.0.0.1:{port}" for port in self._connector_builder_ports],
+            },
+            tls=self._tls,
+            canary={"name": STUB_CANARY_NAME, "status": "ready"} if self._canary_port else None,
+        )
+        default_conf = render("default.conf.j2", context)
+        default_conf = re.sub(rf"{STUB_SERVER_NAME}:\d+", f"127.0.0.1:{self._stub_port}", default_conf)
+        default_conf = re.sub(rf"{STUB_CANARY_NAME}:\d+", f"127.0.0.1:{self._canary_port}", default_conf)
+        nginx_conf = render("nginx.conf.j2", context)
+        ports = {context["port"]: self.port, WEB_UI_TLS_PORT: self.tls_port, API_UNAVAILABLE_PORT: free_port()}
+        return localize(nginx_conf, self.workdir, ports), localize(default_conf, self.workdir, ports)
+
+    def write(self):
+        """Write the configuration, and the files it refers to, to the working directory."""
+        for directory in ("conf.d", "etc", "html", "log", "cache", "run"):
+            (self.workdir / directory).mkdir(parents=True, exist_ok=True)
+        # Latency log buckets are created by the workers, as in the rock.
+        (self.workdir / "log" / "latency").mkdir(exist_ok=True)
+        (self.workdir / "log" / "latency").chmod(0o1777)
+        # nginx workers drop privileges when started as root.
+        self.workdir.chmod(0o755)
+        make_static_site(self.workdir / "html")
+        preload_hints = load_rock_script("preload_hints")
+        (self.workdir / "etc" / "snippets").mkdir(exist_ok=True)
+        (self.workdir / "etc" / "snippets" / "preload-hints.conf").write_text(
+            preload_hints.nginx_snippet(preload_hints.critical_assets(self.workdir / "html"))
+        )
+        asset_manifest = load_rock_script("asset_manifest")
+        for name, snippet in asset_manifest.nginx_snippets(self.workdir / "html").items():
+            (self.workdir / "etc" / "snippets" / name).write_text(snippet)
+
+        if self._tls:
+            self_signed_certificate(self.workdir / "etc" / "tls")
+
+        nginx_conf, default_conf = self.render()
+        (self.workdir / "nginx.conf").write_text(nginx_conf)
+        (self.workdir / "conf.d" / "default.conf").write_text(default_conf)
+
+    def check(self):
+        """Write the configuration and test it with `nginx -t`.
+
+        Returns:
+            The completed nginx process, with its output.
+        """
+        self.write()
+        return subprocess.run(  # nosec B603
+            [self._binary, "-t", "-p", str(self.workdir), "-c", str(self.workdir / "nginx.conf")],
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+
+    def start(self):
+        """Write the configuration and start nginx in the foreground."""
+        self.write()
+        self._process = subprocess.Popen(  # nosec B603
+            [self._binary, "-p", str(self.workdir), "-c", str(self.workdir / "nginx.conf"), "-g", "daemon off;"],
+            stderr=subprocess.PIPE,
+        )
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            if self._process.poll() is not None:
+                raise RuntimeError(f"nginx failed to start: {self._process.stderr.read().decode()}")
+            try:
+                socket.create_connection(("127.0.0.1", self.port), timeout=0.2).close()
+                return
+            except OSError:
+                time.sleep(0.05)
+        raise RuntimeError("nginx did not start listening")
+
+    def cpu_seconds(self):
+        """Get the CPU time used by the nginx master and worker processes.
+
+        Returns:
+            User and system CPU time in seconds.
+        """
+        ticks = os.sysconf("SC_CLK_TCK")
+        total = 0
+        for stat in Path("/proc").glob("[0-9]*/stat"):
+            try:
+                pid, rest = stat.read_text().split(" ", 1)
+            except OSError:
+                continue
+            # Fields following the parenthesized command name.
+            fields = rest.rsplit(")", 1)[1].split()
+            if int(pid) == self._process.pid or int(fields[1]) == self._process.pid:
+                total += int(fields[11]) + int(fields[12])
+        return total / ticks
+
+    def drain(self):
+        """Fail the health endpoint, as the charm does before asking nginx to quit."""
+        Path(localize(NGINX_DRAIN_MARKER_PATH, self.workdir, {})).touch()
+
+    def stop(self, graceful=True):
+        """Stop nginx.
+
+        Args:
+            graceful: whether to let in-flight requests complete.
+        """
+        if self._process and self._process.poll() is None:
+            self._process.send_signal(signal.SIGQUIT if graceful else signal.SIGTERM)
+            self._process.wait(timeout=60)
+
+
+async def exchange(reader, writer, request):
+    """Send a request and read its response.
+
+    Args:
+        reader: asyncio stream reader of the connection.
+        writer: asyncio stream writer of the connection.
+        request: raw request bytes.
+
+    Returns:
+        The response as returned by read_message, or None if the connection failed.
+    """
+    try:
+        writer.write(request)
+        await writer.drain()
+        return await read_message(reader)
+    except (ConnectionError, asyncio.IncompleteReadError):
+        return None
+
+
+async def run_workload(port, method, path, body=b"", headers=None, concurrency=16, requests=2000):
+    """Drive a workload against a local HTTP server over keepalive connections.
+
+    Args:
+        port: local port of the server.
+        method: request method.
+        path: request path.
+        body: request body.
+        headers: additional request headers.
+        concurrency: number of concurrent connections.
+        requests: total number of requests.
+
+    Returns:
+        Dict with the request count, errors, throughput, latency percentiles and bytes received.
+    """
+    head = f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n"
+    for name, value in (headers or {}).items():
+        head += f"{name}: {value}\r\n"
+    request = (head + "\r\n").encode() + body
+
+    latencies = []
+    counters = {"errors": 0, "bytes": 0}
+    remaining = [requests]
+
+    async def worker():
+        reader = writer = None
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            if writer is None:
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            start = time.perf_counter()
+            message = await exchange(reader, writer, request)
+            if message is None:
+                counters["errors"] += 1
+                writer.close()
+                writer = None
+                continue
+
+            latencies.append(time.perf_counter() - start)
+            start_line, response_headers, response_body = message
+            counters["bytes"] += len(response_body)
+            if int(start_line.split(" ")[1]) >= 400:
+                counters["errors"] += 1
+            if response_headers.get("connection", "").lower() == "close":
+                writer.close()
+                writer = None
+        if writer is not None:
+            writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    duration = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": counters["errors"],
+        "throughput": round(len(latencies) / duration, 2),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "bytes_per_request": round(counters["bytes"] / max(len(latencies), 1)),
+    }
+
+
+async def fetch(port, method, path, body=b"", headers=None):
+    """Send a single request on a new connection.
+
+    Args:
+        port: local port of the server.
+        method: request method.
+        path: request path.
+        body: request body.
+        headers: additional request headers.
+
+    Returns:
+        Tuple of (status, headers dict with lowercase names, body bytes), or None if the
+        connection failed.
+    """
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    except OSError:
+        return None
+    extra = "".join(f"{name}: {value}\r\n" for name, value in (headers or {}).items())
+    head = f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n{extra}Content-Length: {len(body)}\r\nConnection: close\r\n\r\n"
+    message = await exchange(reader, writer, head.encode() + body)
+    writer.close()
+    if message is None:
+        return None
+    start_line, headers, response_body = message
+    return int(start_line.split(" ")[1]), headers, response_body
+
+
+async def drain_under_load(nginx, method, path, body=b"", concurrency=16, warmup=0.5):
+    """Drain nginx as the charm does while clients send requests over keepalive connections.
+
+    Clients stop sending new requests once the readiness endpoint fails, as the ingress
+    stops routing requests to the unit, and nginx is then asked to quit while the last
+    requests are still in flight.
+
+    Args:
+        nginx: the running NginxProcess.
+        method: request method.
+        path: request path.
+        body: request body.
+        concurrency: number of concurrent connections.
+        warmup: seconds of load before draining.
+
+    Returns:
+        Dict with the completed requests, the errors and the requests in flight when nginx
+        was asked to quit.
+    """
+    request = f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body
+    routed = asyncio.Event()
+    routed.set()
+    counters = {"completed": 0, "errors": 0, "in_flight": 0}
+
+    async def client():
+        reader, writer = await asyncio.open_connection("127.0.0.1", nginx.port)
+        while routed.is_set():
+            counters["in_flight"] += 1
+            message = await exchange(reader, writer, request)
+            counters["in_flight"] -= 1
+            if message is None or int(message[0].split(" ")[1]) >= 400:
+                counters["errors"] += 1
+                break
+            counters["completed"] += 1
+            if message[1].get("connection", "").lower() == "close":
+                break
+        writer.close()
+
+    clients = [asyncio.create_task(client()) for _ in range(concurrency)]
+    await asyncio.sleep(warmup)
+    nginx.drain()
+    while True:
+        response = await fetch(nginx.port, "GET", "/healthz")
+        if not response or response[0] != 200:
+            break
+        await asyncio.sleep(0.05)
+    routed.clear()
+
+    in_flight = counters["in_flight"]
+    stopped = asyncio.get_running_loop().run_in_executor(None, nginx.stop)
+    await asyncio.gather(*clients)
+    await stopped
+    return {"completed": counters["completed"], "errors": counters["errors"], "in_flight_at_quit": in_flight}
+
+
+def find_regressions(name, result, baseline, threshold):
+    """Compare a workload result to its baseline.
+
+    Args:
+        name: workload name.
+        result: workload result.
+        baseline: baseline results of all workloads.
+        threshold: tolerated relative regression, e.g. 0.2 for 20%.
+
+    Returns:
+        List of regression messages, empty if the workload did not regress.
+    """
+    previous = baseline.get(name)
+    if not previous:
+        return []
+
+    regressions = []
+    if result["throughput"] < previous["throughput"] * (1 - threshold):
+        regressions.append(f"{name}: throughput {result['throughput']}/s, baseline {previous['throughput']}/s")
+    for metric in ("p50_ms", "p99_ms"):
+        if result[metric] > previous[metric] * (1 + threshold):
+            regressions.append(f"{name}: {metric} {result[metric]}, baseline {previous[metric]}")
+    return regressions
+
+
+def nginx_binary(option):
+    """Locate the nginx binary used by the benchmarks.
+
+    Args:
+        option: the --nginx-binary command line option.
+
+    Returns:
+        The path to nginx, or None if it is not available.
+    """
+    return option or shutil.which("nginx")
+
+
+def docker(*args):
+    """Run a docker command.
+
+    Args:
+        args: docker command arguments.
+
+    Returns:
+        The stripped standard output of the command.
+    """
+    return subprocess.run(  # nosec B603 B607
+        ["docker", *args], check=True, capture_output=True, text=True
+    ).stdout.strip()
+
+
+def image_size_mb(image):
+    """Get the uncompressed size of an OCI image.
+
+    Args:
+        image: the image name:tag.
+
+    Returns:
+        The image size in MB.
+    """
+    return round(int(docker("image", "inspect", "--format", "{{.Size}}", image)) / 1_000_000, 1)
+
+
+def cold_start_seconds(image, timeout=60):
+    """Measure the time from starting a container of the image to its first 200 response.
+
+    The upstream server names of the default configuration in the rock are resolved
+    to the loopback address, since nginx does not start with unresolvable upstreams.
+
+    Args:
+        image: the image name:tag.
+        timeout: seconds to wait for the first 200 response.
+
+    Returns:
+        The cold start time in seconds.
+
+    Raises:
+        TimeoutError: if the container does not serve the UI in time.
+    """
+    port = free_port()
+    upstream_hosts = set(re.findall(r"server\s+([\w.-]+):\d+;", (ROCK_FILES / "default.conf").read_text()))
+    add_hosts = [arg for host in sorted(upstream_hosts) for arg in ("--add-host", f"{host}:127.0.0.1")]
+
+    start = time.perf_counter()
+    container = docker("run", "--detach", *add_hosts, "--publish", f"127.0.0.1:{port}:80", image)
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with socket.create_connection(("127.0.0.1", port), timeout=1) as sock:
+                    sock.sendall(b"GET / HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n")
+                    if sock.recv(64).startswith(b"HTTP/1.1 200"):
+                        return time.perf_counter() - start
+            except OSError:
+                pass
+            time.sleep(0.01)
+    finally:
+        docker("rm", "--force", container)
+    raise TimeoutError(f"{image} did not serve the UI within {timeout}s")
@@ -0,0 +1,40 @@
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Rock image size and cold start benchmarks.
+
+The rock given with --airbyte-ui-image is run with docker, and its size and the
+time from container start to the first 200 response are compared to a JSON
+baseline.
+"""
+
+import logging
+import statistics
+
+from tests.benchmark.helpers import cold_start_seconds, image_size_mb
+
+logger = logging.getLogger(__name__)
+
+COLD_STARTS = 5
+
+
+def test_image(rock_image, image_baseline, request):
+    """The rock does not grow or start slower than the baseline."""
+    size = image_size_mb(rock_image)
+    cold_starts = [cold_start_seconds(rock_image) for _ in range(COLD_STARTS)]
+    result = {
+        "size_mb": size,
+        "cold_start_ms": round(statistics.median(cold_starts) * 1000, 1),
+    }
+    logger.info(f"{rock_image}: {result}")
+
+    baseline, results = image_baseline
+    results["airbyte-ui"] = result
+    previous = baseline.get("airbyte-ui") or {}
+    threshold = request.config.getoption("--benchmark-threshold")
+    regressions = [
+        f"{metric} {result[metric]}, baseline {previous[metric]}"
+        for metric in result
+        if metric in previous and result[metric] > previous[metric] * (1 + threshold)
+    ]
+    assert not regressions, "; ".join(regressions)
@@ -0,0 +1,32 @@
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Charm import time benchmark.
+
+Every hook imports the charm before dispatching. The wall time depends on the host
+and its load, so it is compared to a budget here rather than in the unit tests,
+which only check which modules are imported.
+"""
+
+import logging
+import os
+
+from tests.unit.test_import_time import measure_import
+
+logger = logging.getLogger(__name__)
+
+# Budget for importing the charm module, in microseconds. About 200ms are measured
+# on a quiet host, most of it importing ops.
+IMPORT_TIME_BUDGET_US = int(os.environ.get("CHARM_IMPORT_BUDGET_MS", "250")) * 1000
+
+
+def test_import_time_budget():
+    """Importing the charm stays within the hook import budget."""
+    # Warm up the bytecode and file caches, then take the best of a few runs to
+    # reduce the noise from other processes.
+    measure_import()
+    best = min(measure_import()["charm"] for _ in range(5))
+    logger.info(f"charm import: {best / 1000:.1f}ms")
+    assert (
+        best <= IMPORT_TIME_BUDGET_US
+    ), f"importing the charm took {best / 1000:.1f}ms, over the {IMPORT_TIME_BUDGET_US / 1000:.0f}ms budget"
@@ -0,0 +1,384 @@
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Offline nginx performance regression benchmarks.
+
+The charm-rendered nginx configuration is served by a local nginx binary in
+front of a stub Airbyte server, and each workload's throughput and latency
+percentiles are compared to a JSON baseline.
+"""
+
+import asyncio
+import json
+import logging
+import time
+
+import pytest
+
+from latency import parse_thresholds, report, summarize_log
+from tests.benchmark.helpers import (
+    NginxProcess,
+    StubAirbyteServer,
+    drain_under_load,
+    fetch,
+    find_regressions,
+    run_workload,
+)
+
+logger = logging.getLogger(__name__)
+
+# name: (method, path, body size, concurrency, requests)
+WORKLOADS = {
+    "static": ("GET", "/assets/index-3f2a9c1d.js", 0, 16, 2000),
+    "spa-fallback": ("GET", "/workspaces/1/connections", 0, 16, 5000),
+    "api": ("POST", "/api/v1/connections/list", 0, 16, 2000),
+    "upload": ("POST", "/api/v1/source_definitions/upload", 20 * 1024 * 1024, 4, 40),
+}
+
+
+# Configurations checked with `nginx -t`: charm config overrides, and the
+# NginxProcess options setting up TLS and the canary server.
+CONFIGS = {
+    "default": {},
+    "tls": {"tls": True},
+    "canary": {"canary_port": 1},
+    "no-cache": {"api_stale_cache_max_age": 0},
+    "rate-limits": {
+        "rate_limits": "static=100r/s:200,api=50r/s:100:nodelay,connector-builder=10r/s,auth=30r/m",
+        "rate_limit_key": "header=X-Forwarded-User",
+        "trusted_proxies": "10.1.0.0/16",
+    },
+    "keycloak": {"keycloak_internal_host": "127.0.0.1:8180"},
+    "all": {
+        "tls": True,
+        "canary_port": 1,
+        "rate_limits": "api=50r/s:100:nodelay,auth=30r/m",
+        "trusted_proxies": "10.1.0.0/16",
+        "keycloak_internal_host": "127.0.0.1:8180",
+        "connector_builder_load_balancing": "consistent-hash",
+    },
+}
+
+
+def workspace_request(index):
+    """Build the body of an Airbyte workspace read.
+
+    Args:
+        index: index of the workspace.
+
+    Returns:
+        The JSON request body.
+    """
+    return json.dumps({"workspaceId": f"00000000-0000-0000-0000-{index:012d}"}).encode()
+
+
+@pytest.mark.parametrize("name", CONFIGS)
+def test_config(name, nginx_bin, tmp_path):
+    """The configuration rendered by the charm passes `nginx -t`."""
+    result = NginxProcess(nginx_bin, tmp_path / "nginx", 1, **CONFIGS[name]).check()
+    assert result.returncode == 0, result.stderr
+
+
+@pytest.mark.parametrize("workload", WORKLOADS)
+def test_workload(workload, start_nginx, nginx_baseline, request):
+    """Each workload is served without errors and without regressing against the baseline."""
+    method, path, body_size, concurrency, requests = WORKLOADS[workload]
+    nginx = start_nginx()
+
+    result = asyncio.run(
+        run_workload(nginx.port, method, path, b"x" * body_size, concurrency=concurrency, requests=requests)
+    )
+    logger.info(f"{workload}: {result}")
+
+    baseline, results = nginx_baseline
+    results[workload] = result
+    assert result["errors"] == 0
+    regressions = find_regressions(workload, result, baseline, request.config.getoption("--benchmark-threshold"))
+    assert not regressions, "; ".join(regressions)
+
+
+@pytest.mark.parametrize("compression", ["off", "gzip"])
+def test_api_compression(compression, start_nginx, nginx_baseline, request):
+    """JSON API responses are measured with and without compression, including nginx CPU time."""
+    nginx = start_nginx(api_compression=compression)
+    method, path, body_size, concurrency, requests = WORKLOADS["api"]
+
+    cpu = nginx.cpu_seconds()
+    result = asyncio.run(
+        run_workload(
+            nginx.port,
+            method,
+            path,
+            b"x" * body_size,
+            headers={"Accept-Encoding": "gzip"},
+            concurrency=concurrency,
+            requests=requests,
+        )
+    )
+    result["cpu_ms_per_request"] = round((nginx.cpu_seconds() - cpu) * 1000 / requests, 3)
+    logger.info(f"api[{compression}]: {result}")
+
+    baseline, results = nginx_baseline
+    name = f"api[{compression}]"
+    results[name] = result
+    assert result["errors"] == 0
+    if compression != "off":
+        uncompressed = results.get("api[off]")
+        if uncompressed:
+            assert result["bytes_per_request"] < uncompressed["bytes_per_request"]
+    regressions = find_regressions(name, result, baseline, request.config.getoption("--benchmark-threshold"))
+    assert not regressions, "; ".join(regressions)
+
+
+def test_graceful_drain(start_nginx):
+    """Requests in flight when the unit is drained complete without errors."""
+    method, path, body_size, concurrency, _ = WORKLOADS["upload"]
+    nginx = start_nginx()
+
+    result = asyncio.run(drain_under_load(nginx, method, path, b"x" * body_size, concurrency=concurrency))
+    logger.info(f"drain: {result}")
+
+    assert result["completed"] > 0
+    assert result["errors"] == 0
+
+
+def test_readiness_probe(start_nginx):
+    """Concurrent readiness checks share a single Airbyte server probe, logged with its latency."""
+    nginx = start_nginx(health_probe_interval=60)
+
+    async def check():
+        return await asyncio.gather(*(fetch(nginx.port, "GET", "/readyz") for _ in range(20)))
+
+    responses = asyncio.run(check()) + asyncio.run(check())
+    cache_statuses = [headers["x-cache-status"] for _, headers, _ in responses]
+    logger.info(f"readiness probe: {cache_statuses}")
+    assert all(status == 200 for status, _, _ in responses)
+    assert cache_statuses.count("MISS") == 1
+    assert asyncio.run(fetch(nginx.port, "GET", "/healthz"))[0] == 200
+
+    log = "".join(bucket.read_text() for bucket in (nginx.workdir / "log" / "latency").glob("*.log"))
+    assert report(summarize_log(log, {}), {})["readiness-probe"]["requests"] == 1
+
+
+def test_api_unavailable(nginx_bin, tmp_path):
+    """API reads are served stale and other API requests get a JSON 503 once the server is down."""
+    server = StubAirbyteServer()
+    server.start()
+    nginx = NginxProcess(nginx_bin, tmp_path / "nginx", server.port, api_retry_after=5)
+    nginx.start()
+    try:
+        fresh = asyncio.run(fetch(nginx.port, "POST", "/api/v1/workspaces/get", workspace_request(1)))
+        assert fresh[0] == 200
+
+        server.stop()
+        # Let the cached response expire, so that it can only be served stale.
+        time.sleep(1.5)
+        stale = asyncio.run(fetch(nginx.port, "POST", "/api/v1/workspaces/get", workspace_request(1)))
+        assert stale[0] == 200
+        assert stale[2] == fresh[2]
+        # Reads are cached by request body, and writes are not served from the cache.
+        assert asyncio.run(fetch(nginx.port, "POST", "/api/v1/workspaces/get", workspace_request(2)))[0] == 503
+
+        for _ in range(5):
+            start = time.perf_counter()
+            status, headers, body = asyncio.run(
+                fetch(nginx.port, "POST", "/api/v1/workspaces/update", workspace_request(1))
+            )
+            logger.info(f"api unavailable: {status} in {(time.perf_counter() - start) * 1000:.1f}ms")
+            assert status == 503
+            assert headers["retry-after"] == "5"
+            assert headers["content-type"] == "application/json"
+            assert json.loads(body)["retryAfter"] == 5
+    finally:
+        nginx.stop(graceful=False)
+        server.stop()
+
+
+def test_warm_cache_after_restart(nginx_bin, tmp_path):
+    """API reads cached before nginx restarts are served stale after it, with the server down."""
+    server = StubAirbyteServer()
+    server.start()
+    workdir = tmp_path / "nginx"
+    requests = [workspace_request(i) for i in range(20)]
+    nginx = NginxProcess(nginx_bin, workdir, server.port)
+    nginx.start()
+    try:
+        fresh = {body: asyncio.run(fetch(nginx.port, "POST", "/api/v1/workspaces/get", body)) for body in requests}
+    finally:
+        nginx.stop()
+        server.stop()
+
+    # The cache directory outlives nginx, as on the nginx-cache storage.
+    restarted = NginxProcess(nginx_bin, workdir, server.port)
+    restarted.start()
+    try:
+        for request in requests:
+            status, _, body = asyncio.run(fetch(restarted.port, "POST", "/api/v1/workspaces/get", request))
+            assert status == 200
+            assert body == fresh[request][2]
+    finally:
+        restarted.stop()
+
+    log = "".join(bucket.read_text() for bucket in (workdir / "log" / "latency").glob("*.log"))
+    latency_report = report(summarize_log(log, {}), {})
+    logger.info(f"warm cache: {latency_report['api']}")
+    assert latency_report["api"]["cache_hit_ratio"] == 0.5
+
+
+def test_cache_after_upgrade(nginx_bin, tmp_path):
+    """Assets are cached forever, index.html revalidated, and API reads dropped on upgrade."""
+    server = StubAirbyteServer()
+    server.start()
+    workdir = tmp_path / "nginx"
+    nginx = NginxProcess(nginx_bin, workdir, server.port)
+    nginx.start()
+    try:
+        asset = asyncio.run(fetch(nginx.port, "GET", "/assets/index-3f2a9c1d.js"))
+        assert asset[1]["cache-control"] == "public, max-age=31536000, immutable"
+        for path in ("/", "/index.html", "/connections"):
+            assert asyncio.run(fetch(nginx.port, "GET", path))[1]["cache-control"] == "no-cache"
+        assert asyncio.run(fetch(nginx.port, "POST", "/api/v1/workspaces/get", workspace_request(1)))[0] == 200
+    finally:
+        nginx.stop()
+        server.stop()
+
+    # A new static build, on the same cache directory, while the server is down.
+    (workdir / "html" / "assets" / "Settings-9c8d7e6f.js").write_text("export default {};\n")
+    upgraded = NginxProcess(nginx_bin, workdir, server.port)
+    upgraded.start()
+    try:
+        assert asyncio.run(fetch(upgraded.port, "POST", "/api/v1/workspaces/get", workspace_request(1)))[0] == 503
+        asset = asyncio.run(fetch(upgraded.port, "GET", "/assets/Settings-9c8d7e6f.js"))
+        assert asset[1]["cache-control"] == "public, max-age=31536000, immutable"
+    finally:
+        upgraded.stop()
+
+
+def test_latency_logs(start_nginx):
+    """Requests are logged by route into latency buckets, and slow ones into the slow log."""
+    thresholds = "static=1,api=60000"
+    nginx = start_nginx(slow_request_thresholds=thresholds)
+
+    result = asyncio.run(run_workload(nginx.port, "GET", "/assets/index-3f2a9c1d.js", concurrency=4, requests=200))
+    asyncio.run(run_workload(nginx.port, "POST", "/api/v1/connections/list", concurrency=4, requests=100))
+    assert result["errors"] == 0
+
+    log = "".join(bucket.read_text() for bucket in (nginx.workdir / "log" / "latency").glob("*.log"))
+    latency_report = report(summarize_log(log, parse_thresholds(thresholds)), parse_thresholds(thresholds))
+    logger.info(f"latency: {latency_report}")
+    assert latency_report["static"]["requests"] == 200
+    assert latency_report["api"]["requests"] == 100
+    assert latency_report["api"]["slow"] == 0
+
+    slow_log = (nginx.workdir / "log" / "slow.log").read_text().splitlines()
+    assert len(slow_log) == latency_report["static"]["slow"]
+    assert all(" static " in line for line in slow_log)
+
+
+def test_rate_limits(start_nginx):
+    """Requests over the rate limit of their route get a JSON 429 telling when to retry."""
+    nginx = start_nginx(rate_limits="api=1r/m:5:nodelay")
+
+    statuses = []
+    for _ in range(10):
+        status, headers, body = asyncio.run(fetch(nginx.port, "POST", "/api/v1/connections/list"))
+        statuses.append(status)
+    logger.info(f"rate limits: {statuses}")
+    assert statuses == [200] * 6 + [429] * 4
+    assert headers["retry-after"] == "60"
+    assert headers["content-type"] == "application/json"
+    assert json.loads(body)["message"]
+
+    # Static assets are not limited, and the rejections are counted in the latency digest.
+    assert asyncio.run(fetch(nginx.port, "GET", "/assets/index-3f2a9c1d.js"))[0] == 200
+    log = "".join(bucket.read_text() for bucket in (nginx.workdir / "log" / "latency").glob("*.log"))
+    assert report(summarize_log(log, {}), {})["api"]["rate_limited"] == 4
+
+
+# Canary split keys: charm config overrides, and the header identifying each client.
+CANARY_KEYS = {
+    "address": ({"canary_key": "ip", "trusted_proxies": "127.0.0.1"}, "X-Real-IP", "10.1.{}.{}"),
+    # All clients connect from the same address, as through an untrusted ingress.
+    "session": ({"canary_key": "authorization"}, "Authorization", "Bearer token-{}-{}"),
+}
+
+
+@pytest.mark.parametrize("key", CANARY_KEYS)
+def test_canary_split(key, nginx_bin, stub_server, tmp_path):
+    """Clients are split stably between the servers, and the canary reported as its own route."""
+    config, header, client_value = CANARY_KEYS[key]
+    canary = StubAirbyteServer()
+    canary.start()
+    nginx = NginxProcess(
+        nginx_bin,
+        tmp_path / "nginx",
+        stub_server.port,
+        canary_port=canary.port,
+        canary_weight=20,
+        **config,
+    )
+    nginx.start()
+    try:
+        for client in range(200):
+            for _ in range(2):
+                headers = {header: client_value.format(client // 100, client % 100)}
+                status, _, _ = asyncio.run(fetch(nginx.port, "POST", "/api/v1/connections/list", headers=headers))
+                assert status == 200
+    finally:
+        nginx.stop(graceful=False)
+        canary.stop()
+
+    lines = "".join(
+        bucket.read_text() for bucket in sorted((nginx.workdir / "log" / "latency").glob("*.log"))
+    ).splitlines()
+    latency_report = report(summarize_log("\n".join(lines), {}), {})
+    logger.info(f"canary split by {key}: {latency_report}")
+    assert latency_report["api"]["requests"] + latency_report["api-canary"]["requests"] == 400
+    assert 40 <= latency_report["api-canary"]["requests"] <= 120
+    assert latency_report["api-canary"]["error_rate"] == 0
+    # Each client keeps using the same server.
+    assert [line.split(" ")[0] for line in lines[0::2]] == [line.split(" ")[0] for line in lines[1::2]]
+
+
+def test_connector_builder_affinity(nginx_bin, stub_server, tmp_path):
+    """Clients keep to the same connector builder replica, and only those of a failed one move."""
+    replicas = [StubAirbyteServer() for _ in range(3)]
+    for replica in replicas:
+        replica.start()
+    nginx = NginxProcess(
+        nginx_bin,
+        tmp_path / "nginx",
+        stub_server.port,
+        connector_builder_ports=[replica.port for replica in replicas],
+        connector_builder_load_balancing="consistent-hash",
+        connector_builder_affinity_key="header=X-User",
+    )
+    nginx.start()
+
+    def serving_replicas():
+        served = {}
+        for user in range(60):
+            status, headers, _ = asyncio.run(
+                fetch(nginx.port, "POST", "/connector-builder-api/v1/stream/read", headers={"X-User": f"user-{user}"})
+            )
+            assert status == 200
+            served[user] = int(headers["x-stub-port"])
+        return served
+
+    try:
+        before = serving_replicas()
+        assert serving_replicas() == before
+        assert len(set(before.values())) == 3
+
+        failed = replicas[0]
+        failed.stop()
+        after = serving_replicas()
+    finally:
+        nginx.stop(graceful=False)
+        for replica in replicas:
+            replica.stop()
+
+    moved = [user for user in before if before[user] != after[user]]
+    logger.info(f"connector builder affinity: {len(moved)} of {len(before)} clients moved")
+    assert failed.port not in after.values()
+    assert all(before[user] == failed.port for user in moved)
@@ -0,0 +1,264 @@
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Hook reconcile micro-benchmarks.
+
+Realistic event streams are replayed against the charm with ops.testing.Harness,
+counting the relation reads and writes and the Pebble API calls made per event.
+The counts are deterministic and compared to a JSON baseline: any increase fails.
+Wall time per event is reported, but not compared.
+"""
+
+import logging
+import time
+from unittest import mock
+
+import pytest
+from ops.model import RelationDataContent
+from ops.testing import Harness
+
+from charm import AirbyteUIK8sOperatorCharm
+from tests.benchmark.helpers import CallCounter
+from tests.unit.fake_kubernetes import FakeKubernetes
+
+logger = logging.getLogger(__name__)
+
+APP_NAME = "airbyte-webapp"
+SERVER_APP = "airbyte-k8s"
+SERVER_DATA = {"server_name": SERVER_APP, "server_status": "ready"}
+
+# Relation databag accesses, counted on the model rather than the backend because
+# the Harness model caches relation data across events while each hook does not.
+RELATION_READS = ("__getitem__",)
+RELATION_WRITES = ("__setitem__", "__delitem__")
+
+
+class ReconcileRecorder:
+    """Harness wrapper recording the cost of the events it emits.
+
+    Attrs:
+        harness: the Harness running the charm.
+    """
+
+    def __init__(self, harness):
+        """Construct.
+
+        Args:
+            harness: the Harness running the charm.
+        """
+        self.harness = harness
+        self._relation_calls = []
+        self._pebble = None
+
+    def _record_relation_access(self):
+        """Record the accesses to relation databags.
+
+        Returns:
+            Context manager patching the relation databags.
+        """
+        patches = {}
+        for name in RELATION_READS + RELATION_WRITES:
+            method = getattr(RelationDataContent, name)
+
+            def wrapped(content, *args, _name=name, _method=method, **kwargs):
+                self._relation_calls.append(_name)
+                return _method(content, *args, **kwargs)
+
+            patches[name] = wrapped
+        return mock.patch.multiple(RelationDataContent, **patches)
+
+    def instrument_pebble(self):
+        """Record the Pebble API calls made to the workload container."""
+        container = self.harness.model.unit.get_container(APP_NAME)
+        self._pebble = CallCounter(container._pebble)
+        container._pebble = self._pebble
+
+    def replay(self, events):
+        """Replay an event stream and measure its cost.
+
+        Args:
+            events: list of callables, each emitting one event.
+
+        Returns:
+            Dict with the counts per event. The wall time, which depends on the machine,
+            is only logged.
+        """
+        self._relation_calls.clear()
+        if self._pebble:
+            self._pebble.calls.clear()
+
+        with self._record_relation_access():
+            start = time.perf_counter()
+            for emit in events:
+                emit()
+            elapsed = time.perf_counter() - start
+
+        count = len(events)
+        pebble_calls = len(self._pebble.calls) if self._pebble else 0
+        logger.info(f"{count} events, {elapsed * 1000 / count:.3f}ms per event")
+        return {
+            "events": count,
+            "relation_reads_per_event": round(sum(call in RELATION_READS for call in self._relation_calls) / count, 3),
+            "relation_writes_per_event": round(
+                sum(call in RELATION_WRITES for call in self._relation_calls) / count, 3
+            ),
+            "pebble_calls_per_event": round(pebble_calls / count, 3),
+        }
+
+
+def make_recorder():
+    """Start the charm in a Harness with recorded backends.
+
+    Returns:
+        Tuple of (ReconcileRecorder, Harness).
+    """
+    harness = Harness(AirbyteUIK8sOperatorCharm)
+    harness.set_can_connect(APP_NAME, True)
+    harness.set_leader(True)
+    harness.set_model_name("airbyte-model")
+    harness.begin()
+    recorder = ReconcileRecorder(harness)
+    recorder.instrument_pebble()
+    return recorder, harness
+
+
+def relate(harness):
+    """Set up the peer and Airbyte server relations.
+
+    Args:
+        harness: the Harness running the charm.
+
+    Returns:
+        The Airbyte server relation id.
+    """
+    harness.add_relation("peer", "airbyte")
+    return harness.add_relation("airbyte-server", SERVER_APP, app_data=SERVER_DATA)
+
+
+def scenario_pebble_ready(recorder, harness):
+    """Replay pebble-ready once the relations are set up.
+
+    Args:
+        recorder: the ReconcileRecorder.
+        harness: the Harness running the charm.
+
+    Returns:
+        The replay measurements.
+    """
+    relate(harness)
+    container = harness.model.unit.get_container(APP_NAME)
+    return recorder.replay([lambda: harness.charm.on.airbyte_webapp_pebble_ready.emit(container)])
+
+
+def scenario_server_relation_burst(recorder, harness):
+    """Replay a burst of relation-changed events from the Airbyte server.
+
+    Args:
+        recorder: the ReconcileRecorder.
+        harness: the Harness running the charm.
+
+    Returns:
+        The replay measurements.
+    """
+    relation_id = relate(harness)
+    statuses = ["starting", "ready"] * 10
+    return recorder.replay(
+        [
+            lambda status=status: harness.update_relation_data(relation_id, SERVER_APP, {"server_status": status})
+            for status in statuses
+        ]
+    )
+
+
+def scenario_peer_relation_fanout(recorder, harness):
+    """Replay peer relation-changed events not changing what the workload depends on.
+
+    Args:
+        recorder: the ReconcileRecorder.
+        harness: the Harness running the charm.
+
+    Returns:
+        The replay measurements.
+    """
+    relate(harness)
+    container = harness.model.unit.get_container(APP_NAME)
+    harness.charm.on.airbyte_webapp_pebble_ready.emit(container)
+    relation_id = harness.model.get_relation("peer").id
+    harness.add_relation_unit(relation_id, f"{harness.model.app.name}/1")
+    return recorder.replay(
+        [
+            lambda tick=tick: harness.update_relation_data(
+                relation_id, f"{harness.model.app.name}/1", {"tick": str(tick)}
+            )
+            for tick in range(20)
+        ]
+    )
+
+
+def scenario_config_storm(recorder, harness):
+    """Replay a storm of config-changed events.
+
+    Args:
+        recorder: the ReconcileRecorder.
+        harness: the Harness running the charm.
+
+    Returns:
+        The replay measurements.
+    """
+    relate(harness)
+    return recorder.replay(
+        [
+            lambda timeout=timeout: harness.update_config({"connector-builder-read-timeout": timeout})
+            for timeout in range(600, 650)
+        ]
+    )
+
+
+def scenario_update_status_ticks(recorder, harness):
+    """Replay hundreds of update-status ticks on a healthy unit.
+
+    Args:
+        recorder: the ReconcileRecorder.
+        harness: the Harness running the charm.
+
+    Returns:
+        The replay measurements.
+    """
+    relate(harness)
+    container = harness.model.unit.get_container(APP_NAME)
+    harness.charm.on.airbyte_webapp_pebble_ready.emit(container)
+    return recorder.replay([harness.charm.on.update_status.emit for _ in range(300)])
+
+
+SCENARIOS = {
+    "pebble-ready": scenario_pebble_ready,
+    "server-relation-burst": scenario_server_relation_burst,
+    "peer-relation-fanout": scenario_peer_relation_fanout,
+    "config-storm": scenario_config_storm,
+    "update-status-ticks": scenario_update_status_ticks,
+}
+
+COUNTED = ("relation_reads_per_event", "relation_writes_per_event", "pebble_calls_per_event")
+
+
+@pytest.mark.parametrize("scenario", SCENARIOS)
+def test_reconcile_cost(scenario, reconcile_baseline):
+    """The per-event reconcile cost does not increase over the baseline."""
+    recorder, harness = make_recorder()
+    kubernetes = FakeKubernetes(harness.model.app.name, containers=("charm", APP_NAME))
+    try:
+        with mock.patch("charm.kubernetes_client", return_value=kubernetes):
+            result = SCENARIOS[scenario](recorder, harness)
+    finally:
+        harness.cleanup()
+    logger.info(f"{scenario}: {result}")
+
+    baseline, results = reconcile_baseline
+    results[scenario] = result
+    previous = baseline.get(scenario, {})
+    increases = [
+        f"{scenario}: {metric} {result[metric]}, baseline {previous[metric]}"
+        for metric in COUNTED
+        if metric in previous and result[metric] > previous[metric]
+    ]
+    assert not increases, "; ".join(increases)
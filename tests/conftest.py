@@ -16,3 +16,11 @@ def pytest_addoption(parser: pytest.Parser):
     parser.addoption("--charm-file", action="append", default=[])
     # The charm image name:tag.
     parser.addoption("--airbyte-ui-image", action="store", default="")
+    # The nginx binary used by the benchmarks, defaults to the one on the PATH.
+    parser.addoption("--nginx-binary", action="store", default="")
+    # The baseline the benchmark results are compared to.
+    parser.addoption("--benchmark-baseline", action="store", default="")
+    # Tolerated relative regression against the baseline.
+    parser.addoption("--benchmark-threshold", action="store", type=float, default=0.2)
+    # Write the benchmark results as the new baseline.
+    parser.addoption("--benchmark-update-baseline", action="store_true", default=False)
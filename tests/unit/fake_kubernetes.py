@@ -0,0 +1,110 @@
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Stand-in for the Kubernetes API used by the charm."""
+
+try:
+    import httpx2 as httpx
+except ImportError:
+    import httpx
+from lightkube import ApiError
+from lightkube.models.apps_v1 import StatefulSetSpec
+from lightkube.models.core_v1 import (
+    Container,
+    PodSpec,
+    PodTemplateSpec,
+    ResourceRequirements,
+)
+from lightkube.models.meta_v1 import LabelSelector, ObjectMeta, Status
+from lightkube.resources.apps_v1 import StatefulSet
+
+
+class FakeKubernetes:
+    """Fake lightkube client serving the StatefulSet of a Juju application.
+
+    Strategic merge patches to the container resources are applied as Kubernetes
+    would, and recorded.
+
+    Attrs:
+        statefulset: the StatefulSet of the application.
+        patches: patches applied to the StatefulSet.
+        forbidden: whether requests are denied, as for an untrusted application.
+        unavailable: whether the API server fails the requests.
+        unreachable: whether the API server cannot be connected to.
+    """
+
+    def __init__(self, app_name, containers=("charm",)):
+        """Construct.
+
+        Args:
+            app_name: name of the application.
+            containers: names of the containers of the pod.
+        """
+        self.statefulset = StatefulSet(
+            metadata=ObjectMeta(name=app_name),
+            spec=StatefulSetSpec(
+                selector=LabelSelector(matchLabels={"app.kubernetes.io/name": app_name}),
+                serviceName=f"{app_name}-endpoints",
+                template=PodTemplateSpec(
+                    spec=PodSpec(
+                        containers=[Container(name=name, resources=ResourceRequirements()) for name in containers]
+                    )
+                ),
+            ),
+        )
+        self.patches = []
+        self.forbidden = False
+        self.unavailable = False
+        self.unreachable = False
+
+    def get(self, res, name, *, namespace=None):
+        """Get the StatefulSet.
+
+        Args:
+            res: the resource type.
+            name: name of the StatefulSet.
+            namespace: namespace of the StatefulSet.
+
+        Returns:
+            The StatefulSet.
+        """
+        self._check(res, name)
+        return self.statefulset
+
+    def patch(self, res, name, obj, *, namespace=None):
+        """Apply a strategic merge patch to the container resources of the StatefulSet.
+
+        Args:
+            res: the resource type.
+            name: name of the StatefulSet.
+            obj: the patch.
+            namespace: namespace of the StatefulSet.
+        """
+        self._check(res, name)
+        self.patches.append(obj)
+        containers = {container.name: container for container in self.statefulset.spec.template.spec.containers}
+        for patch in obj["spec"]["template"]["spec"]["containers"]:
+            resources = containers[patch["name"]].resources
+            for kind, quantities in patch["resources"].items():
+                merged = {**(getattr(resources, kind) or {}), **quantities}
+                setattr(resources, kind, {key: value for key, value in merged.items() if value is not None} or None)
+
+    def _check(self, res, name):
+        """Check a request is allowed and targets the StatefulSet.
+
+        Args:
+            res: the resource type.
+            name: name of the StatefulSet.
+
+        Raises:
+            ApiError: if requests are forbidden or fail, or the StatefulSet does not exist.
+            ConnectError: if the API server is unreachable.
+        """
+        if self.unreachable:
+            raise httpx.ConnectError("connection refused")
+        if self.unavailable:
+            raise ApiError(status=Status(code=503, message="unavailable"))
+        if self.forbidden:
+            raise ApiError(status=Status(code=403, message="forbidden"))
+        if res is not StatefulSet or name != self.statefulset.metadata.name:
+            raise ApiError(status=Status(code=404, message="not found"))
@@ -0,0 +1,125 @@
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Access log analysis unit tests."""
+
+import gzip
+import io
+import tempfile
+from datetime import datetime, timedelta, timezone
+from unittest import TestCase
+
+from access_log import (
+    HyperLogLog,
+    SpaceSaving,
+    analyze,
+    parse,
+    read_lines,
+    read_records,
+)
+
+NOW = datetime(2024, 5, 1, 13, 7, tzinfo=timezone.utc)
+
+
+def log_line(time, path="/", status=200, sent=100, request_time="0.010", address="10.1.0.1", forwarded="-"):
+    """Format a line of the `main` nginx log format.
+
+    Args:
+        time: time of the request.
+        path: path requested.
+        status: response status.
+        sent: bytes sent.
+        request_time: request time, in seconds.
+        address: address of the peer.
+        forwarded: X-Forwarded-For header.
+
+    Returns:
+        The line.
+    """
+    return (
+        f'{address} - - [{time.strftime("%d/%b/%Y:%H:%M:%S %z")}] "GET {path} HTTP/1.1" {status} {sent} '
+        f'"-" "Mozilla/5.0" "{forwarded}" rt={request_time} urt=0.009 gz=-\n'
+    ).encode()
+
+
+class TestAccessLog(TestCase):
+    """Unit tests for the access log analysis."""
+
+    def test_read_lines(self):
+        """Lines are read from mapped files, in chunks from streams, and from compressed logs."""
+        content = b"".join(log_line(NOW, f"/{i}") for i in range(1000))
+        with tempfile.TemporaryFile() as file:
+            file.write(content)
+            file.seek(0)
+            self.assertEqual(len(list(read_lines(file))), 1000)
+        self.assertEqual(len(list(read_lines(io.BytesIO(content)))), 1000)
+        self.assertEqual(list(read_lines(io.BytesIO(b"a\nb"))), [b"a", b"b"])
+        with tempfile.TemporaryFile() as file:
+            self.assertEqual(list(read_lines(file)), [])
+        records = list(read_records(io.BytesIO(gzip.compress(content)), compressed=True))
+        self.assertEqual(len(records), 1000)
+
+    def test_parse(self):
+        """Records give the minute, client, normalized path, status, bytes and request time."""
+        lines = [
+            log_line(NOW + timedelta(seconds=59), "/api/v1/workspaces/get?id=1", 404, 12, "1.500"),
+            log_line(
+                NOW, "/api/v1/jobs/42/attempts/3f2504e0-4f89-11d3-9a0c-0305e82c3301", forwarded="1.2.3.4, 10.0.0.1"
+            ),
+            b"not an access log line\n",
+        ]
+        self.assertEqual(
+            list(parse(lines)),
+            [
+                (NOW, b"10.1.0.1", b"/api/v1/workspaces/get", 404, 12, 1.5),
+                (NOW, b"1.2.3.4", b"/api/v1/jobs/{id}/attempts/{id}", 200, 100, 0.01),
+            ],
+        )
+
+    def test_space_saving(self):
+        """The heaviest keys are kept when more keys than the capacity are added."""
+        summary = SpaceSaving(10)
+        for i in range(1000):
+            summary.add("heavy", 5)
+            summary.add(f"light-{i}")
+        self.assertEqual(len(summary.weights), 10)
+        self.assertEqual(summary.top(1)[0][0], "heavy")
+        self.assertGreaterEqual(summary.top(1)[0][1], 5000)
+
+    def test_hyperloglog(self):
+        """Unique keys are estimated within a few percent."""
+        for count in (0, 10, 1000, 100000):
+            clients = HyperLogLog()
+            for i in range(count):
+                clients.add(f"10.{i // 65536}.{i // 256 % 256}.{i % 256}".encode())
+                clients.add(b"10.0.0.0")
+            self.assertLessEqual(abs(clients.count() - count), count * 0.05, count)
+
+    def test_analyze(self):
+        """The analysis covers the requests within the window."""
+        lines = [log_line(NOW - timedelta(hours=2), "/old")]
+        lines += [log_line(NOW, "/api/v1/connections/list", sent=2000, address=f"10.1.0.{i % 3}") for i in range(30)]
+        lines += [log_line(NOW + timedelta(minutes=1), "/assets/app.js", sent=900000, request_time="2.000")]
+        lines += [log_line(NOW + timedelta(minutes=1), "/api/v1/health", status=502) for _ in range(4)]
+        analysis = analyze(parse(lines), NOW - timedelta(hours=1), top=2)
+
+        self.assertEqual(analysis["requests"], 35)
+        self.assertEqual(
+            analysis["top_paths"]["requests"],
+            [{"path": "/api/v1/connections/list", "requests": 30}, {"path": "/api/v1/health", "requests": 4}],
+        )
+        self.assertEqual(analysis["top_paths"]["bytes"][0], {"path": "/assets/app.js", "bytes": 900000})
+        self.assertEqual(analysis["top_paths"]["seconds"][0], {"path": "/assets/app.js", "seconds": 2.0})
+        self.assertEqual(analysis["status_classes"], {"2xx": 31, "5xx": 4})
+        self.assertEqual(
+            analysis["peak_minute"],
+            {"minute": NOW.isoformat(), "requests": 30, "requests_per_second": 0.5},
+        )
+        self.assertEqual(analysis["unique_clients"], 3)
+
+    def test_analyze_empty(self):
+        """An empty window has no peak minute."""
+        analysis = analyze(parse([log_line(NOW - timedelta(hours=2))]), NOW, top=10)
+        self.assertEqual(analysis["requests"], 0)
+        self.assertIsNone(analysis["peak_minute"])
+        self.assertEqual(analysis["unique_clients"], 0)
@@ -0,0 +1,78 @@
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+#
+# Learn more about testing at: https://juju.is/docs/sdk/testing
+
+
+"""Immutable asset manifest build script unit tests."""
+
+import importlib.util
+import json
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+SCRIPT = Path(__file__).parents[2] / "airbyte_ui_rock" / "scripts" / "asset_manifest.py"
+spec = importlib.util.spec_from_file_location("asset_manifest", SCRIPT)
+asset_manifest = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(asset_manifest)
+
+
+class TestAssetManifest(TestCase):
+    """Unit tests for the immutable asset manifest build script."""
+
+    def setUp(self):
+        """Create setup for the unit tests."""
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.html_dir = Path(tmp.name)
+        for path in (
+            "index.html",
+            "oauth-callback.html",
+            "favicon.ico",
+            "assets/index-3f2a9c1d.js",
+            "assets/index-8b7e6f5a.css",
+            "assets/fonts/inter-BPDzUtJL.woff2",
+            "assets/vendor-react-dom.js",
+            "assets/logo.svg",
+        ):
+            (self.html_dir / path).parent.mkdir(parents=True, exist_ok=True)
+            (self.html_dir / path).write_text(path)
+
+    def test_immutable_assets(self):
+        """Only the content-hashed assets are immutable."""
+        self.assertEqual(
+            asset_manifest.immutable_assets(self.html_dir),
+            ["/assets/fonts/inter-BPDzUtJL.woff2", "/assets/index-3f2a9c1d.js", "/assets/index-8b7e6f5a.css"],
+        )
+
+    def test_manifest_assets(self):
+        """Files emitted by Vite according to its manifest are immutable."""
+        manifest = {
+            "index.html": {"file": "assets/index-3f2a9c1d.js", "isEntry": True, "assets": ["assets/logo.svg"]},
+        }
+        (self.html_dir / ".vite").mkdir()
+        (self.html_dir / ".vite" / "manifest.json").write_text(json.dumps(manifest))
+
+        self.assertIn("/assets/logo.svg", asset_manifest.immutable_assets(self.html_dir))
+        self.assertNotIn("/index.html", asset_manifest.immutable_assets(self.html_dir))
+
+    def test_build_digest(self):
+        """The build digest changes with the content and names of the files."""
+        digest = asset_manifest.build_digest(self.html_dir)
+        self.assertEqual(asset_manifest.build_digest(self.html_dir), digest)
+
+        (self.html_dir / "index.html").write_text("new build")
+        self.assertNotEqual(asset_manifest.build_digest(self.html_dir), digest)
+        digest = asset_manifest.build_digest(self.html_dir)
+        (self.html_dir / "favicon.ico").rename(self.html_dir / "favicon.png")
+        self.assertNotEqual(asset_manifest.build_digest(self.html_dir), digest)
+
+    def test_nginx_snippets(self):
+        """The snippets are entries of the maps of the default nginx configuration."""
+        snippets = asset_manifest.nginx_snippets(self.html_dir)
+
+        self.assertIn(
+            '/assets/index-3f2a9c1d.js "public, max-age=31536000, immutable";\n', snippets["immutable-assets.conf"]
+        )
+        self.assertIn(f'"" {asset_manifest.build_digest(self.html_dir)};\n', snippets["static-build.conf"])
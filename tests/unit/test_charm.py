@@ -8,15 +8,41 @@
 
 # pylint:disable=protected-access
 
+import cProfile
+import gzip
+import json
+import tempfile
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
 from unittest import TestCase, mock
 
-from ops.model import ActiveStatus, BlockedStatus, MaintenanceStatus
+from ops.model import ActiveStatus, BlockedStatus, MaintenanceStatus, WaitingStatus
 from ops.pebble import CheckStatus
-from ops.testing import Harness
+from ops.testing import ActionFailed, Harness
 
 from charm import AirbyteUIK8sOperatorCharm
-from literals import AIRBYTE_VERSION
-from src.charm import CONNECTOR_BUILDER_API_PORT, INTERNAL_API_PORT, WEB_UI_PORT
+from latency import bucket_name
+from literals import (
+    AIRBYTE_VERSION,
+    API_UNAVAILABLE_PORT,
+    CONNECTOR_BUILDER_API_PORT,
+    FULL_STATUS_CHECK_INTERVAL,
+    INTERNAL_API_PORT,
+    LATENCY_BUCKET_MINUTES,
+    LATENCY_LOG_DIR,
+    NGINX_BROTLI_MODULE,
+    NGINX_CONF_PATH,
+    NGINX_DEFAULT_CONF_PATH,
+    NGINX_DRAIN_MARKER_PATH,
+    NGINX_LOG_DIR,
+    NGINX_TLS_CERT_PATH,
+    NGINX_TLS_KEY_PATH,
+    WEB_UI_PORT,
+    WEB_UI_TLS_PORT,
+)
+from nginx import config_hash
+from profiling import ProfileStore
+from tests.unit.fake_kubernetes import FakeKubernetes
 
 APP_NAME = "airbyte-webapp"
 mock_incomplete_pebble_plan = {"services": {"airbyte-webapp": {"override": "replace"}}}
@@ -38,6 +64,10 @@ class TestCharm(TestCase):
         self.harness.set_can_connect(APP_NAME, True)
         self.harness.set_leader(True)
         self.harness.set_model_name("airbyte-model")
+        self.kubernetes = FakeKubernetes(self.harness.model.app.name, containers=("charm", APP_NAME))
+        kubernetes_client = mock.patch("charm.kubernetes_client", return_value=self.kubernetes)
+        kubernetes_client.start()
+        self.addCleanup(kubernetes_client.stop)
         self.harness.begin()
 
     def test_initial_plan(self):
@@ -120,6 +150,71 @@ class TestCharm(TestCase):
             "backend-protocol": "HTTP",
         }
 
+    def test_workload_tls(self):
+        """The pod terminates TLS with HTTP/2 when a certificate secret is configured."""
+        harness = self.harness
+
+        simulate_lifecycle(harness)
+        nginx_route_relation_id = harness.add_relation("nginx-route", "ingress")
+
+        secret_id = harness.add_user_secret({"certificate": "CERT", "private-key": "KEY"})
+        harness.grant_secret(secret_id, harness.charm.app)
+        harness.update_config({"workload-tls-secret": secret_id})
+
+        container = harness.model.unit.get_container(APP_NAME)
+        self.assertEqual(container.pull(NGINX_TLS_CERT_PATH).read(), "CERT")
+        self.assertEqual(container.pull(NGINX_TLS_KEY_PATH).read(), "KEY")
+
+        default_conf = pull_default_conf(harness)
+        self.assertIn(f"listen       {WEB_UI_TLS_PORT} ssl http2;", default_conf)
+        self.assertIn(f"ssl_certificate_key {NGINX_TLS_KEY_PATH};", default_conf)
+        self.assertIn("ssl_session_cache   shared:SSL:10m;", default_conf)
+        self.assertIn("ssl_session_tickets on;", default_conf)
+
+        relation_data = harness.get_relation_data(nginx_route_relation_id, harness.charm.app)
+        self.assertEqual(relation_data["backend-protocol"], "HTTPS")
+        self.assertEqual(relation_data["service-port"], str(WEB_UI_TLS_PORT))
+
+    def test_workload_tls_incomplete_secret(self):
+        """The charm is blocked when the certificate secret is incomplete."""
+        harness = self.harness
+
+        simulate_lifecycle(harness)
+
+        secret_id = harness.add_user_secret({"certificate": "CERT"})
+        harness.grant_secret(secret_id, harness.charm.app)
+        harness.update_config({"workload-tls-secret": secret_id})
+
+        self.assertEqual(
+            harness.model.unit.status,
+            BlockedStatus("config: workload-tls-secret must contain certificate and private-key"),
+        )
+        self.assertNotIn("ssl", pull_default_conf(harness))
+
+    def test_workload_tls_unavailable_secret(self):
+        """The ingress keeps reaching the pod over HTTP until the certificate is given to nginx."""
+        harness = self.harness
+
+        simulate_lifecycle(harness)
+        nginx_route_relation_id = harness.add_relation("nginx-route", "ingress")
+        harness.charm._require_nginx_route()
+
+        # The secret is not granted to the charm.
+        secret_id = harness.add_user_secret({"certificate": "CERT", "private-key": "KEY"})
+        harness.update_config({"workload-tls-secret": secret_id})
+        self.assertIsInstance(harness.model.unit.status, BlockedStatus)
+        self.assertNotIn("ssl", pull_default_conf(harness))
+
+        relation_data = harness.get_relation_data(nginx_route_relation_id, harness.charm.app)
+        self.assertEqual(relation_data["backend-protocol"], "HTTP")
+        self.assertEqual(relation_data["service-port"], str(WEB_UI_PORT))
+
+        harness.grant_secret(secret_id, harness.charm.app)
+        harness.update_config({"external-hostname": "airbyte.example.com"})
+        relation_data = harness.get_relation_data(nginx_route_relation_id, harness.charm.app)
+        self.assertEqual(relation_data["backend-protocol"], "HTTPS")
+        self.assertEqual(relation_data["service-port"], str(WEB_UI_TLS_PORT))
+
     def test_ready(self):
         """The pebble plan is correctly generated when the charm is ready."""
         harness = self.harness
@@ -142,18 +237,31 @@ class TestCharm(TestCase):
                         "CONNECTOR_BUILDER_API_URL": "/connector-builder-api",
                         "INTERNAL_API_HOST": f"airbyte-k8s:{INTERNAL_API_PORT}",
                         "CONNECTOR_BUILDER_API_HOST": f"airbyte-k8s:{CONNECTOR_BUILDER_API_PORT}",
-                        "KEYCLOAK_INTERNAL_HOST": "localhost",
                         "PORT": WEB_UI_PORT,
+                        "NGINX_CONFIG_HASH": config_hash(pull_nginx_conf(harness), pull_default_conf(harness)),
                     },
                     "on-check-failure": {"up": "ignore"},
+                    "on-success": "ignore",
                 },
             },
             "checks": {
                 "up": {
                     "override": "replace",
                     "period": "10s",
-                    "http": {"url": f"http://localhost:{WEB_UI_PORT}"},
-                }
+                    "http": {"url": f"http://localhost:{WEB_UI_PORT}/healthz"},
+                },
+                "ready": {
+                    "override": "replace",
+                    "level": "ready",
+                    "period": "5s",
+                    "threshold": 1,
+                    "http": {"url": f"http://localhost:{WEB_UI_PORT}/healthz"},
+                },
+                "api": {
+                    "override": "replace",
+                    "period": "10s",
+                    "http": {"url": f"http://localhost:{WEB_UI_PORT}/readyz"},
+                },
             },
         }
 
@@ -164,6 +272,229 @@ class TestCharm(TestCase):
         service = harness.model.unit.get_container(APP_NAME).get_service(APP_NAME)
         self.assertTrue(service.is_running())
 
+    def test_connector_builder_default_upstream(self):
+        """The connector builder is routed to the server when no dedicated pool is advertised."""
+        harness = self.harness
+
+        simulate_lifecycle(harness)
+
+        default_conf = pull_default_conf(harness)
+        self.assertIn(f"server airbyte-k8s:{INTERNAL_API_PORT} max_fails=3 fail_timeout=10s;", default_conf)
+        self.assertIn(
+            "upstream connector-builder-server {\n"
+            f"    server airbyte-k8s:{CONNECTOR_BUILDER_API_PORT};\n"
+            "    keepalive 16;\n}",
+            default_conf,
+        )
+        self.assertIn("proxy_read_timeout 3600s;", default_conf)
+
+    def test_connector_builder_dedicated_pool(self):
+        """The connector builder is routed to the replicas advertised by the server."""
+        harness = self.harness
+
+        harness.update_config({"connector-builder-load-balancing": "least-conn", "connector-builder-read-timeout": 600})
+        simulate_lifecycle(harness, {"connector_builder_replicas": "builder-0.builder:8080, builder-1.builder:8080"})
+
+        default_conf = pull_default_conf(harness)
+        self.assertIn(
+            "upstream connector-builder-server {\n"
+            "    least_conn;\n"
+            "    server builder-0.builder:8080;\n"
+            "    server builder-1.builder:8080;\n"
+            "    keepalive 16;\n}",
+            default_conf,
+        )
+        self.assertIn("proxy_read_timeout 600s;", default_conf)
+
+        env = harness.get_container_pebble_plan(APP_NAME).to_dict()["services"][APP_NAME]["environment"]
+        self.assertEqual(env["CONNECTOR_BUILDER_API_HOST"], "builder-0.builder:8080")
+
+    def test_connector_builder_dedicated_service(self):
+        """The connector builder is routed to a dedicated service advertised by the server."""
+        harness = self.harness
+
+        simulate_lifecycle(harness, {"connector_builder_host": "builder", "connector_builder_port": "8080"})
+
+        default_conf = pull_default_conf(harness)
+        self.assertIn("    server builder:8080;\n", default_conf)
+
+    def test_auth_provider_not_configured(self):
+        """Requests under /auth/ are answered directly when no auth provider is configured."""
+        harness = self.harness
+
+        simulate_lifecycle(harness)
+
+        default_conf = pull_default_conf(harness)
+        self.assertNotIn("upstream keycloak", default_conf)
+        self.assertNotIn("proxy_pass http://keycloak", default_conf)
+        self.assertIn("location /auth/ {\n        return 404;\n    }", default_conf)
+
+    def test_auth_provider_configured(self):
+        """Requests under /auth/ are proxied to the configured auth provider."""
+        harness = self.harness
+
+        harness.update_config({"keycloak-internal-host": "keycloak:8180"})
+        simulate_lifecycle(harness)
+
+        default_conf = pull_default_conf(harness)
+        self.assertIn("upstream keycloak {\n    server keycloak:8180;\n}", default_conf)
+        self.assertIn("proxy_pass http://keycloak/auth/;", default_conf)
+
+        env = harness.get_container_pebble_plan(APP_NAME).to_dict()["services"][APP_NAME]["environment"]
+        self.assertEqual(env["KEYCLOAK_INTERNAL_HOST"], "keycloak:8180")
+
+    def test_invalid_auth_provider(self):
+        """The charm is blocked by an auth provider address that is not `host[:port]`."""
+        harness = self.harness
+
+        simulate_lifecycle(harness)
+        harness.update_config({"keycloak-internal-host": "keycloak:8180; }"})
+        self.assertEqual(
+            harness.model.unit.status, BlockedStatus("config: invalid keycloak-internal-host 'keycloak:8180; }'")
+        )
+        self.assertNotIn("upstream keycloak", pull_default_conf(harness))
+
+        harness.update_config({"keycloak-internal-host": "keycloak:70000"})
+        self.assertEqual(
+            harness.model.unit.status, BlockedStatus("config: invalid keycloak-internal-host 'keycloak:70000'")
+        )
+
+    def test_preload_hints(self):
+        """The preload hints generated at image build time are sent with index.html."""
+        harness = self.harness
+
+        simulate_lifecycle(harness)
+
+        default_conf = pull_default_conf(harness)
+        self.assertIn(
+            "        location = /index.html {\n"
+            "            add_header Content-Security-Policy \"script-src * 'unsafe-inline'; worker-src 'self' blob:;\";\n"
+            "            add_header Cache-Control $static_cache_control;\n"
+            "            include /etc/nginx/snippets/preload-hints*.conf;\n"
+            "        }\n",
+            default_conf,
+        )
+
+    def test_cache_namespace(self):
+        """Hashed assets are cached forever, and API responses namespaced by version and build."""
+        harness = self.harness
+
+        simulate_lifecycle(harness)
+
+        default_conf = pull_default_conf(harness)
+        self.assertIn("    default no-cache;\n    include /etc/nginx/snippets/immutable-assets*.conf;", default_conf)
+        self.assertIn("    default unknown;\n    include /etc/nginx/snippets/static-build*.conf;", default_conf)
+        self.assertIn(f'proxy_cache_key       "{AIRBYTE_VERSION}:$static_build:$request_method', default_conf)
+
+    def test_nginx_conf(self):
+        """The nginx configuration matches the one shipped by the rock by default."""
+        harness = self.harness
+
+        simulate_lifecycle(harness)
+
+        rock_conf = (Path(__file__).parents[2] / "airbyte_ui_rock/files/nginx.conf").read_text()
+        self.assertEqual(pull_nginx_conf(harness), rock_conf)
+
+    def test_api_compression(self):
+        """JSON API responses are compressed by nginx by default."""
+        harness = self.harness
+
+        simulate_lifecycle(harness)
+
+        default_conf = pull_default_conf(harness)
+        self.assertIn("gzip_types        application/json;", default_conf)
+        self.assertIn("gzip_comp_level   5;", default_conf)
+        self.assertIn("gzip_min_length   1024;", default_conf)
+        self.assertIn('proxy_set_header Accept-Encoding "";', default_conf)
+        self.assertNotIn("brotli", default_conf)
+        self.assertNotIn("load_module", pull_nginx_conf(harness))
+
+    def test_api_compression_brotli(self):
+        """Brotli compression loads the brotli module."""
+        harness = self.harness
+
+        harness.update_config(
+            {"api-compression": "brotli", "api-compression-level": 3, "api-upstream-compression": True}
+        )
+        simulate_lifecycle(harness)
+
+        default_conf = pull_default_conf(harness)
+        self.assertIn("brotli_comp_level 3;", default_conf)
+        self.assertNotIn("Accept-Encoding", default_conf)
+        self.assertTrue(pull_nginx_conf(harness).startswith(f"load_module {NGINX_BROTLI_MODULE};\n\n"))
+
+    def test_api_compression_off(self):
+        """JSON API responses can be proxied uncompressed."""
+        harness = self.harness
+
+        harness.update_config({"api-compression": "off"})
+        simulate_lifecycle(harness)
+
+        default_conf = pull_default_conf(harness)
+        self.assertNotIn("gzip", default_conf)
+        self.assertNotIn("Accept-Encoding", default_conf)
+
+    def test_invalid_api_compression_level(self):
+        """The charm is blocked when the compression level is out of range."""
+        harness = self.harness
+
+        simulate_lifecycle(harness)
+        harness.update_config({"api-compression-level": 11})
+
+        self.assertEqual(
+            harness.model.unit.status,
+            BlockedStatus("config: api-compression-level must be between 1 and 9"),
+        )
+
+    def test_invalid_connector_builder_load_balancing(self):
+        """The charm is blocked when the connector builder load balancing method is invalid."""
+        harness = self.harness
+
+        simulate_lifecycle(harness)
+        harness.update_config({"connector-builder-load-balancing": "random"})
+
+        self.assertEqual(
+            harness.model.unit.status,
+            BlockedStatus("config: invalid connector-builder-load-balancing 'random'"),
+        )
+
+    def test_invalid_profile_retention(self):
+        """The charm is blocked, and keeps its profiles, when the retention is not positive."""
+        harness = self.harness
+
+        with tempfile.TemporaryDirectory() as tmp:
+            harness.charm._profiles = ProfileStore(tmp)
+            harness.update_config({"profile-hooks": True, "profile-retention": 5})
+            simulate_lifecycle(harness)
+            harness.update_config({"profile-retention": -1})
+
+            self.assertEqual(harness.charm._profiles.retention(), 5)
+            self.assertEqual(
+                harness.model.unit.status,
+                BlockedStatus("config: profile-retention must be between 1 and 1000"),
+            )
+
+    def test_get_profiles(self):
+        """Hook profiles can be enabled and retrieved through an action."""
+        harness = self.harness
+
+        with tempfile.TemporaryDirectory() as tmp:
+            harness.charm._profiles = ProfileStore(tmp)
+            harness.update_config({"profile-hooks": True, "profile-retention": 5})
+            self.assertEqual(harness.charm._profiles.retention(), 5)
+
+            output = harness.run_action("get-profiles")
+            self.assertEqual(output.results, {"count": 0, "profiles": "[]"})
+
+            harness.charm._profiles.save(cProfile.Profile(), "update-status", 0.1, [])
+            output = harness.run_action("get-profiles", {"count": 1, "top": 3})
+            (profile,) = json.loads(output.results["profiles"])
+            self.assertEqual(profile["hook"], "update-status")
+            self.assertIn("functions", profile)
+
+            harness.update_config({"profile-hooks": False})
+            self.assertIsNone(harness.charm._profiles.retention())
+
     def test_update_status_up(self):
         """The charm updates the unit status to active based on UP status."""
         harness = self.harness
@@ -171,8 +502,7 @@ class TestCharm(TestCase):
         simulate_lifecycle(harness)
 
         container = harness.model.unit.get_container(APP_NAME)
-        container.get_check = mock.Mock(status="up")
-        container.get_check.return_value.status = CheckStatus.UP
+        mock_checks(container, up=CheckStatus.UP)
         harness.charm.on.update_status.emit()
 
         self.assertEqual(harness.model.unit.status, ActiveStatus())
@@ -184,12 +514,646 @@ class TestCharm(TestCase):
         simulate_lifecycle(harness)
 
         container = harness.model.unit.get_container(APP_NAME)
-        container.get_check = mock.Mock(status="up")
-        container.get_check.return_value.status = CheckStatus.DOWN
+        mock_checks(container, up=CheckStatus.DOWN)
         harness.charm.on.update_status.emit()
 
         self.assertEqual(harness.model.unit.status, MaintenanceStatus("Status check: DOWN"))
 
+    def test_update_status_degraded(self):
+        """The charm reports degraded mode while the Airbyte server is unavailable."""
+        harness = self.harness
+
+        simulate_lifecycle(harness)
+
+        container = harness.model.unit.get_container(APP_NAME)
+        mock_checks(container, up=CheckStatus.UP, api=CheckStatus.DOWN)
+        harness.charm.on.update_status.emit()
+        self.assertEqual(harness.model.unit.status, ActiveStatus("degraded: Airbyte server unavailable"))
+
+        # The degraded mode is also reported by the fast path.
+        harness.charm.on.update_status.emit()
+        self.assertEqual(harness.model.unit.status, ActiveStatus("degraded: Airbyte server unavailable"))
+
+        mock_checks(container, up=CheckStatus.UP, api=CheckStatus.UP)
+        harness.charm.on.update_status.emit()
+        self.assertEqual(harness.model.unit.status, ActiveStatus())
+
+    def test_api_unavailable(self):
+        """API reads are served stale, and clients told to back off, while the server is down."""
+        harness = self.harness
+
+        simulate_lifecycle(harness)
+        harness.update_config({"api-retry-after": 15})
+
+        default_conf = pull_default_conf(harness)
+        self.assertIn(f"server airbyte-k8s:{INTERNAL_API_PORT} max_fails=3 fail_timeout=15s;", default_conf)
+        self.assertIn(f"server 127.0.0.1:{API_UNAVAILABLE_PORT} backup;", default_conf)
+        self.assertIn("inactive=600s use_temp_path=off loader_files=1000;", default_conf)
+        self.assertIn("proxy_cache_use_stale error timeout http_500 http_502 http_503 http_504;", default_conf)
+        self.assertIn("error_page 502 503 504 = @api_unavailable;", default_conf)
+        self.assertEqual(default_conf.count("add_header Retry-After 15 always;"), 2)
+        self.assertIn('"retryAfter": 15}', default_conf)
+
+    def test_api_cache_post_reads(self):
+        """Airbyte POST reads are cached by request body, and other requests bypass the cache."""
+        harness = self.harness
+
+        simulate_lifecycle(harness)
+
+        default_conf = pull_default_conf(harness)
+        self.assertIn("proxy_cache_methods   GET HEAD POST;", default_conf)
+        self.assertIn("~^POST:/api/v1/(.+/)?(get|list)(_\\w+)?$ 0;", default_conf)
+        self.assertIn('$http_authorization$http_cookie:$request_body";', default_conf)
+        self.assertIn("proxy_no_cache        $api_write $request_body_file;", default_conf)
+        self.assertIn("proxy_cache_bypass    $api_write $request_body_file;", default_conf)
+
+    def test_api_cache(self):
+        """Concurrent API reads share a request, and cache statuses are logged for hit ratios."""
+        harness = self.harness
+
+        harness.add_storage("nginx-cache", attach=True)
+        simulate_lifecycle(harness)
+
+        default_conf = pull_default_conf(harness)
+        self.assertIn("proxy_cache_path /var/cache/nginx/api ", default_conf)
+        self.assertIn("proxy_cache_lock      on;", default_conf)
+        self.assertIn("$limit_req_status $upstream_cache_status';", default_conf)
+        self.assertIsInstance(harness.model.unit.status, MaintenanceStatus)
+
+    def test_api_cache_without_storage(self):
+        """The caches are kept in the container filesystem when no storage is attached."""
+        harness = self.harness
+
+        simulate_lifecycle(harness)
+
+        self.assertEqual(harness.model.storages["nginx-cache"], [])
+        self.assertIn("proxy_cache_path /var/cache/nginx/api ", pull_default_conf(harness))
+        self.assertIsInstance(harness.model.unit.status, MaintenanceStatus)
+
+    def test_api_stale_cache_disabled(self):
+        """The stale API cache can be disabled."""
+        harness = self.harness
+
+        simulate_lifecycle(harness)
+        harness.update_config({"api-stale-cache-max-age": 0})
+
+        default_conf = pull_default_conf(harness)
+        self.assertNotIn("api_stale", default_conf)
+        self.assertIn("error_page 502 503 504 = @api_unavailable;", default_conf)
+
+    def test_slow_request_log(self):
+        """Requests over the slow request threshold of their route are logged separately."""
+        harness = self.harness
+
+        simulate_lifecycle(harness)
+        harness.update_config({"slow-request-thresholds": "api=1500"})
+
+        default_conf = pull_default_conf(harness)
+        self.assertIn("access_log /var/log/nginx/slow.log slow if=$slow_request;", default_conf)
+        self.assertIn(f"access_log {LATENCY_LOG_DIR}/$latency_bucket.log latency;", default_conf)
+        self.assertIn('"~^api:(?:', default_conf)
+        self.assertNotIn('"~^static:(?:', default_conf)
+
+    def test_invalid_slow_request_thresholds(self):
+        """The charm is blocked by invalid slow request thresholds."""
+        harness = self.harness
+
+        simulate_lifecycle(harness)
+        harness.update_config({"slow-request-thresholds": "api=fast"})
+
+        self.assertEqual(harness.model.unit.status, BlockedStatus("config: invalid slow-request-thresholds 'api=fast'"))
+
+    def test_rate_limits(self):
+        """Requests are rate limited per route and client, and rejected ones told when to retry."""
+        harness = self.harness
+
+        simulate_lifecycle(harness)
+        harness.update_config(
+            {"rate-limits": "static=30r/m:10,api=5r/s:10:nodelay", "rate-limit-key": "cookie=session"}
+        )
+
+        default_conf = pull_default_conf(harness)
+        self.assertIn("limit_req_zone $rate_limit_key zone=static:10m rate=30r/m;", default_conf)
+        self.assertIn("limit_req_zone $rate_limit_key zone=api:10m rate=5r/s;", default_conf)
+        self.assertIn("default $cookie_session;", default_conf)
+        self.assertIn("limit_req zone=static burst=10;", default_conf)
+        self.assertIn("limit_req zone=api burst=10 nodelay;", default_conf)
+        self.assertNotIn("zone=connector-builder", default_conf)
+        self.assertIn("    static 2;", default_conf)
+        self.assertIn("add_header Retry-After $rate_limit_retry_after always;", default_conf)
+
+        harness.update_config({"rate-limits": ""})
+        default_conf = pull_default_conf(harness)
+        self.assertNotIn("limit_req_zone", default_conf)
+        self.assertNotIn("limit_req zone", default_conf)
+        self.assertNotIn("@rate_limited", default_conf)
+
+    def test_trusted_proxies(self):
+        """The client address is only taken from the X-Real-IP header of the trusted proxies."""
+        harness = self.harness
+
+        simulate_lifecycle(harness)
+        self.assertNotIn("real_ip_header", pull_default_conf(harness))
+        self.assertNotIn("limit_req_zone", pull_default_conf(harness))
+
+        harness.update_config({"trusted-proxies": "10.1.0.0/16, 192.168.1.7", "rate-limits": "api=5r/s"})
+        default_conf = pull_default_conf(harness)
+        self.assertIn("set_real_ip_from 10.1.0.0/16;\nset_real_ip_from 192.168.1.7/32;", default_conf)
+        self.assertIn("real_ip_header X-Real-IP;", default_conf)
+        self.assertIn("limit_req_zone $binary_remote_addr zone=api:10m rate=5r/s;", default_conf)
+
+        harness.update_config({"trusted-proxies": "ingress"})
+        self.assertEqual(harness.model.unit.status, BlockedStatus("config: invalid trusted-proxies 'ingress'"))
+
+    def test_invalid_rate_limits(self):
+        """The charm is blocked by invalid rate limits."""
+        harness = self.harness
+
+        simulate_lifecycle(harness)
+        harness.update_config({"rate-limits": "api=fast"})
+        self.assertEqual(harness.model.unit.status, BlockedStatus("config: invalid rate-limits 'api=fast'"))
+
+        harness.update_config({"rate-limits": "api=5r/s", "rate-limit-key": "header"})
+        self.assertEqual(harness.model.unit.status, BlockedStatus("config: invalid rate-limit-key 'header'"))
+
+    def test_compute_resources(self):
+        """The leader applies the compute resources set to the pod spec, and sizes nginx to fit."""
+        harness = self.harness
+
+        # The pod spec is left as is, without requiring trust, until resources are set.
+        self.kubernetes.forbidden = True
+        simulate_lifecycle(harness)
+        self.assertEqual(self.kubernetes.patches, [])
+        self.assertIn("worker_processes auto;", pull_nginx_conf(harness))
+        self.assertIsInstance(harness.model.unit.status, MaintenanceStatus)
+        self.kubernetes.forbidden = False
+
+        resources = self.kubernetes.statefulset.spec.template.spec.containers[1].resources
+        harness.update_config({"cpu-request": "100m", "cpu-limit": "1500m", "memory-limit": "1Gi"})
+        self.assertEqual(resources.requests, {"cpu": "100m"})
+        self.assertEqual(resources.limits, {"cpu": "1500m", "memory": "1Gi"})
+        self.assertIn("worker_processes 2;", pull_nginx_conf(harness))
+        self.assertEqual(len(self.kubernetes.patches), 1)
+
+        # The pod spec is only patched, and the pods rolled out, when the resources change.
+        harness.update_config({"connector-builder-read-timeout": 120})
+        self.assertEqual(len(self.kubernetes.patches), 1)
+
+        harness.update_config({"cpu-limit": ""})
+        self.assertEqual(resources.limits, {"memory": "1Gi"})
+
+        # Unset resources are removed from the pod spec once.
+        harness.update_config({"cpu-request": "", "memory-limit": ""})
+        self.assertIsNone(resources.requests)
+        self.assertIsNone(resources.limits)
+        harness.update_config({"connector-builder-read-timeout": 60})
+        self.assertEqual(len(self.kubernetes.patches), 3)
+
+    def test_compute_resources_not_leader(self):
+        """Only the leader patches the pod spec."""
+        harness = self.harness
+
+        simulate_lifecycle(harness)
+        harness.set_leader(False)
+        harness.update_config({"cpu-limit": "2"})
+
+        self.assertEqual(self.kubernetes.patches, [])
+        self.assertIn("worker_processes 2;", pull_nginx_conf(harness))
+
+    def test_compute_resources_untrusted(self):
+        """The charm is blocked until it is trusted to patch the pod spec."""
+        harness = self.harness
+        self.kubernetes.forbidden = True
+
+        simulate_lifecycle(harness)
+        harness.update_config({"memory-limit": "512Mi"})
+
+        self.assertEqual(
+            harness.model.unit.status,
+            BlockedStatus("kubernetes: not allowed to patch resources, run `juju trust airbyte-ui-k8s`"),
+        )
+
+    def test_compute_resources_unavailable(self):
+        """The charm waits, and reconciles again, while the Kubernetes API fails."""
+        harness = self.harness
+
+        simulate_lifecycle(harness)
+        # The server relation data is read again by the pending reconcile.
+        relation_id = harness.model.get_relation("airbyte-server").id
+        harness.update_relation_data(
+            relation_id, "airbyte-k8s", {"server_name": "airbyte-k8s", "server_status": "ready"}
+        )
+        self.kubernetes.unavailable = True
+        harness.update_config({"memory-limit": "512Mi"})
+        self.assertEqual(harness.model.unit.status, WaitingStatus("kubernetes: unable to patch resources: unavailable"))
+
+        self.kubernetes.unavailable = False
+        harness.charm.on.update_status.emit()
+        resources = self.kubernetes.statefulset.spec.template.spec.containers[1].resources
+        self.assertEqual(resources.limits, {"memory": "512Mi"})
+        self.assertIsInstance(harness.model.unit.status, MaintenanceStatus)
+
+    def test_invalid_compute_resources(self):
+        """The charm is blocked by invalid compute resources."""
+        harness = self.harness
+
+        simulate_lifecycle(harness)
+        harness.update_config({"memory-request": "2Gi", "memory-limit": "512Mi"})
+        self.assertEqual(
+            harness.model.unit.status, BlockedStatus("config: memory-request must not be over memory-limit")
+        )
+
+        harness.update_config({"memory-request": "128Mi", "cpu-limit": "two"})
+        self.assertEqual(harness.model.unit.status, BlockedStatus("config: cpu-limit: invalid CPU quantity 'two'"))
+
+    def test_connector_builder_consistent_hash(self):
+        """Connector builder clients are routed to replicas by a consistent hash of the session."""
+        harness = self.harness
+
+        simulate_lifecycle(
+            harness, server_data={"connector_builder_replicas": "builder-0:80,builder-1:80,builder-2:80"}
+        )
+        harness.update_config(
+            {"connector-builder-load-balancing": "consistent-hash", "connector-builder-affinity-key": "cookie=session"}
+        )
+
+        default_conf = pull_default_conf(harness)
+        self.assertIn("map $cookie_session $connector_builder_affinity {", default_conf)
+        self.assertIn("hash $connector_builder_affinity consistent;", default_conf)
+        self.assertIn("server builder-2:80;", default_conf)
+
+        harness.update_config({"connector-builder-affinity-key": "header=X-Builder-Session"})
+        self.assertIn("map $http_x_builder_session $connector_builder_affinity {", pull_default_conf(harness))
+
+        harness.update_config({"connector-builder-affinity-key": "ip"})
+        self.assertIn("hash $binary_remote_addr consistent;", pull_default_conf(harness))
+
+        harness.update_config({"connector-builder-affinity-key": "cookie=my-session"})
+        self.assertEqual(
+            harness.model.unit.status,
+            BlockedStatus("config: invalid connector-builder-affinity-key 'cookie=my-session'"),
+        )
+
+    def test_canary(self):
+        """A share of the clients is routed to the canary server once it is ready."""
+        harness = self.harness
+
+        simulate_lifecycle(harness)
+        relation_id = harness.add_relation(
+            "airbyte-server-canary", "airbyte-canary", app_data={"server_name": "airbyte-canary"}
+        )
+        self.assertNotIn("api-server-canary", pull_default_conf(harness))
+
+        harness.update_relation_data(relation_id, "airbyte-canary", {"server_status": "ready"})
+        harness.update_config({"canary-weight": 25})
+        default_conf = pull_default_conf(harness)
+        self.assertIn(f"server airbyte-canary:{INTERNAL_API_PORT} max_fails=3", default_conf)
+        self.assertIn('map $http_authorization $canary_client {\n    ""      $binary_remote_addr;', default_conf)
+        self.assertIn('split_clients "$canary_client" $api_upstream {\n    25% api-server-canary;', default_conf)
+        self.assertIn('"api:api-server-canary" api-canary;', default_conf)
+        self.assertIn("log_format latency '$latency_route $request_time", default_conf)
+        self.assertIn("proxy_pass http://$api_upstream;", default_conf)
+
+        harness.update_config({"canary-key": "ip", "trusted-proxies": "10.1.0.0/16"})
+        default_conf = pull_default_conf(harness)
+        self.assertNotIn("$canary_client", default_conf)
+        self.assertIn('split_clients "$binary_remote_addr" $api_upstream {', default_conf)
+
+        harness.update_config({"canary-key": "cookie=airbyte-session"})
+        self.assertEqual(
+            harness.model.unit.status, BlockedStatus("config: invalid canary-key 'cookie=airbyte-session'")
+        )
+
+        harness.update_config({"canary-key": "authorization", "canary-weight": 0})
+        self.assertNotIn("api-server-canary", pull_default_conf(harness))
+
+        harness.update_config({"canary-weight": 25})
+        harness.remove_relation(relation_id)
+        default_conf = pull_default_conf(harness)
+        self.assertNotIn("api-server-canary", default_conf)
+        self.assertIn("proxy_pass http://api-server/api/;", default_conf)
+
+    def test_canary_without_trusted_proxies(self):
+        """A warning is logged when the canary splits clients by the address of the ingress."""
+        harness = self.harness
+
+        simulate_lifecycle(harness)
+        relation_id = harness.add_relation(
+            "airbyte-server-canary", "airbyte-canary", app_data={"server_name": "airbyte-canary"}
+        )
+        with self.assertLogs("charm", level="WARNING") as logs:
+            harness.update_relation_data(relation_id, "airbyte-canary", {"server_status": "ready"})
+        self.assertIn("canary: trusted-proxies is not set", logs.output[0])
+
+        with self.assertNoLogs("charm", level="WARNING"):
+            harness.update_config({"trusted-proxies": "10.1.0.0/16"})
+
+    def test_latency_digest(self):
+        """Slow routes are reported in the unit status, and the latency per route by an action."""
+        harness = self.harness
+        now = datetime.now(timezone.utc)
+
+        # The buckets are completed after nginx started.
+        with mock.patch("charm.datetime") as clock:
+            clock.now.return_value = now - timedelta(minutes=10)
+            simulate_lifecycle(harness)
+        container = harness.model.unit.get_container(APP_NAME)
+        completed = bucket_name(now - timedelta(minutes=5))
+        current = bucket_name(now)
+        expired = bucket_name(now - timedelta(minutes=60))
+        container.push(f"{LATENCY_LOG_DIR}/{expired}.log", "api 9.000 200\n", make_dirs=True)
+        container.push(
+            f"{LATENCY_LOG_DIR}/{completed}.log",
+            "api 6.500 200\n" * 20 + "static 0.004 200\n" + "readiness-probe 0.012 200 -\n",
+        )
+        container.push(f"{LATENCY_LOG_DIR}/{current}.log", "static 0.003 200\n")
+
+        harness.charm.on.update_status.emit()
+        self.assertRegex(harness.model.unit.status.message, r"^slow: api p95 \d\.\ds$")
+        # Completed and expired buckets are removed once digested.
+        self.assertEqual([file.name for file in container.list_files(LATENCY_LOG_DIR)], [f"{current}.log"])
+
+        output = harness.run_action("latency-report")
+        routes = json.loads(output.results["routes"])
+        self.assertEqual(output.results["window-minutes"], 15)
+        self.assertEqual(routes["api"]["requests"], 20)
+        self.assertEqual(routes["api"]["slow"], 20)
+        self.assertEqual(routes["static"]["requests"], 2)
+        probe_history = json.loads(output.results["readiness-probe-history"])
+        self.assertEqual([probe["bucket"] for probe in probe_history], [completed])
+        self.assertEqual(probe_history[0]["requests"], 1)
+
+    def test_analyze_logs(self):
+        """The analyze-logs action summarizes the current and rotated access logs in the window."""
+        harness = self.harness
+
+        simulate_lifecycle(harness)
+        container = harness.model.unit.get_container(APP_NAME)
+        now = datetime.now(timezone.utc)
+
+        def line(minutes_ago, path, status=200):
+            time = (now - timedelta(minutes=minutes_ago)).strftime("%d/%b/%Y:%H:%M:%S %z")
+            return f'10.1.0.1 - - [{time}] "GET {path} HTTP/1.1" {status} 10 "-" "-" "-" rt=0.005 urt=0.004 gz=-\n'
+
+        container.push(
+            f"{NGINX_LOG_DIR}/access.log.2.gz", gzip.compress(line(30, "/api/v1/jobs/1").encode()), make_dirs=True
+        )
+        container.push(f"{NGINX_LOG_DIR}/access.log.1", line(120, "/old") + line(20, "/api/v1/jobs/2", 500))
+        container.push(f"{NGINX_LOG_DIR}/access.log", line(5, "/") * 3)
+        container.push(f"{NGINX_LOG_DIR}/error.log", "error\n")
+
+        output = harness.run_action("analyze-logs", {"window": 60, "top": 1})
+        self.assertEqual(output.results["requests"], 5)
+        self.assertEqual(json.loads(output.results["top-paths"])["requests"], [{"path": "/", "requests": 3}])
+        self.assertEqual(json.loads(output.results["status-classes"]), {"2xx": 4, "5xx": 1})
+        self.assertEqual(json.loads(output.results["peak-minute"])["requests"], 3)
+        self.assertEqual(output.results["unique-clients"], 1)
+
+    def test_analyze_logs_before_pebble_ready(self):
+        """The analyze-logs action fails while the workload container is unreachable."""
+        self.harness.set_can_connect(APP_NAME, False)
+        with self.assertRaises(ActionFailed):
+            self.harness.run_action("analyze-logs")
+
+    def test_update_status_fast_path(self):
+        """Update-status uses a single Pebble query once the applied plan has been verified."""
+        harness = self.harness
+
+        simulate_lifecycle(harness)
+        pebble = count_pebble_calls(harness)
+
+        # The first update after a reconciliation is a full check.
+        harness.charm.on.update_status.emit()
+        self.assertEqual(harness.model.unit.status, ActiveStatus())
+        self.assertIn("get_plan", pebble.calls)
+
+        # The latency logs are not digested on the fast path, even when a new bucket starts.
+        now = datetime.now(timezone.utc)
+        with mock.patch("charm.datetime") as clock:
+            for tick in range(FULL_STATUS_CHECK_INTERVAL):
+                clock.now.return_value = now + timedelta(minutes=LATENCY_BUCKET_MINUTES * (tick + 1))
+                pebble.calls.clear()
+                harness.charm.on.update_status.emit()
+                self.assertEqual(pebble.calls, ["get_checks"])
+                self.assertEqual(harness.model.unit.status, ActiveStatus())
+
+        # The plan is fully checked again periodically.
+        pebble.calls.clear()
+        harness.charm.on.update_status.emit()
+        self.assertIn("get_plan", pebble.calls)
+
+    def test_update_status_fast_path_fallback(self):
+        """Update-status falls back to a full check when the cached state does not match."""
+        harness = self.harness
+
+        simulate_lifecycle(harness)
+        harness.charm.on.update_status.emit()
+        pebble = count_pebble_calls(harness)
+
+        # A reconciliation invalidates the verified plan.
+        harness.update_config({"connector-builder-read-timeout": 60})
+        harness.charm.on.update_status.emit()
+        self.assertIn("get_plan", pebble.calls)
+
+        # A failing check triggers a full check.
+        pebble.calls.clear()
+        container = harness.model.unit.get_container(APP_NAME)
+        mock_checks(container, up=CheckStatus.DOWN)
+        harness.charm.on.update_status.emit()
+        self.assertEqual(harness.model.unit.status, MaintenanceStatus("Status check: DOWN"))
+
+    def test_update_status_blocked_after_reconcile(self):
+        """The cached status is not used once a reconciliation blocks the charm."""
+        harness = self.harness
+
+        simulate_lifecycle(harness)
+        harness.charm.on.update_status.emit()
+        self.assertEqual(harness.model.unit.status, ActiveStatus())
+
+        harness.update_config({"connector-builder-load-balancing": "random"})
+        harness.charm.on.update_status.emit()
+        self.assertIsInstance(harness.model.unit.status, BlockedStatus)
+
+    def test_readiness_endpoint(self):
+        """Health fails while draining, and in-flight requests are given the drain timeout."""
+        harness = self.harness
+
+        simulate_lifecycle(harness)
+        harness.update_config({"drain-timeout": 45})
+
+        default_conf = pull_default_conf(harness)
+        for location in ("/healthz", "/readyz"):
+            self.assertRegex(
+                default_conf, rf"location = {location} {{\n[^}}]*if \(-f {NGINX_DRAIN_MARKER_PATH}\) {{\n\s+return 503;"
+            )
+        self.assertIn("worker_shutdown_timeout 45s;", pull_nginx_conf(harness))
+
+    def test_readiness_probe(self):
+        """The Airbyte server probe of the readiness checks is cached for the probe interval."""
+        harness = self.harness
+
+        simulate_lifecycle(harness)
+        harness.update_config({"health-probe-interval": 30})
+
+        default_conf = pull_default_conf(harness)
+        self.assertIn("proxy_pass http://api-server/api/v1/health;", default_conf)
+        self.assertIn("proxy_cache_valid     any 30s;", default_conf)
+        self.assertIn("proxy_cache_lock      on;", default_conf)
+        self.assertIn("latency if=$readiness_probed;", default_conf)
+
+        # The cached result does not expire before the next Pebble check of the server.
+        checks = harness.get_container_pebble_plan(APP_NAME).to_dict()["checks"]
+        self.assertEqual(checks["api"]["period"], "30s")
+
+        harness.update_config({"health-probe-interval": 0})
+        self.assertEqual(
+            harness.model.unit.status, BlockedStatus("config: health-probe-interval must be between 1 and 300")
+        )
+
+    @mock.patch("charm.time.sleep")
+    def test_stop_drains_connections(self, _):
+        """The unit fails readiness and lets nginx quit gracefully when it stops."""
+        harness = self.harness
+
+        simulate_lifecycle(harness)
+        container = harness.model.unit.get_container(APP_NAME)
+        container.get_check = mock.Mock()
+        container.get_check.return_value.status = CheckStatus.DOWN
+        quit_commands = []
+
+        def nginx_quit(args):
+            quit_commands.append(args.command)
+            # nginx exits once the in-flight requests completed.
+            container.stop(APP_NAME)
+
+        harness.handle_exec(APP_NAME, ["nginx"], handler=nginx_quit)
+        harness.charm.on.stop.emit()
+
+        self.assertEqual(quit_commands, [["nginx", "-s", "quit"]])
+        self.assertTrue(container.exists(NGINX_DRAIN_MARKER_PATH))
+        self.assertFalse(container.get_service(APP_NAME).is_running())
+        self.assertEqual(harness.model.unit.status, MaintenanceStatus("draining connections"))
+
+        # The unit is drained only once when it is then removed.
+        harness.charm.on.remove.emit()
+        self.assertEqual(len(quit_commands), 1)
+
+        # A unit that was not terminated serves again once reconciled.
+        harness.update_config({"drain-timeout": 10})
+        self.assertFalse(container.exists(NGINX_DRAIN_MARKER_PATH))
+        self.assertTrue(container.get_service(APP_NAME).is_running())
+
+    @mock.patch("charm.time.sleep")
+    def test_stop_drain_timeout(self, sleep):
+        """Pebble stops nginx if in-flight requests do not complete within the drain timeout."""
+        harness = self.harness
+
+        simulate_lifecycle(harness)
+        harness.update_config({"drain-timeout": 5})
+        harness.handle_exec(APP_NAME, ["nginx"], result=0)
+        harness.charm.on.stop.emit()
+
+        container = harness.model.unit.get_container(APP_NAME)
+        self.assertFalse(container.get_service(APP_NAME).is_running())
+        self.assertEqual(sleep.call_count, 10)
+
+    @mock.patch("charm.time.sleep")
+    def test_stop_drain_capped(self, sleep):
+        """Draining on stop ends within the default pod termination grace period."""
+        harness = self.harness
+
+        simulate_lifecycle(harness)
+        harness.update_config({"drain-timeout": 300})
+        harness.handle_exec(APP_NAME, ["nginx"], result=0)
+        harness.charm.on.stop.emit()
+
+        self.assertEqual(sleep.call_count, 50)
+
+    @mock.patch("charm.time.sleep")
+    def test_restart(self, _):
+        """The restart action drains connections before starting nginx again."""
+        harness = self.harness
+
+        simulate_lifecycle(harness)
+        container = harness.model.unit.get_container(APP_NAME)
+        harness.handle_exec(APP_NAME, ["nginx"], handler=lambda _: container.stop(APP_NAME))
+
+        output = harness.run_action("restart")
+
+        self.assertEqual(output.results, {"result": "UI successfully restarted"})
+        self.assertFalse(container.exists(NGINX_DRAIN_MARKER_PATH))
+        self.assertTrue(container.get_service(APP_NAME).is_running())
+
+    def test_restart_before_pebble_ready(self):
+        """The restart action fails, rather than being deferred, until the container is ready."""
+        harness = self.harness
+        harness.set_can_connect(APP_NAME, False)
+
+        with self.assertRaises(ActionFailed):
+            harness.run_action("restart")
+
+    def test_reconcile_coalesced(self):
+        """Events seen before the container is ready are reconciled once, instead of deferred."""
+        harness = self.harness
+        harness.set_can_connect(APP_NAME, False)
+
+        harness.add_relation("peer", "airbyte")
+        harness.add_relation(
+            "airbyte-server", "airbyte-k8s", app_data={"server_name": "airbyte-k8s", "server_status": "ready"}
+        )
+        for timeout in range(600, 610):
+            harness.update_config({"connector-builder-read-timeout": timeout})
+
+        # Deferred events would each be re-run by every later hook.
+        self.assertEqual(list(harness.framework._storage.notices()), [])
+        self.assertTrue(harness.charm._stored.reconcile_pending)
+
+        harness.set_can_connect(APP_NAME, True)
+        container = harness.model.unit.get_container(APP_NAME)
+        with mock.patch.object(harness.charm, "_update", wraps=harness.charm._update) as update:
+            harness.framework.reemit()
+            harness.charm.on.airbyte_webapp_pebble_ready.emit(container)
+
+        self.assertEqual(update.call_count, 1)
+        self.assertFalse(harness.charm._stored.reconcile_pending)
+        self.assertEqual(harness.model.unit.status, MaintenanceStatus("replanning application"))
+        self.assertIn("proxy_read_timeout 609s;", pull_default_conf(harness))
+
+    def test_reconcile_server_before_peer(self):
+        """Server relation data seen before the peer relation is ready is used by the reconcile."""
+        harness = self.harness
+
+        harness.add_relation(
+            "airbyte-server", "airbyte-k8s", app_data={"server_name": "airbyte-k8s", "server_status": "ready"}
+        )
+        self.assertTrue(harness.charm._stored.reconcile_pending)
+
+        harness.add_relation("peer", "airbyte")
+
+        self.assertFalse(harness.charm._stored.reconcile_pending)
+        self.assertEqual(harness.charm._state.airbyte_server["name"], "airbyte-k8s")
+        self.assertEqual(harness.model.unit.status, MaintenanceStatus("replanning application"))
+
+    def test_peer_relation_changed_unrelated(self):
+        """Peer relation changes the workload does not depend on do not reconcile the unit."""
+        harness = self.harness
+        simulate_lifecycle(harness)
+        relation_id = harness.model.get_relation("peer").id
+        harness.add_relation_unit(relation_id, f"{harness.model.app.name}/1")
+
+        with mock.patch.object(harness.charm, "_update", wraps=harness.charm._update) as update:
+            harness.update_relation_data(relation_id, f"{harness.model.app.name}/1", {"tick": "1"})
+            update.assert_not_called()
+
+            # Changes to the peer app databag are only seen by the other units.
+            harness.set_leader(False)
+            harness.update_relation_data(
+                relation_id,
+                harness.model.app.name,
+                {"airbyte_server": json.dumps({"name": "other", "status": "ready"})},
+            )
+            update.assert_called_once()
+
     def test_incomplete_pebble_plan(self):
         """The charm re-applies the pebble plan if incomplete."""
         harness = self.harness
@@ -222,11 +1186,12 @@ class TestCharm(TestCase):
         assert plan is not None
 
 
-def simulate_lifecycle(harness):
+def simulate_lifecycle(harness, server_data=None):
     """Simulate a healthy charm life-cycle.
 
     Args:
         harness: ops.testing.Harness object used to simulate charm lifecycle.
+        server_data: additional relation data advertised by the server.
     """
     # Simulate pebble readiness.
     container = harness.model.unit.get_container(APP_NAME)
@@ -244,7 +1209,7 @@ def simulate_lifecycle(harness):
         "Relation",
         (),
         {
-            "data": {app: {"server_status": "ready", "server_name": "airbyte-k8s"}},
+            "data": {app: {"server_status": "ready", "server_name": "airbyte-k8s", **(server_data or {})}},
             "name": "ui",
             "id": 42,
         },
@@ -254,6 +1219,83 @@ def simulate_lifecycle(harness):
     harness.charm.airbyte_server._on_airbyte_server_relation_changed(event)
 
 
+class PebbleCallCounter:
+    """Pebble client proxy recording the API calls made by the charm.
+
+    Attrs:
+        calls: names of the Pebble client methods called.
+    """
+
+    def __init__(self, client):
+        """Construct.
+
+        Args:
+            client: the Pebble client to wrap.
+        """
+        self._client = client
+        self.calls = []
+
+    def __getattr__(self, name):
+        """Get a client attribute, recording calls to its methods.
+
+        Args:
+            name: attribute name.
+
+        Returns:
+            The client attribute.
+        """
+        attr = getattr(self._client, name)
+        if not callable(attr):
+            return attr
+
+        def wrapped(*args, **kwargs):
+            self.calls.append(name)
+            return attr(*args, **kwargs)
+
+        return wrapped
+
+
+def count_pebble_calls(harness):
+    """Record the Pebble API calls made to the workload container.
+
+    Args:
+        harness: ops.testing.Harness object used to simulate charm lifecycle.
+
+    Returns:
+        The PebbleCallCounter recording the calls.
+    """
+    container = harness.model.unit.get_container(APP_NAME)
+    counter = PebbleCallCounter(container._pebble)
+    container._pebble = counter
+    return counter
+
+
+def pull_nginx_conf(harness):
+    """Read the main nginx configuration pushed to the workload container.
+
+    Args:
+        harness: ops.testing.Harness object used to simulate charm lifecycle.
+
+    Returns:
+        The rendered main nginx configuration.
+    """
+    container = harness.model.unit.get_container(APP_NAME)
+    return container.pull(NGINX_CONF_PATH).read()
+
+
+def pull_default_conf(harness):
+    """Read the nginx server configuration pushed to the workload container.
+
+    Args:
+        harness: ops.testing.Harness object used to simulate charm lifecycle.
+
+    Returns:
+        The rendered nginx server configuration.
+    """
+    container = harness.model.unit.get_container(APP_NAME)
+    return container.pull(NGINX_DEFAULT_CONF_PATH).read()
+
+
 def make_ui_changed_event(rel_name):
     """Create and return a mock relation changed event.
 
@@ -273,3 +1315,13 @@ def make_ui_changed_event(rel_name):
             "relation": type("Relation", (), {"name": rel_name}),
         },
     )
+
+
+def mock_checks(container, **statuses):
+    """Mock the status of the Pebble checks of a container.
+
+    Args:
+        container: the workload container.
+        statuses: check names and their status.
+    """
+    container.get_checks = mock.Mock(return_value={name: mock.Mock(status=status) for name, status in statuses.items()})
@@ -0,0 +1,51 @@
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+#
+# Learn more about testing at: https://juju.is/docs/sdk/testing
+
+
+"""Charm import time unit tests."""
+
+import os
+import subprocess  # nosec B404
+import sys
+from pathlib import Path
+from unittest import TestCase
+
+ROOT = Path(__file__).resolve().parents[2]
+
+# Modules only needed by some hooks, which must be imported lazily.
+DEFERRED_MODULES = ("jinja2", "cProfile", "pstats", "lightkube", "access_log", "gzip", "mmap")
+
+
+def measure_import():
+    """Import the charm in a fresh interpreter with `-X importtime`.
+
+    Returns:
+        Dict of imported module names to their cumulative import time in microseconds.
+    """
+    env = dict(os.environ, PYTHONPATH=f"{ROOT / 'lib'}:{ROOT / 'src'}")
+    result = subprocess.run(  # nosec B603
+        [sys.executable, "-X", "importtime", "-c", "import charm"],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        modules[name.strip()] = int(cumulative)
+    return modules
+
+
+class TestImportTime(TestCase):
+    """Unit tests for the charm import cost."""
+
+    def test_deferred_imports(self):
+        """Rarely used modules are not imported with the charm."""
+        modules = measure_import()
+        for name in DEFERRED_MODULES:
+            self.assertNotIn(name, modules)
@@ -0,0 +1,92 @@
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Latency digest unit tests."""
+
+import re
+from datetime import datetime
+from unittest import TestCase
+
+from latency import (
+    at_least_regex,
+    bucket_name,
+    merge,
+    parse_thresholds,
+    report,
+    slow_routes,
+    summarize_log,
+)
+
+
+class TestLatency(TestCase):
+    """Unit tests for the latency digest."""
+
+    def test_at_least_regex(self):
+        """The generated regex matches the nginx request times at least as long as a threshold."""
+        for threshold in (1, 250, 999, 1000, 1001, 5000, 9999, 10000, 30000, 123456):
+            pattern = re.compile(at_least_regex(threshold))
+            for milliseconds in range(0, 200000, 7):
+                request_time = f"{milliseconds // 1000}.{milliseconds % 1000:03d}"
+                self.assertEqual(
+                    bool(pattern.fullmatch(request_time)), milliseconds >= threshold, (threshold, request_time)
+                )
+
+    def test_parse_thresholds(self):
+        """Slow request thresholds are parsed by route."""
+        self.assertEqual(parse_thresholds("static=1000, api=5000"), {"static": 1000, "api": 5000})
+        self.assertEqual(parse_thresholds(""), {})
+        for value in ("static", "web=10", "api=0", "api=1s"):
+            with self.assertRaises(ValueError):
+                parse_thresholds(value)
+
+    def test_bucket_name(self):
+        """Bucket names match the five-minute buckets written by nginx."""
+        self.assertEqual(bucket_name(datetime(2024, 5, 1, 13, 7, 59)), "2024-05-01T1305")
+        self.assertEqual(bucket_name(datetime(2024, 5, 1, 13, 50)), "2024-05-01T1350")
+
+    def test_report(self):
+        """The report gives the latency percentiles and slow requests of each route."""
+        log = "".join(f"api 0.{i:03d} 200\n" for i in range(1, 101)) + "static 0.002 200\nstatic 0.002 304\n-\n"
+        latency_report = report(summarize_log(log, {"api": 90}), {"api": 90})
+
+        self.assertEqual(latency_report["api"]["requests"], 100)
+        self.assertEqual(latency_report["api"]["slow"], 11)
+        # Percentiles are estimated within about 10%.
+        for metric, expected in (("p50_ms", 50), ("p95_ms", 95), ("p99_ms", 99)):
+            self.assertGreaterEqual(latency_report["api"][metric], expected)
+            self.assertLessEqual(latency_report["api"][metric], expected * 1.1)
+        self.assertEqual(latency_report["static"]["requests"], 2)
+        self.assertIsNone(latency_report["static"]["slow_threshold_ms"])
+
+        self.assertRegex(slow_routes(latency_report), r"^slow: api p95 \d+ms$")
+
+    def test_report_canary(self):
+        """The canary shares the slow request threshold of its route, and reports its errors."""
+        log = "api 0.100 200\napi-canary 0.200 200\napi-canary 0.300 502\napi-canary 0.001 200\n"
+        latency_report = report(summarize_log(log, {"api": 150}), {"api": 150})
+
+        self.assertEqual(latency_report["api"]["error_rate"], 0)
+        self.assertEqual(latency_report["api-canary"]["requests"], 3)
+        self.assertEqual(latency_report["api-canary"]["slow"], 2)
+        self.assertEqual(latency_report["api-canary"]["slow_threshold_ms"], 150)
+        self.assertEqual(latency_report["api-canary"]["error_rate"], 0.3333)
+
+    def test_report_rate_limited(self):
+        """Requests rejected by the rate limits are counted by route."""
+        log = "api 0.000 429 REJECTED\napi 0.010 200 PASSED\napi 0.012 200 -\nstatic 0.001 200\n"
+        latency_report = report(merge([summarize_log(log, {}), {}]), {})
+
+        self.assertEqual(latency_report["api"]["requests"], 3)
+        self.assertEqual(latency_report["api"]["rate_limited"], 1)
+        self.assertEqual(latency_report["static"]["rate_limited"], 0)
+
+    def test_report_cache_hits(self):
+        """The cache hit ratio is reported for the routes looked up in a cache."""
+        log = "api 0.000 200 - HIT\napi 0.001 200 - STALE\napi 0.010 200 - MISS\napi 0.012 200 - EXPIRED\n"
+        log += "api 0.020 200 - BYPASS\nstatic 0.001 200 - -\n"
+        # Summaries digested before the cache statuses were logged have no cache lookups.
+        latency_report = report(merge([summarize_log(log, {}), {"api": {"bins": {"0": 1}, "slow": 0}}]), {})
+
+        self.assertEqual(latency_report["api"]["requests"], 6)
+        self.assertEqual(latency_report["api"]["cache_hit_ratio"], 0.5)
+        self.assertIsNone(latency_report["static"]["cache_hit_ratio"])
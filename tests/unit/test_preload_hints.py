@@ -0,0 +1,95 @@
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+#
+# Learn more about testing at: https://juju.is/docs/sdk/testing
+
+
+"""Preload hints build script unit tests."""
+
+import importlib.util
+import json
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+SCRIPT = Path(__file__).parents[2] / "airbyte_ui_rock" / "scripts" / "preload_hints.py"
+spec = importlib.util.spec_from_file_location("preload_hints", SCRIPT)
+preload_hints = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(preload_hints)
+
+INDEX_HTML = """<!doctype html>
+<html>
+  <head>
+    <script type="module" crossorigin src="/assets/index-3f2a9c1d.js"></script>
+    <link rel="modulepreload" crossorigin href="/assets/vendor-1a2b3c4d.js">
+    <link rel="stylesheet" href="/assets/index-8b7e6f5a.css">
+    <link rel="icon" href="/favicon.ico">
+    <script src="https://cdn.example.com/analytics.js"></script>
+  </head>
+  <body><div id="root"></div></body>
+</html>
+"""
+
+
+class TestPreloadHints(TestCase):
+    """Unit tests for the preload hints build script.
+
+    Attrs:
+        maxDiff: Specifies max difference shown by failed tests.
+    """
+
+    maxDiff = None
+
+    def setUp(self):
+        """Create setup for the unit tests."""
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.html_dir = Path(tmp.name)
+        (self.html_dir / "index.html").write_text(INDEX_HTML)
+
+    def test_index_html_assets(self):
+        """Same-origin entry scripts and stylesheets of index.html are critical."""
+        self.assertEqual(
+            preload_hints.critical_assets(self.html_dir),
+            [
+                ("/assets/index-3f2a9c1d.js", "modulepreload"),
+                ("/assets/vendor-1a2b3c4d.js", "modulepreload"),
+                ("/assets/index-8b7e6f5a.css", "preload; as=style"),
+            ],
+        )
+
+    def test_manifest_assets(self):
+        """Static imports of the entry chunks from the Vite manifest are critical."""
+        manifest = {
+            "index.html": {
+                "file": "assets/index-3f2a9c1d.js",
+                "isEntry": True,
+                "imports": ["_vendor.js"],
+                "dynamicImports": ["src/pages/Settings.tsx"],
+                "css": ["assets/index-8b7e6f5a.css"],
+            },
+            "_vendor.js": {"file": "assets/vendor-1a2b3c4d.js", "imports": ["_react.js"]},
+            "_react.js": {"file": "assets/react-5e6f7a8b.js"},
+            "src/pages/Settings.tsx": {"file": "assets/Settings-9c8d7e6f.js", "isDynamicEntry": True},
+        }
+        (self.html_dir / ".vite").mkdir()
+        (self.html_dir / ".vite" / "manifest.json").write_text(json.dumps(manifest))
+
+        paths = [path for path, _ in preload_hints.critical_assets(self.html_dir)]
+        self.assertIn("/assets/react-5e6f7a8b.js", paths)
+        self.assertNotIn("/assets/Settings-9c8d7e6f.js", paths)
+        self.assertEqual(len(paths), len(set(paths)))
+
+    def test_nginx_snippet(self):
+        """The critical assets are sent in a single Link header."""
+        snippet = preload_hints.nginx_snippet(preload_hints.critical_assets(self.html_dir))
+        self.assertIn(
+            'add_header Link "</assets/index-3f2a9c1d.js>; rel=modulepreload, '
+            "</assets/vendor-1a2b3c4d.js>; rel=modulepreload, "
+            '</assets/index-8b7e6f5a.css>; rel=preload; as=style" always;\n',
+            snippet,
+        )
+
+    def test_no_assets(self):
+        """No header is added when the build has no critical assets."""
+        self.assertNotIn("add_header", preload_hints.nginx_snippet([]))
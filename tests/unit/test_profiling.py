@@ -0,0 +1,122 @@
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+#
+# Learn more about testing at: https://juju.is/docs/sdk/testing
+
+
+"""Profiling unit tests."""
+
+import base64
+import cProfile
+import pstats
+import tempfile
+import zlib
+from pathlib import Path
+from unittest import TestCase, mock
+
+import profiling
+from profiling import ProfileStore, handler_span
+
+
+class TestProfiling(TestCase):
+    """Unit tests for hook profiling.
+
+    Attrs:
+        maxDiff: Specifies max difference shown by failed tests.
+    """
+
+    maxDiff = None
+
+    def setUp(self):
+        """Create setup for the unit tests."""
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.charm_dir = Path(tmp.name)
+        self.store = ProfileStore(self.charm_dir / profiling.PROFILES_DIR)
+
+    def test_disabled(self):
+        """Hooks are not profiled unless enabled."""
+        self.assertIsNone(self.store.retention())
+
+        result = self._run(lambda: "done")
+
+        self.assertEqual(result, "done")
+        self.assertEqual(self.store.load(10, 10), [])
+
+    def test_enable_disable(self):
+        """Profiling can be enabled and disabled."""
+        self.store.configure(True, 3)
+        self.assertEqual(self.store.retention(), 3)
+
+        self.store.configure(False, 3)
+        self.assertIsNone(self.store.retention())
+
+    def test_profile_hook(self):
+        """Profiled hooks record their duration, handlers and top functions."""
+        self.store.configure(True, 3)
+
+        def hook():
+            with handler_span("Charm._on_update_status"):
+                sum(range(1000))
+
+        with mock.patch.dict("os.environ", {"JUJU_DISPATCH_PATH": "hooks/update-status"}):
+            self._run(hook)
+
+        (profile,) = self.store.load(10, 5)
+        self.assertEqual(profile["hook"], "update-status")
+        self.assertEqual([h["handler"] for h in profile["handlers"]], ["Charm._on_update_status"])
+        self.assertLessEqual(len(profile["functions"]), 5)
+        cumtimes = [f["cumtime"] for f in profile["functions"]]
+        self.assertEqual(cumtimes, sorted(cumtimes, reverse=True))
+
+    def test_raw_profile(self):
+        """Raw profiles are base64-packed pstats files."""
+        self.store.configure(True, 3)
+        with mock.patch.dict("os.environ", {"JUJU_ACTION_NAME": "restart"}):
+            self._run(lambda: None)
+
+        (profile,) = self.store.load(10, 5, raw=True)
+        self.assertEqual(profile["hook"], "restart-action")
+        path = self.charm_dir / "raw.prof"
+        path.write_bytes(zlib.decompress(base64.b64decode(profile["data"])))
+        self.assertIsInstance(pstats.Stats(str(path)), pstats.Stats)
+
+    def test_retention(self):
+        """Only the most recent profiles are kept."""
+        self.store.configure(True, 2)
+        for _ in range(4):
+            self._run(lambda: None)
+
+        self.assertEqual(len(self.store.load(10, 1)), 2)
+        self.assertEqual(len(list(self.store.directory.glob("*.json"))), 2)
+
+        self.store.configure(True, 1)
+        self.assertEqual(len(self.store.load(10, 1)), 1)
+
+    def test_handler_span_without_session(self):
+        """Handler spans are no-ops outside of a profiled hook."""
+        with handler_span("Charm._update"):
+            pass
+        self.assertIsNone(profiling._session)
+
+    def test_save_profile(self):
+        """Profiles are saved with their metadata."""
+        self.store.configure(True, 1)
+        profile = cProfile.Profile()
+        self.store.save(profile, "config-changed", 0.5, [("Charm._update", 0.25)])
+
+        (loaded,) = self.store.load(1, 1)
+        self.assertEqual(loaded["duration"], 0.5)
+        self.assertEqual(loaded["handlers"], [{"handler": "Charm._update", "duration": 0.25}])
+
+    def _run(self, func):
+        """Run a function as the charm entrypoint.
+
+        Args:
+            func: function to run.
+
+        Returns:
+            The result of the function.
+        """
+        with mock.patch.dict("os.environ", {"JUJU_CHARM_DIR": str(self.charm_dir)}):
+            return profiling.run(func)
@@ -0,0 +1,90 @@
+# Copyright 2024 Canonical Ltd.
+# See LICENSE file for licensing details.
+#
+# Learn more about testing at: https://juju.is/docs/sdk/testing
+
+
+"""Compute resources unit tests."""
+
+from unittest import TestCase
+
+from resources import (
+    compute_resources,
+    cpu_cores,
+    memory_bytes,
+    patch_resources,
+    requested,
+    worker_processes,
+)
+from tests.unit.fake_kubernetes import FakeKubernetes
+
+CONFIG = {"cpu-request": "250m", "cpu-limit": "", "memory-request": "128Mi", "memory-limit": "0.5Gi"}
+
+
+class TestResources(TestCase):
+    """Unit tests for the compute resources of the workload container."""
+
+    def test_quantities(self):
+        """CPU and memory quantities are parsed as Kubernetes does."""
+        self.assertEqual(cpu_cores("250m"), 0.25)
+        self.assertEqual(cpu_cores("1.5"), 1.5)
+        self.assertEqual(memory_bytes("128Mi"), 128 * 2**20)
+        self.assertEqual(memory_bytes("1G"), 10**9)
+        self.assertEqual(memory_bytes("1024"), 1024)
+        for parse, value in ((cpu_cores, "1 core"), (cpu_cores, "-1"), (memory_bytes, "1GB"), (memory_bytes, "")):
+            with self.assertRaises(ValueError):
+                parse(value)
+
+    def test_compute_resources(self):
+        """Requests and limits are built from the config, unset options being None."""
+        resources = compute_resources(CONFIG)
+
+        self.assertEqual(
+            resources,
+            {"requests": {"cpu": "250m", "memory": "128Mi"}, "limits": {"cpu": None, "memory": "0.5Gi"}},
+        )
+        self.assertEqual(worker_processes(resources), "auto")
+        self.assertEqual(worker_processes(compute_resources({**CONFIG, "cpu-request": "", "cpu-limit": "100m"})), 1)
+        self.assertEqual(worker_processes(compute_resources({**CONFIG, "cpu-limit": "2.5"})), 3)
+        with self.assertRaises(ValueError):
+            compute_resources({**CONFIG, "cpu-limit": "200m"})
+
+    def test_patch_resources(self):
+        """The StatefulSet is only patched when the requirements differ in value."""
+        kubernetes = FakeKubernetes("ui", containers=("charm", "webapp"))
+        resources = compute_resources(CONFIG)
+
+        self.assertTrue(patch_resources(kubernetes, "model", "ui", "webapp", resources))
+        webapp = kubernetes.statefulset.spec.template.spec.containers[1].resources
+        self.assertEqual(webapp.limits, {"memory": "0.5Gi"})
+        self.assertIsNone(kubernetes.statefulset.spec.template.spec.containers[0].resources.requests)
+
+        # Kubernetes normalizes the quantities it stores.
+        webapp.limits = {"memory": "512Mi"}
+        webapp.requests = {"cpu": "0.25", "memory": "128Mi"}
+        self.assertFalse(patch_resources(kubernetes, "model", "ui", "webapp", resources))
+        self.assertEqual(len(kubernetes.patches), 1)
+
+    def test_patch_resources_errors(self):
+        """Missing permissions are a configuration error, and API failures make it unavailable."""
+        kubernetes = FakeKubernetes("ui", containers=("charm", "webapp"))
+        resources = compute_resources(CONFIG)
+
+        with self.assertRaisesRegex(ConnectionError, "not found"):
+            patch_resources(kubernetes, "model", "other", "webapp", resources)
+        with self.assertRaises(ValueError):
+            patch_resources(kubernetes, "model", "ui", "missing", resources)
+
+        kubernetes.unreachable = True
+        with self.assertRaisesRegex(ConnectionError, "connection refused"):
+            patch_resources(kubernetes, "model", "ui", "webapp", resources)
+
+        kubernetes.unreachable = False
+        kubernetes.forbidden = True
+        with self.assertRaisesRegex(ValueError, "juju trust ui"):
+            patch_resources(kubernetes, "model", "ui", "webapp", resources)
+
+    def test_requested(self):
+        """Resources are requested once any request or limit is set."""
+        self.assertTrue(requested(compute_resources(CONFIG)))
+        self.assertFalse(requested(compute_resources(dict.fromkeys(CONFIG, ""))))
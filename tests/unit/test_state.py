@@ -7,7 +7,7 @@
 """State unit tests."""
 
 import json
-from unittest import TestCase
+from unittest import TestCase, mock
 
 from state import State
 
@@ -37,6 +37,15 @@ class TestState(TestCase):
         self.assertEqual(state.list, [1, 2, 3])
         self.assertEqual(data, {"foo": "42", "list": "[1, 2, 3]"})
 
+    def test_set_unchanged(self):
+        """Setting an attribute to its current value does not write to the relation."""
+        data = mock.MagicMock(wraps={"foo": json.dumps("bar")})
+        state = make_state(data)
+        state.foo = "bar"
+        data.update.assert_not_called()
+        state.foo = "baz"
+        data.update.assert_called_once_with({"foo": '"baz"'})
+
     def test_del(self):
         """It is possible to unset attributes in the state."""
         data = {"foo": json.dumps("bar"), "answer": json.dumps(42)}